@@ -14,4 +14,8 @@ class ComparisonConfig(AppConfig):
     def ready(self):
         # 迅投初始化已在 account 应用中完成，此处不需要再次初始化
         # 如果需要使用迅投功能，直接调用相关工具函数即可
-        pass
+        
+        # 基准指数的日线需要保存在本地，基准对比接口只读本地数据
+        from apps.utils.kline_store import require_codes
+        from .benchmark import BENCHMARK_INDEXES
+        require_codes(BENCHMARK_INDEXES)
@@ -0,0 +1,117 @@
+"""
+账户与基准指数对比
+将账户每日总资产与指数（如沪深300 000300.SH、中证500 000905.SH）的日收盘价按日期对齐，计算：
+
+    超额收益     账户区间收益 - 指数区间收益
+    跟踪误差     日超额收益（账户日收益 - 指数日收益）的年化标准差
+    Beta         cov(账户日收益, 指数日收益) / var(指数日收益)
+    信息比率     日超额收益均值 × 年交易日数 / 跟踪误差
+
+指数收盘价只从本地日K线存储（kline_store）读取，请求中不访问迅投；
+BENCHMARK_INDEXES 中的指数由日K线存储的后台同步线程保证在本地存在并每日追加。
+"""
+
+import numpy as np
+from django.conf import settings
+
+from apps.utils.trading_calendar import annual_trading_days
+
+# 支持的基准指数
+BENCHMARK_INDEXES = getattr(settings, 'BENCHMARK_INDEXES', {
+    '000300.SH': '沪深300',
+    '000905.SH': '中证500',
+    '000016.SH': '上证50',
+    '399006.SZ': '创业板指',
+})
+
+DEFAULT_BENCHMARK = '000300.SH'
+
+
+class BenchmarkDataError(Exception):
+    """本地没有基准指数数据或对齐后数据不足"""
+
+
+def load_benchmark_series(index_code, start, end):
+    """
+    从本地日K线存储读取指数收盘价
+
+    返回:
+        tuple: (dates, close)，dates为datetime64[D]
+    """
+    from apps.utils.kline_store import read_window, stored_length
+
+    if stored_length(index_code) == 0:
+        raise BenchmarkDataError(f'本地还没有指数 {index_code} 的日线数据，请等待后台同步或运行 sync_kline_store')
+    dates, close = read_window([index_code], start=start, end=end, field='close')
+    return dates, close[:, 0]
+
+
+def compare_with_benchmark(account_dates, account_values, index_dates, index_close):
+    """
+    计算账户相对基准的超额收益、跟踪误差、Beta和信息比率
+
+    参数:
+        account_dates: 账户日期（可转换为datetime64[D]，按日期和写入时间升序）
+        account_values: 账户每日总资产（同一日期有多条快照时取最后一条，即当天收盘时的资产）
+        index_dates: 指数交易日
+        index_close: 指数收盘价
+
+    返回:
+        dict: 各项指标（收益率类为百分比）和对齐后的累计收益序列
+
+    异常:
+        BenchmarkDataError: 对齐后不足两个交易日
+    """
+    account_dates = np.asarray(account_dates, dtype='datetime64[D]')
+    account_values = np.asarray(account_values, dtype=np.float64)
+    index_dates = np.asarray(index_dates, dtype='datetime64[D]')
+    index_close = np.asarray(index_close, dtype=np.float64)
+
+    # 每个日期只保留最后一条（intersect1d 对重复日期取第一条，会用盘中的资产对比指数收盘）
+    order = np.argsort(account_dates, kind='stable')
+    account_dates, account_values = account_dates[order], account_values[order]
+    last = np.append(account_dates[1:] != account_dates[:-1], True)
+    account_dates, account_values = account_dates[last], account_values[last]
+
+    valid = np.isfinite(index_close)
+    dates, account_idx, index_idx = np.intersect1d(account_dates, index_dates[valid], return_indices=True)
+    if dates.shape[0] < 2:
+        raise BenchmarkDataError('账户与指数重叠的交易日不足2天')
+
+    account = account_values[account_idx]
+    index = index_close[valid][index_idx]
+    account_returns = np.diff(account) / account[:-1]
+    index_returns = np.diff(index) / index[:-1]
+    active = account_returns - index_returns
+
+    account_total = account[-1] / account[0] - 1
+    index_total = index[-1] / index[0] - 1
+
+    trading_days = annual_trading_days(dates[-1])
+    tracking_error = float(np.std(active, ddof=1) * np.sqrt(trading_days)) if active.shape[0] > 1 else 0.0
+    index_var = float(np.var(index_returns, ddof=1)) if index_returns.shape[0] > 1 else 0.0
+    beta = float(np.cov(account_returns, index_returns, ddof=1)[0, 1] / index_var) if index_var > 0 else 0.0
+    information_ratio = float(active.mean() * trading_days / tracking_error) if tracking_error > 0 else 0.0
+
+    account_curve = (account / account[0] - 1) * 100
+    index_curve = (index / index[0] - 1) * 100
+
+    return {
+        'start_date': str(dates[0]),
+        'end_date': str(dates[-1]),
+        'observations': int(dates.shape[0]),
+        'account_return': round(float(account_total) * 100, 2),
+        'benchmark_return': round(float(index_total) * 100, 2),
+        'excess_return': round(float(account_total - index_total) * 100, 2),
+        'tracking_error': round(tracking_error * 100, 2),
+        'beta': round(beta, 3),
+        'information_ratio': round(information_ratio, 3),
+        'series': [
+            {'date': date, 'account': a, 'benchmark': b}
+            for date, a, b in zip(
+                np.datetime_as_string(dates).tolist(),
+                np.round(account_curve, 2).tolist(),
+                np.round(index_curve, 2).tolist()
+            )
+        ]
+    }
@@ -0,0 +1,139 @@
+"""
+地区收益计算
+根据快照中保存的每日持仓，按 get_stock_regions 将持仓分组，计算各地区在时间窗口内的时间加权收益率：
+
+    第t天地区r的收益 = Σ 前一天持仓数量 × 当天价格 / Σ 前一天持仓数量 × 前一天价格 - 1
+    （价格 = 快照中的市值 / 持仓数量，只统计两天都有价格的股票，买卖不计入收益）
+    窗口收益 = Π(1 + 每日收益) - 1
+
+全部持仓先展开成 日期 × 股票 的数量矩阵和价格矩阵，每日各地区的期初/期末市值
+用一次 bincount 分组求和得到，不按地区、按日期循环。
+
+结果按 (账户, 时间窗口) 缓存，并记录计算时的最新快照版本，有新快照写入时自动失效。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 缓存的最大结果数量（LRU淘汰）
+REGION_RETURN_CACHE_SIZE = getattr(settings, 'REGION_RETURN_CACHE_SIZE', 256)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compute_region_returns(position_history, regions_of=None):
+    """
+    计算各地区的时间加权收益率
+
+    参数:
+        position_history: get_position_history 的结果（按日期升序）
+        regions_of: 股票代码列表 → 地区列表 的批量分类函数，默认 get_stock_regions
+
+    返回:
+        dict: {地区: {'return_rate': 百分比, 'days': 参与计算的天数}}
+    """
+    if regions_of is None:
+        from apps.utils.stock_info import get_stock_regions
+        regions_of = get_stock_regions
+
+    # 展开为长表：日期序号、股票序号、数量、市值
+    code_index = {}
+    date_idx, code_idx, volumes, market_values = [], [], [], []
+    for t, snapshot in enumerate(position_history):
+        for pos in snapshot['positions']:
+            volume = pos.get('volume') or 0
+            if volume <= 0:
+                continue
+            date_idx.append(t)
+            code_idx.append(code_index.setdefault(pos['stock_code'], len(code_index)))
+            volumes.append(volume)
+            market_values.append(pos.get('market_value') or 0.0)
+
+    num_dates = len(position_history)
+    if num_dates < 2 or not code_index:
+        return {}
+
+    codes = list(code_index)
+    region_names, region_idx = np.unique(regions_of(codes), return_inverse=True)
+
+    date_idx = np.asarray(date_idx)
+    code_idx = np.asarray(code_idx)
+    volume_matrix = np.zeros((num_dates, len(codes)))
+    price_matrix = np.full((num_dates, len(codes)), np.nan)
+    volume_matrix[date_idx, code_idx] = volumes
+    price_matrix[date_idx, code_idx] = np.asarray(market_values, dtype=np.float64) / np.asarray(volumes, dtype=np.float64)
+
+    # 前一天的持仓在前一天/当天的市值（当天已卖出、没有价格的股票不计入）
+    held = volume_matrix[:-1]
+    valid = (held > 0) & np.isfinite(price_matrix[:-1]) & np.isfinite(price_matrix[1:])
+    begin = np.where(valid, held * np.nan_to_num(price_matrix[:-1]), 0.0)
+    end = np.where(valid, held * np.nan_to_num(price_matrix[1:]), 0.0)
+
+    # 按 (日期, 地区) 分组求和
+    num_regions = len(region_names)
+    group = (np.arange(num_dates - 1)[:, None] * num_regions + region_idx[None, :]).ravel()
+    size = (num_dates - 1) * num_regions
+    begin_by_group = np.bincount(group, weights=begin.ravel(), minlength=size).reshape(num_dates - 1, num_regions)
+    end_by_group = np.bincount(group, weights=end.ravel(), minlength=size).reshape(num_dates - 1, num_regions)
+
+    active = begin_by_group > 0
+    growth = np.ones_like(begin_by_group)
+    np.divide(end_by_group, begin_by_group, out=growth, where=active)
+    total_return = np.prod(growth, axis=0) - 1
+    active_days = active.sum(axis=0)
+
+    return {
+        str(region): {
+            'return_rate': round(float(total_return[r]) * 100, 2),
+            'days': int(active_days[r])
+        }
+        for r, region in enumerate(region_names)
+        if active_days[r] > 0
+    }
+
+
+def get_region_returns(account_id, days=30):
+    """
+    获取账户各地区在最近days天的收益率（按快照版本缓存）
+
+    返回:
+        dict: compute_region_returns 的结果，没有持仓历史时为空字典
+    """
+    from apps.utils.data_storage import get_latest_snapshot_version, get_position_history
+
+    key = (str(account_id), days)
+    version = get_latest_snapshot_version(account_id)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    returns = compute_region_returns(get_position_history(account_id, days=days))
+
+    # 没有快照版本（数据库不可用或无数据）时不缓存
+    if version is not None:
+        with _cache_lock:
+            _cache[key] = (version, returns)
+            _cache.move_to_end(key)
+            while len(_cache) > REGION_RETURN_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return returns
+
+
+def invalidate_region_returns(account_id=None):
+    """清除地区收益缓存（account_id为None时清除全部）"""
+    with _cache_lock:
+        if account_id is None:
+            _cache.clear()
+            return
+        for key in [key for key in _cache if key[0] == str(account_id)]:
+            del _cache[key]
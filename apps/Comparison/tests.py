@@ -1,3 +1,69 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from apps.utils.periods import bucket_history, period_range
+
+
+class BucketHistoryTest(SimpleTestCase):
+    """按时间粒度分组账户历史"""
+
+    def test_month_buckets(self):
+        dates = ['2024-01-02', '2024-01-31', '2024-02-01', '2024-02-29', '2024-03-01']
+        total_assets = [100.0, 110.0, 200.0, 180.0, 300.0]
+        market_values = [50.0, 55.0, 100.0, 90.0, 0.0]
+
+        buckets = bucket_history(dates, total_assets, market_values, 'month')
+
+        self.assertEqual([bucket['timePeriod'] for bucket in buckets], ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(buckets[0], {
+            'timePeriod': '2024-01',
+            'startDate': '2024-01-02',
+            'endDate': '2024-01-31',
+            'firstAssets': 100.0,
+            'totalAssets': 110.0,
+            'returnRate': 10.0,
+            'investmentRate': 50.0,
+            'count': 2
+        })
+        self.assertEqual(buckets[1]['endDate'], '2024-02-29')
+        self.assertEqual(buckets[1]['returnRate'], -10.0)
+        self.assertEqual(buckets[2]['returnRate'], 0.0)
+        self.assertEqual(buckets[2]['investmentRate'], 0.0)
+
+    def test_unsorted_input_keeps_same_day_order(self):
+        dates = ['2025-03-05', '2025-03-03', '2025-03-05', '2025-03-03']
+        total_assets = [300.0, 100.0, 310.0, 120.0]
+        market_values = [0.0, 0.0, 0.0, 0.0]
+
+        buckets = bucket_history(dates, total_assets, market_values, 'day')
+
+        self.assertEqual([bucket['timePeriod'] for bucket in buckets], ['2025-03-03', '2025-03-05'])
+        self.assertEqual((buckets[0]['firstAssets'], buckets[0]['totalAssets']), (100.0, 120.0))
+        self.assertEqual((buckets[1]['firstAssets'], buckets[1]['totalAssets']), (300.0, 310.0))
+        self.assertEqual([bucket['count'] for bucket in buckets], [2, 2])
+
+    def test_iso_week_labels(self):
+        # 2024-12-30（周一）属于2025年第1周，2021-01-03（周日）属于2020年第53周
+        dates = ['2020-12-28', '2021-01-03', '2021-01-04', '2024-12-30', '2025-01-05']
+        buckets = bucket_history(dates, [1.0] * 5, [0.0] * 5, 'week')
+
+        self.assertEqual([bucket['timePeriod'] for bucket in buckets], ['2020-W53', '2021-W01', '2025-W01'])
+        self.assertEqual([bucket['count'] for bucket in buckets], [2, 1, 2])
+
+    def test_quarter_and_year_labels(self):
+        dates = ['2023-12-31', '2024-01-01', '2024-03-31', '2024-04-01']
+        quarters = bucket_history(dates, [1.0] * 4, [0.0] * 4, 'quarter')
+        years = bucket_history(dates, [1.0] * 4, [0.0] * 4, 'year')
+
+        self.assertEqual([bucket['timePeriod'] for bucket in quarters], ['2023-Q4', '2024-Q1', '2024-Q2'])
+        self.assertEqual([bucket['timePeriod'] for bucket in years], ['2023', '2024'])
+        self.assertEqual(years[1]['count'], 3)
+
+    def test_empty_and_invalid_granularity(self):
+        self.assertEqual(bucket_history([], [], [], 'month'), [])
+        with self.assertRaises(ValueError):
+            bucket_history(['2025-01-01'], [1.0], [0.0], 'hour')
+
+    def test_period_range(self):
+        self.assertEqual(period_range('2024-02-10', '2024-05-02', 'quarter'), ('2024-01-01', '2024-06-30'))
+        self.assertEqual(period_range('2024-02-29', None, 'week'), ('2024-02-26', None))
+        self.assertEqual(period_range(None, '2024-02-10', 'month'), (None, '2024-02-29'))
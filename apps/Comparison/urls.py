@@ -3,6 +3,8 @@ from .views import (
     asset_comparison,
     yearly_comparison,
     weekly_comparison,
+    benchmark_comparison,
+    period_comparison,
     area_comparison
 )
 
@@ -10,6 +12,8 @@ from .views import (
 timecomparison_urlpatterns = [
     path('yearly_comparison/', yearly_comparison, name='yearly_comparison'),
     path('weekly_comparison/', weekly_comparison, name='weekly_comparison'),
+    path('period_comparison/', period_comparison, name='period_comparison'),
+    path('benchmark_comparison/', benchmark_comparison, name='benchmark_comparison'),
 ]
 
 # 分市场对比模块路由
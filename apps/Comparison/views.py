@@ -1,3 +1,4 @@
+import math
 import time
 import datetime
 import logging
@@ -112,6 +113,7 @@ def weekly_comparison(request):
     周度对比接口
     API路径: /api/timecomparison/weekly_comparison/
     参数: account_id (必填)
+          weeks (可选，最近多少周，默认4)
     """
     logger.info('开始获取周度对比数据')
     
@@ -129,6 +131,19 @@ def weekly_comparison(request):
             }
         }, status=400)
     
+    try:
+        weeks = int(request.GET.get('weeks', 4))
+        if weeks <= 0:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': 'weeks必须是正整数'
+            }
+        }, status=400)
+    
     if use_mock:
         logger.info(f'使用模拟数据模式 - 账户ID: {account_id}')
         return get_mock_weekly_comparison()
@@ -139,7 +154,7 @@ def weekly_comparison(request):
         # 从数据库获取周度数据
         from apps.utils.data_storage import get_weekly_data
         
-        weekly_data_dict = get_weekly_data(account_id, weeks=4)
+        weekly_data_dict = get_weekly_data(account_id, weeks=weeks)
         
         if not weekly_data_dict:
             logger.warning('未找到周度历史数据，返回模拟数据')
@@ -228,6 +243,231 @@ def get_mock_weekly_comparison():
     return JsonResponse(mock_data)
 
 
+@api_view(['GET'])
+def period_comparison(request):
+    """
+    通用时间段对比接口（按任意粒度分组）
+    API路径: /api/timecomparison/period_comparison/
+    参数: account_id (必填)
+          granularity (可选，day/week/month/quarter/year，默认month)
+          start_date / end_date (可选，YYYY-MM-DD)
+          days (可选，未指定日期范围时取最近多少天，默认365)
+    返回与日期范围有交集的完整周期（首尾周期不按日期范围截断）
+    """
+    from apps.utils.periods import GRANULARITIES
+    
+    logger.info('开始获取时间段对比数据')
+    
+    # 检查是否使用模拟数据
+    use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    account_id = request.GET.get('account_id')
+    granularity = request.GET.get('granularity', 'month')
+    start_date = request.GET.get('start_date')
+    end_date = request.GET.get('end_date')
+    
+    if not account_id:
+        logger.error('缺少account_id参数')
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'MISSING_PARAMETER',
+                'message': '缺少account_id参数'
+            }
+        }, status=400)
+    
+    if granularity not in GRANULARITIES:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': f'granularity必须是 {"/".join(GRANULARITIES)} 之一'
+            }
+        }, status=400)
+    
+    try:
+        days = int(request.GET.get('days', 365))
+        if days <= 0:
+            raise ValueError
+        for value in (start_date, end_date):
+            if value:
+                datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': 'days必须是正整数，start_date/end_date格式为YYYY-MM-DD'
+            }
+        }, status=400)
+    
+    if use_mock:
+        logger.info(f'使用模拟数据模式 - 账户ID: {account_id}')
+        return get_mock_period_comparison(granularity, days)
+    
+    try:
+        logger.info(f'开始获取账户 {account_id} 的时间段对比数据（真实数据，粒度: {granularity}）')
+        
+        from apps.utils.data_storage import get_period_data
+        
+        period_data = get_period_data(account_id, granularity, start_date=start_date, end_date=end_date, days=days)
+        
+        if not period_data:
+            logger.warning('未找到时间段历史数据，返回模拟数据')
+            return get_mock_period_comparison(granularity, days)
+        
+        logger.info(f'成功获取 {len(period_data)} 个周期的数据')
+        return JsonResponse({
+            'granularity': granularity,
+            'period_data': period_data
+        })
+        
+    except Exception as e:
+        logger.error(f'获取时间段对比数据失败: {str(e)}', exc_info=True)
+        logger.info('发生错误，返回模拟数据')
+        return get_mock_period_comparison(granularity, days)
+
+
+def get_mock_period_comparison(granularity, days):
+    """
+    返回时间段对比模拟数据（模拟账户的每日历史按粒度分组）
+    """
+    from apps.utils.mock_data import mock_account_history
+    from apps.utils.periods import bucket_history
+    
+    logger.info('返回时间段对比模拟数据')
+    
+    history = mock_account_history(days)
+    period_data = bucket_history(
+        [record['date'] for record in history],
+        [record['total_assets'] for record in history],
+        [record['market_value'] for record in history],
+        granularity
+    )
+    
+    return JsonResponse({
+        'granularity': granularity,
+        'period_data': period_data,
+        'is_mock': True
+    })
+
+
+@api_view(['GET'])
+def benchmark_comparison(request):
+    """
+    账户与基准指数对比接口
+    API路径: /api/timecomparison/benchmark_comparison/
+    参数: account_id (必填)
+          benchmark (可选，基准指数代码，默认000300.SH，可选值见 BENCHMARK_INDEXES)
+          days (可选，对比的时间窗口，默认365天)
+    
+    指数收盘价只读本地日K线存储，请求中不访问迅投
+    """
+    from .benchmark import BENCHMARK_INDEXES, DEFAULT_BENCHMARK, BenchmarkDataError, compare_with_benchmark, load_benchmark_series
+    
+    logger.info('开始获取基准对比数据')
+    
+    # 检查是否使用模拟数据
+    use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    account_id = request.GET.get('account_id')
+    benchmark = request.GET.get('benchmark', DEFAULT_BENCHMARK)
+    
+    if not account_id:
+        logger.error('缺少account_id参数')
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'MISSING_PARAMETER',
+                'message': '缺少account_id参数'
+            }
+        }, status=400)
+    
+    if benchmark not in BENCHMARK_INDEXES:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': f'不支持的基准指数: {benchmark}，可选: {", ".join(BENCHMARK_INDEXES)}'
+            }
+        }, status=400)
+    
+    try:
+        days = int(request.GET.get('days', 365))
+        if days <= 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': 'days必须是大于1的整数'
+            }
+        }, status=400)
+    
+    if use_mock:
+        logger.info(f'使用模拟数据模式 - 账户ID: {account_id}')
+        return get_mock_benchmark_comparison(benchmark, days)
+    
+    try:
+        logger.info(f'开始获取账户 {account_id} 与 {benchmark} 的对比数据（真实数据）')
+        
+        from apps.utils.data_storage import get_account_history
+        
+        history = get_account_history(account_id, days=days)
+        if len(history) < 2:
+            logger.warning('账户历史数据不足，返回模拟数据')
+            return get_mock_benchmark_comparison(benchmark, days)
+        
+        index_dates, index_close = load_benchmark_series(benchmark, history[0]['date'], history[-1]['date'])
+        result = compare_with_benchmark(
+            [record['date'] for record in history],
+            [record['total_assets'] for record in history],
+            index_dates,
+            index_close
+        )
+        
+        return JsonResponse({
+            'benchmark': benchmark,
+            'benchmark_name': BENCHMARK_INDEXES[benchmark],
+            **result
+        })
+        
+    except BenchmarkDataError as e:
+        logger.warning(f'基准对比数据不足: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'BENCHMARK_DATA_UNAVAILABLE',
+                'message': str(e)
+            }
+        }, status=503)
+    except Exception as e:
+        logger.error(f'获取基准对比数据失败: {str(e)}', exc_info=True)
+        logger.info('发生错误，返回模拟数据')
+        return get_mock_benchmark_comparison(benchmark, days)
+
+
+def get_mock_benchmark_comparison(benchmark, days):
+    """
+    返回基准对比模拟数据（账户和指数都是模拟的每日序列）
+    """
+    from apps.utils.mock_data import mock_account_history, mock_values
+    from .benchmark import BENCHMARK_INDEXES, compare_with_benchmark
+    
+    logger.info('返回基准对比模拟数据')
+    
+    history = mock_account_history(days)
+    dates = [record['date'] for record in history]
+    index_close = mock_values(days, seed=7, base_value=4000.0)[0]
+    result = compare_with_benchmark(dates, [record['total_assets'] for record in history], dates, index_close)
+    
+    return JsonResponse({
+        'benchmark': benchmark,
+        'benchmark_name': BENCHMARK_INDEXES.get(benchmark, benchmark),
+        **result,
+        'is_mock': True
+    })
+
+
 # ==================== 分市场对比模块 ====================
 
 @api_view(['GET'])
@@ -236,6 +476,7 @@ def area_comparison(request):
     地区对比接口
     API路径: /api/areacomparsion/area_comparison/
     参数: account_id (必填)
+          days (可选，地区回报率的时间窗口，默认30天)
     
     ⚠️ 注意：这个接口的百分比必须是字符串格式并带%符号！
     """
@@ -255,6 +496,19 @@ def area_comparison(request):
             }
         }, status=400)
     
+    try:
+        days = int(request.GET.get('days', 30))
+        if days <= 0:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': 'days必须是正整数'
+            }
+        }, status=400)
+    
     if use_mock:
         logger.info(f'使用模拟数据模式 - 账户ID: {account_id}')
         return get_mock_area_comparison()
@@ -285,48 +539,39 @@ def area_comparison(request):
             logger.warning('未查询到持仓信息')
             return get_mock_area_comparison()
 
-        # 获取股票地区信息
-        from apps.utils.stock_info import get_stock_region
+        # 按地区分组汇总持仓市值（一次调用批量分类、一次分组求和）
+        from apps.utils.aggregation import aggregate
+        from apps.utils.stock_info import get_stock_regions
         
-        # 按地区汇总
-        region_data_dict = {}
         total_assets = float(asset.total_asset)
+        region_groups = aggregate(
+            [pos.stock_code for pos in positions],
+            [float(pos.market_value) for pos in positions],
+            key_func=get_stock_regions,
+            total=total_assets
+        )
         
-        for pos in positions:
-            stock_code = pos.stock_code
-            market_value = float(pos.market_value)
-            region = get_stock_region(stock_code)
-            
-            if region not in region_data_dict:
-                region_data_dict[region] = {
-                    'totalAssets': 0.0,
-                    'market_values': []
-                }
-            
-            region_data_dict[region]['totalAssets'] += market_value
-            region_data_dict[region]['market_values'].append(market_value)
+        # 地区回报率：根据快照中的每日持仓计算时间窗口内的时间加权收益（按快照版本缓存）
+        from .region_returns import get_region_returns
+        try:
+            region_returns = get_region_returns(account_id, days=days)
+        except Exception as e:
+            logger.warning(f'计算地区回报率失败: {str(e)}')
+            region_returns = {}
         
-        # 计算回报率和投资占比
-        # 注意：地区回报率需要从历史数据计算，这里简化处理
+        # 回报率和投资占比（分组结果已按总资产降序排序）
         region_data_list = []
-        for region, data in region_data_dict.items():
-            total_region_assets = data['totalAssets']
-            investment_rate = (total_region_assets / total_assets * 100) if total_assets > 0 else 0
-            
-            # 计算回报率（简化：使用平均值，实际应该从历史数据计算）
-            # 这里先使用一个估算值，实际应该从历史数据计算
-            return_rate = 8.0  # TODO: 从历史数据计算真实回报率
+        for group in region_groups:
+            # 没有足够持仓历史的地区回报率为0
+            return_rate = region_returns.get(group['key'], {}).get('return_rate', 0.0)
             
             region_data_list.append({
-                'region': region,
-                'totalAssets': round(total_region_assets, 2),
+                'region': group['key'],
+                'totalAssets': round(group['sum'], 2),
                 'returnRate': f'{return_rate:.1f}%',  # 字符串格式，带%符号
-                'investmentRate': f'{investment_rate:.2f}%'  # 字符串格式，带%符号
+                'investmentRate': f'{group["weight"]:.2f}%'  # 字符串格式，带%符号
             })
         
-        # 按总资产降序排序
-        region_data_list.sort(key=lambda x: x['totalAssets'], reverse=True)
-        
         logger.info(f'成功获取 {len(region_data_list)} 个地区的数据')
         return JsonResponse({
             'region_data': region_data_list
@@ -460,54 +705,49 @@ def asset_comparison(request):
         # 获取股票代码列表，用于查询股票名称
         stock_codes = [pos.stock_code for pos in positions]
         
-        # 尝试从xtdata获取股票名称
-        stock_names = {}
+        # 从合约信息缓存批量获取股票名称（缓存未命中时才访问xtdata）
+        from apps.utils.instrument_cache import get_instrument_names
         try:
-            for stock_code in stock_codes:
-                try:
-                    # 使用xtdata获取股票信息
-                    instrument_detail = xtdata.get_instrument_detail(stock_code)
-                    if instrument_detail and hasattr(instrument_detail, 'InstrumentName'):
-                        stock_names[stock_code] = instrument_detail.InstrumentName
-                    else:
-                        # 如果获取失败，使用股票代码作为名称
-                        stock_names[stock_code] = stock_code
-                except Exception as e:
-                    logger.warning(f'获取股票 {stock_code} 名称失败: {str(e)}')
-                    stock_names[stock_code] = stock_code
+            stock_names = get_instrument_names(stock_codes)
         except Exception as e:
             logger.warning(f'批量获取股票名称失败: {str(e)}')
-            # 如果批量获取失败，为每个股票代码设置默认名称
-            for stock_code in stock_codes:
-                stock_names[stock_code] = stock_code
+            stock_names = {stock_code: stock_code for stock_code in stock_codes}
         
-        for pos in positions:
-            stock_code = pos.stock_code  # 股票代码
-            stock_name = stock_names.get(stock_code, stock_code)  # 股票名称
-            market_value = float(pos.market_value)  # 市值
-            avg_price = float(pos.avg_price)  # 成本价
-            latest_price = float(pos.open_price)  # 最新价
-
-            # 计算各支股票的资产占比
-            asset_ratio = (market_value / total_market_value * 100) if total_market_value > 0 else 0
-
-            # 计算当日涨幅（收益率）
-            daily_return = ((latest_price - avg_price) / avg_price) * 100 if avg_price > 0 else 0
+        # 各支股票的资产占比（同一代码多条持仓合并）
+        from apps.utils.aggregation import aggregate
+        stock_groups = aggregate(stock_codes, [float(pos.market_value) for pos in positions], total=total_market_value)
+        
+        # 从行情缓存批量获取最新价和当日涨幅（一次调用，不逐只查询行情）
+        from apps.utils.quote_cache import get_intraday_returns
+        try:
+            _, intraday_returns = get_intraday_returns(stock_codes)
+        except Exception as e:
+            logger.warning(f'批量获取最新行情失败: {str(e)}')
+            intraday_returns = [math.nan] * len(stock_codes)
+        
+        # 当日涨幅：最新价相对昨收；取不到行情时为None（前端显示为空，不用成本价估算）
+        daily_returns = {
+            pos.stock_code: None if math.isnan(intraday_return) else round(float(intraday_return), 2)
+            for pos, intraday_return in zip(positions, intraday_returns)
+        }
 
+        # 分组结果已按市值降序排序
+        for group in stock_groups:
+            stock_code = group['key']  # 股票代码
+            asset_ratio = group['weight']
+            daily_return = daily_returns[stock_code]
             pos_data = {
                 'stock_code': stock_code,
-                'stock_name': stock_name,
-                'market_value': round(market_value, 2),
+                'stock_name': stock_names.get(stock_code, stock_code),  # 股票名称
+                'market_value': round(group['sum'], 2),
                 'asset_ratio': round(asset_ratio, 2),
                 'percentage': round(asset_ratio, 2),  # 兼容字段
-                'daily_return': round(daily_return, 2),
-                'profit_loss_rate': round(daily_return, 2)  # 兼容字段
+                'daily_return': daily_return,
+                'profit_loss_rate': daily_return,  # 兼容字段
+                'quote_stale': daily_return is None  # 没有取到最新行情
             }
             pos_list.append(pos_data)
 
-        # 按市值降序排序
-        pos_list.sort(key=lambda x: x['market_value'], reverse=True)
-
         # 返回结果，同时支持asset_data和positions字段名（前端兼容）
         return JsonResponse({
             'total_market_value': round(total_market_value, 2),
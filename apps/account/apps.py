@@ -1,7 +1,30 @@
 from django.apps import AppConfig
+from django.conf import settings
+import os
+import sys
 import threading
 
 
+def is_serving_process():
+    """
+    当前进程是否为提供接口服务的进程（只有服务进程启动后台线程）
+
+    - settings.START_BACKGROUND_TASKS 为 True/False 时以配置为准
+    - manage.py runserver：只有自动重载的子进程（RUN_MAIN=true）或 --noreload 的进程
+    - manage.py 的其他命令（migrate、shell、各管理命令等）：否，需要迅投的命令自行初始化
+    - 其他方式启动（gunicorn、uwsgi、daphne 等导入WSGI/ASGI应用）：是
+    """
+    configured = getattr(settings, 'START_BACKGROUND_TASKS', None)
+    if configured is not None:
+        return bool(configured)
+
+    if os.path.basename(sys.argv[0]) not in ('manage.py', 'django-admin', 'django-admin.py'):
+        return True
+    if len(sys.argv) > 1 and sys.argv[1] == 'runserver':
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return False
+
+
 class AccountConfig(AppConfig):
     """
     账户应用配置类
@@ -11,6 +34,10 @@ class AccountConfig(AppConfig):
     name = 'account'
 
     def ready(self):
+        # 管理命令和 runserver 的自动重载父进程不启动后台线程
+        if not is_serving_process():
+            return
+        
         # 使用统一的初始化模块（避免重复初始化）
         from apps.utils.xt_init import init_xtdatacenter_once
         
@@ -18,3 +45,15 @@ class AccountConfig(AppConfig):
         # init_xtdatacenter_once 内部有锁机制，确保只初始化一次
         thread = threading.Thread(target=init_xtdatacenter_once, daemon=True)
         thread.start()
+        
+        # 加载本地合约信息缓存，并启动每个交易日一次的后台刷新
+        from apps.utils.instrument_cache import start_instrument_cache
+        start_instrument_cache()
+        
+        # 启动本地日K线存储的每日增量同步
+        from apps.utils.kline_store import start_kline_store
+        start_kline_store()
+        
+        # 后台分批为旧快照补写整数日期键 date_key（已完成时直接返回）
+        from apps.utils.snapshot_dates import start_date_key_migration
+        start_date_key_migration()
@@ -0,0 +1,40 @@
+"""
+补齐已结束周期的统计存储
+为全部账户（或指定账户）计算每个已结束的周、月、季度、年并保存到 period_summaries，
+之后年度/周度/时间段对比接口只需要重新计算当前未结束的周期。已保存的周期不会重复计算。
+
+用法:
+    python manage.py backfill_period_summaries
+    python manage.py backfill_period_summaries --accounts 123456 --granularities year week
+    python manage.py backfill_period_summaries --rebuild          # 删除后重新计算（快照被修正后使用）
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.data_storage import get_all_account_ids
+from apps.utils.period_store import STORED_GRANULARITIES, delete_period_summaries, refresh_period_summaries
+
+
+class Command(BaseCommand):
+    help = '为已有历史补齐已结束周期的统计结果'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', nargs='*', default=None, help='账户ID列表，默认为全部有快照的账户')
+        parser.add_argument('--granularities', nargs='*', default=list(STORED_GRANULARITIES), choices=STORED_GRANULARITIES, help='粒度，默认全部')
+        parser.add_argument('--rebuild', action='store_true', help='先删除已保存的统计再重新计算')
+
+    def handle(self, *args, **options):
+        account_ids = options['accounts'] or get_all_account_ids()
+        granularities = options['granularities']
+
+        total = 0
+        for account_id in account_ids:
+            for granularity in granularities:
+                if options['rebuild']:
+                    delete_period_summaries(account_id, granularity)
+                _, saved = refresh_period_summaries(account_id, granularity)
+                total += saved
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已处理 {len(account_ids)} 个账户（{"/".join(granularities)}），新保存 {total} 个已结束周期'
+        ))
@@ -0,0 +1,35 @@
+"""
+为账户快照补写整数日期键 date_key（yyyymmdd）
+服务启动时会在后台自动执行同样的迁移，本命令用于在维护窗口内同步执行或查看进度。
+迁移完成前没有 date_key 的快照按旧的 date 字符串查询，完成后只按 date_key。
+--drop-legacy 会再次确认全部快照都有 date_key，否则拒绝删除。
+
+用法:
+    python manage.py migrate_snapshot_dates
+    python manage.py migrate_snapshot_dates --batch-size 5000 --pause 0
+    python manage.py migrate_snapshot_dates --drop-legacy    # 迁移完成后删除旧的 date 字段
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.snapshot_dates import drop_legacy_dates, migrate_date_keys
+
+
+class Command(BaseCommand):
+    help = '分批为账户快照补写整数日期键 date_key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='每批快照数，默认 DATE_KEY_MIGRATION_BATCH_SIZE')
+        parser.add_argument('--pause', type=float, default=None, help='每批之间暂停的秒数，默认 DATE_KEY_MIGRATION_PAUSE')
+        parser.add_argument('--drop-legacy', action='store_true', help='迁移完成后删除快照中的 date 字符串字段')
+
+    def handle(self, *args, **options):
+        def progress(migrated, remaining):
+            self.stdout.write(f'已迁移 {migrated} 条，剩余 {remaining} 条')
+
+        migrated = migrate_date_keys(batch_size=options['batch_size'], pause=options['pause'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'快照日期迁移完成，本次补写 {migrated} 条 date_key'))
+
+        if options['drop_legacy']:
+            modified = drop_legacy_dates()
+            self.stdout.write(self.style.SUCCESS(f'已删除 {modified} 条快照的 date 字段'))
@@ -0,0 +1,35 @@
+"""
+重建股票地区/交易所/板块分类表
+等待启动预热（全A股合约信息和板块成分股）完成后，重新生成 data/cache/stock_classifier.npz
+
+用法:
+    python manage.py rebuild_stock_classifier                 # 等待预热完成后重建
+    python manage.py rebuild_stock_classifier --timeout 1800  # 最多等待30分钟
+    python manage.py rebuild_stock_classifier --cached-only   # 不等待预热，只用已缓存的合约信息
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.utils.stock_info import STOCK_CLASSIFIER_PATH, rebuild_stock_classifier
+
+
+class Command(BaseCommand):
+    help = '根据合约信息和迅投地域板块重建股票分类表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=600, help='等待预热完成的最长时间（秒），默认600')
+        parser.add_argument('--cached-only', action='store_true', help='不等待预热，只使用本地已缓存的合约信息')
+
+    def handle(self, *args, **options):
+        if not options['cached_only']:
+            from apps.utils.metadata_warmup import get_warmup_status, wait_until_ready
+            from apps.utils.xt_init import init_xtdatacenter_once
+
+            init_xtdatacenter_once()
+            self.stdout.write('等待合约信息和板块成分股预热完成...')
+            if not wait_until_ready(options['timeout']):
+                status = get_warmup_status()
+                raise CommandError(f"预热未完成（状态 {status['state']}，阶段 {status['phase']}，{status['progress']}%）")
+
+        table = rebuild_stock_classifier()
+        self.stdout.write(self.style.SUCCESS(f'分类表已重建: {len(table)} 只股票，保存到 {STOCK_CLASSIFIER_PATH}'))
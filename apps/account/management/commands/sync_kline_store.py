@@ -0,0 +1,42 @@
+"""
+同步本地日K线存储
+下载并追加日线到 data/kline/1d，已有数据的股票只追加最后一个交易日之后的部分。
+服务运行时每个交易日收盘后会自动同步已存储的股票，本命令用于首次建库或补充新股票。
+
+用法:
+    python manage.py sync_kline_store                            # 最近30天持仓过的股票 + 已存储的股票
+    python manage.py sync_kline_store --codes 600519.SH 000300.SH
+    python manage.py sync_kline_store --start 20150101           # 新股票从2015年开始下载
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.data_storage import get_held_stock_codes
+from apps.utils.kline_store import KLINE_STORE_DIR, stored_codes, sync_klines
+
+
+class Command(BaseCommand):
+    help = '批量下载并增量追加日K线到本地存储'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--codes', nargs='*', default=None, help='股票代码列表，默认为最近持仓过的股票和已存储的股票')
+        parser.add_argument('--days', type=int, default=30, help='默认代码列表包含最近多少天内持仓过的股票，默认30')
+        parser.add_argument('--start', default='', help='本地没有数据的股票从该日期开始下载（YYYYMMDD），默认全部历史')
+
+    def handle(self, *args, **options):
+        from apps.utils.xt_init import init_xtdatacenter_once
+
+        # 管理命令中不会自动启动迅投初始化
+        init_xtdatacenter_once()
+
+        codes = options['codes']
+        if not codes:
+            codes = sorted(set(get_held_stock_codes(options['days'])) | set(stored_codes()))
+
+        appended = sync_klines(codes, start_time=options['start'])
+        self.stdout.write(self.style.SUCCESS(
+            f'已同步 {len(appended)} 只股票，追加 {sum(appended.values())} 行，存储目录 {KLINE_STORE_DIR}'
+        ))
+        empty = [code for code, rows in appended.items() if rows == 0]
+        if empty:
+            self.stdout.write(f"没有新数据: {', '.join(empty[:20])}{' ...' if len(empty) > 20 else ''}")
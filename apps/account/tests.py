@@ -1,3 +1,117 @@
-from django.test import TestCase
+import time
+from datetime import date, datetime
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.utils import snapshot_dates
+from apps.utils.snapshot_dates import (
+    date_condition,
+    date_key_to_iso,
+    date_keys_to_datetime64,
+    drop_legacy_dates,
+    snapshot_days,
+    to_date_key
+)
+
+
+class DateKeyTest(SimpleTestCase):
+    """整数日期键与日期之间的转换"""
+
+    def test_round_trip(self):
+        days = np.arange(np.datetime64('1899-12-25'), np.datetime64('2101-01-10'))
+        keys = np.array([to_date_key(str(day)) for day in days], dtype=np.int64)
+
+        np.testing.assert_array_equal(date_keys_to_datetime64(keys), days)
+        self.assertEqual([date_key_to_iso(key) for key in keys[::97]], [str(day) for day in days[::97]])
+
+    def test_month_and_leap_year_edges(self):
+        keys = [20240131, 20240201, 20240228, 20240229, 20240301, 20231231, 20240101,
+                20000229, 20000301, 19000228, 19000301, 21000228, 21000301]
+        expected = np.array([date_key_to_iso(key) for key in keys], dtype='datetime64[D]')
+
+        np.testing.assert_array_equal(date_keys_to_datetime64(keys), expected)
+        # 1900年和2100年不是闰年，2000年是
+        np.testing.assert_array_equal(
+            np.diff(date_keys_to_datetime64([19000228, 19000301, 20000228, 20000301, 21000228, 21000301]))[::2],
+            np.array([1, 2, 1], dtype='timedelta64[D]')
+        )
+
+    def test_to_date_key_inputs(self):
+        self.assertEqual(to_date_key('2024-02-29'), 20240229)
+        self.assertEqual(to_date_key('2024-02-29T15:00:00'), 20240229)
+        self.assertEqual(to_date_key(date(2024, 2, 29)), 20240229)
+        self.assertEqual(to_date_key(datetime(2024, 2, 29, 15, 0)), 20240229)
+        self.assertEqual(to_date_key(np.datetime64('2024-02-29')), 20240229)
+
+    def test_snapshot_days_mixes_keys_and_legacy_dates(self):
+        snapshots = [{'date_key': 20250102}, {'date': '2025-01-03'}, {'date_key': 20250106, 'date': '2025-01-06'}]
+        np.testing.assert_array_equal(
+            snapshot_days(snapshots),
+            np.array(['2025-01-02', '2025-01-03', '2025-01-06'], dtype='datetime64[D]')
+        )
+
+
+class DateConditionTest(SimpleTestCase):
+    """迁移完成前后的快照日期查询条件"""
+
+    def test_before_migration(self):
+        # 刚检查过迁移状态，不会读取数据库
+        with mock.patch.object(snapshot_dates, '_migrated', False), \
+                mock.patch.object(snapshot_dates, '_checked_at', time.monotonic()):
+            self.assertEqual(date_condition('2025-01-01', '2025-12-31'), {'$or': [
+                {'date_key': {'$gte': 20250101, '$lte': 20251231}},
+                {'date_key': {'$exists': False}, 'date': {'$gte': '2025-01-01', '$lte': '2025-12-31'}}
+            ]})
+            self.assertEqual(date_condition('2025-01-01', inclusive=False), {'$or': [
+                {'date_key': {'$gt': 20250101}},
+                {'date_key': {'$exists': False}, 'date': {'$gt': '2025-01-01'}}
+            ]})
+
+    def test_after_migration(self):
+        with mock.patch.object(snapshot_dates, '_migrated', True):
+            self.assertEqual(date_condition('2025-01-01', '2025-12-31'), {'date_key': {'$gte': 20250101, '$lte': 20251231}})
+            self.assertEqual(date_condition(end=date(2025, 6, 30)), {'date_key': {'$lte': 20250630}})
+            self.assertEqual(date_condition(), {})
+
+
+class DropLegacyDatesTest(SimpleTestCase):
+    """删除旧 date 字段前的检查"""
+
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.db.schema_migrations.find_one.return_value = {'_id': snapshot_dates.DATE_KEY_MIGRATION_ID, 'completed_at': datetime(2025, 1, 1)}
+        patches = (
+            mock.patch('apps.utils.db.get_mongodb_db', return_value=self.db),
+            mock.patch.object(snapshot_dates, '_migrated', False),
+            mock.patch.object(snapshot_dates, '_checked_at', 0.0),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_refuses_while_snapshots_lack_date_key(self):
+        self.db.account_snapshots.count_documents.return_value = 3
+
+        with self.assertRaises(RuntimeError):
+            drop_legacy_dates()
+        self.db.account_snapshots.count_documents.assert_called_once_with({'date_key': {'$exists': False}})
+        self.db.account_snapshots.update_many.assert_not_called()
+
+    def test_refuses_before_migration_completes(self):
+        self.db.schema_migrations.find_one.return_value = None
+
+        with self.assertRaises(RuntimeError):
+            drop_legacy_dates()
+        self.db.account_snapshots.update_many.assert_not_called()
+
+    def test_drops_dates_after_migration(self):
+        self.db.account_snapshots.count_documents.return_value = 0
+        self.db.account_snapshots.update_many.return_value.modified_count = 5
+
+        self.assertEqual(drop_legacy_dates(), 5)
+        self.db.account_snapshots.update_many.assert_called_once_with(
+            {'date': {'$exists': True}, 'date_key': {'$exists': True}},
+            {'$unset': {'date': ''}}
+        )
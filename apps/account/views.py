@@ -90,11 +90,22 @@ def get_account_info(request):
                 # 自动保存账户快照到数据库（用于历史数据查询）
                 try:
                     from apps.utils.data_storage import save_account_snapshot
-                    save_account_snapshot(asset.account_id, account_data)
+                    # 快照保存全部持仓（接口只返回前10条），用于按持仓计算地区收益等
+                    save_account_snapshot(asset.account_id, {
+                        **account_data,
+                        'positions': convert_positions(positions, asset.account_id, limit=None)
+                    })
                 except Exception as e:
                     logger.warning(f'保存账户快照失败: {str(e)}')
                     # 不影响主流程，只记录警告
                 
+                # 用完整的资产和持仓校准实时风险告警引擎
+                try:
+                    from apps.risk_threshold.alerts import load_account_positions
+                    load_account_positions(asset.account_id, asset.total_asset, positions)
+                except Exception as e:
+                    logger.warning(f'校准风险告警引擎失败: {str(e)}')
+                
             except Exception as e:
                 logger.error(f'处理账户 {acc} 时出错: {str(e)}', exc_info=True)
                 continue
@@ -108,12 +119,12 @@ def get_account_info(request):
         return get_mock_account_info()
 
 
-def convert_positions(positions, account_id):
+def convert_positions(positions, account_id, limit=10):
     """
     转换持仓数据为前端需要的格式
     - 数据类型转换（避免序列化错误）
     - 按市值降序排序
-    - 返回前10条记录
+    - 返回前limit条记录（limit为None时返回全部，供风险分析使用）
     """
     if not positions:
         return []
@@ -144,8 +155,8 @@ def convert_positions(positions, account_id):
     # 按市值降序排序
     pos_list.sort(key=lambda x: x['market_value'], reverse=True)
     
-    # 返回前10条（前端需求）
-    return pos_list[:10]
+    # 默认返回前10条（前端需求）
+    return pos_list[:limit] if limit is not None else pos_list
 
 
 def get_mock_account_info():
@@ -155,7 +166,17 @@ def get_mock_account_info():
     """
     logger.info('返回模拟账户数据')
     
-    mock_data = {
+    return JsonResponse(mock_account_data())
+
+
+def mock_account_data():
+    """
+    模拟账户数据（每次返回新的dict，调用方可以修改）
+
+    返回:
+        dict: {'accounts': [...]}，格式与 /api/account-info/ 的返回相同
+    """
+    return {
         'accounts': [
             {
                 'account_id': 'DEMO000001',
@@ -281,8 +302,6 @@ def get_mock_account_info():
             }
         ]
     }
-    
-    return JsonResponse(mock_data)
 
 
 @api_view(['GET'])
@@ -292,11 +311,27 @@ def get_asset_category(request):
     API文档: /api/asset-category/
     根据股票所属行业/板块进行分类统计
     符合前端数据格式要求：使用categories字段，category和totalAssets字段名
+    
+    参数:
+        mode: type（默认，股票/现金）或 industry（按行业板块汇总持仓，现金单独一类）
+        prefix: industry模式下行业板块的名称前缀，默认 SW1（申万一级）
     """
     logger.info('获取资产分类数据')
     
     # 检查是否使用模拟数据
     use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    mode = request.GET.get('mode', 'type')
+    
+    if mode == 'industry':
+        return get_industry_category(use_mock, request.GET.get('prefix'))
+    if mode != 'type':
+        return JsonResponse({
+            'success': False,
+            'error': {
+                'code': 'INVALID_PARAMETER',
+                'message': 'mode必须为type或industry'
+            }
+        }, status=400)
     
     if use_mock:
         # 模拟数据 - 符合前端格式要求
@@ -342,7 +377,7 @@ def get_asset_category(request):
                 ]
             })
 
-        # 汇总所有账户的数据
+        # 汇总所有账户的数据（只有两个固定类别，直接累加，不需要分组汇总）
         total_market_value = 0.0
         total_cash = 0.0
         
@@ -390,6 +425,82 @@ def get_asset_category(request):
         })
 
 
+def get_industry_category(use_mock, prefix=None):
+    """
+    按行业板块汇总全部账户的持仓市值（get_asset_category 的 industry 模式）
+    行业来自启动时加载、每个交易日刷新的股票 → 板块反向索引，每只持仓O(1)查询
+    
+    参数:
+        use_mock: 是否使用模拟数据
+        prefix: 行业板块名称前缀
+    """
+    if use_mock:
+        return JsonResponse({
+            'categories': [
+                {'category': '食品饮料', 'totalAssets': 1307050.00, 'percentage': 31.88},
+                {'category': '现金', 'totalAssets': 1250000.00, 'percentage': 30.49},
+                {'category': '银行', 'totalAssets': 816000.00, 'percentage': 19.90},
+                {'category': '非银金融', 'totalAssets': 637500.00, 'percentage': 15.55},
+                {'category': '其他', 'totalAssets': 89450.00, 'percentage': 2.18}
+            ]
+        })
+    
+    try:
+        logger.info('开始获取行业分类数据（真实数据）')
+        
+        xt_trader, connected = get_xt_trader_connection()
+        if not connected:
+            logger.error('连接交易接口失败')
+            logger.info('自动切换到模拟数据模式')
+            return get_industry_category(True)
+        
+        accounts = xt_trader.query_account_infos()
+        if not accounts:
+            logger.warning('未查询到账户信息')
+            return JsonResponse({'categories': []})
+        
+        # 收集全部账户的持仓和现金，现金作为单独一类
+        stock_codes = []
+        market_values = []
+        total_cash = 0.0
+        
+        for acc in accounts:
+            try:
+                xt_trader.subscribe(acc)
+                asset = xt_trader.query_stock_asset(acc)
+                if asset:
+                    total_cash += float(asset.cash)
+                positions = xt_trader.query_stock_positions(acc)
+                for pos in positions or []:
+                    stock_codes.append(pos.stock_code)
+                    market_values.append(float(pos.market_value))
+            except Exception as e:
+                logger.warning(f'处理账户 {acc} 时出错: {str(e)}')
+                continue
+        
+        from apps.utils.aggregation import aggregate
+        from apps.utils.sector_cache import get_stock_industries
+        
+        industries = get_stock_industries(stock_codes, prefix)
+        groups = aggregate(industries + ['现金'], market_values + [total_cash])
+        
+        category_list = [
+            {
+                'category': group['key'],
+                'totalAssets': round(group['sum'], 2),
+                'percentage': round(group['weight'], 2)
+            }
+            for group in groups
+        ]
+        
+        logger.info(f'成功获取 {len(category_list)} 个行业分类')
+        return JsonResponse({'categories': category_list})
+    
+    except Exception as e:
+        logger.error(f'获取行业分类数据失败: {str(e)}', exc_info=True)
+        return get_industry_category(True)
+
+
 @api_view(['GET'])
 def get_region_data(request):
     """
@@ -461,12 +572,9 @@ def get_region_data(request):
             logger.warning('未查询到账户信息')
             return JsonResponse({'regions': []})
 
-        # 获取股票地区信息
-        from apps.utils.stock_info import get_stock_region
-        
-        # 按地区汇总
-        region_data_dict = {}
-        total_market_value = 0.0
+        # 收集全部账户的持仓代码和市值
+        stock_codes = []
+        market_values = []
         
         for acc in accounts:
             try:
@@ -474,31 +582,24 @@ def get_region_data(request):
                 positions = xt_trader.query_stock_positions(acc)
                 if positions:
                     for pos in positions:
-                        stock_code = pos.stock_code
-                        market_value = float(pos.market_value)
-                        region = get_stock_region(stock_code)
-                        
-                        if region not in region_data_dict:
-                            region_data_dict[region] = 0.0
-                        
-                        region_data_dict[region] += market_value
-                        total_market_value += market_value
+                        stock_codes.append(pos.stock_code)
+                        market_values.append(float(pos.market_value))
             except Exception as e:
                 logger.warning(f'处理账户 {acc} 时出错: {str(e)}')
                 continue
         
-        # 计算占比并转换为列表
-        region_list = []
-        for region, assets in region_data_dict.items():
-            percentage = (assets / total_market_value * 100) if total_market_value > 0 else 0
-            region_list.append({
-                'region': region,
-                'totalAssets': round(assets, 2),
-                'percentage': round(percentage, 2)
-            })
+        # 按地区分组汇总（一次调用批量分类、一次分组求和，结果已按总资产降序排序）
+        from apps.utils.aggregation import aggregate
+        from apps.utils.stock_info import get_stock_regions
         
-        # 按总资产降序排序
-        region_list.sort(key=lambda x: x['totalAssets'], reverse=True)
+        region_list = [
+            {
+                'region': group['key'],
+                'totalAssets': round(group['sum'], 2),
+                'percentage': round(group['weight'], 2)
+            }
+            for group in aggregate(stock_codes, market_values, key_func=get_stock_regions)
+        ]
         
         logger.info(f'成功获取 {len(region_list)} 个地区的数据')
         return JsonResponse({
@@ -530,9 +631,9 @@ def get_time_data(request):
     use_mock = request.GET.get('mock', 'true').lower() == 'true'
     
     if use_mock:
-        # 模拟数据 - 符合前端格式要求
-        import random
+        # 模拟数据 - 符合前端格式要求（按日期范围生成，结果可复现）
         from datetime import timedelta
+        from apps.utils.mock_data import mock_time_series
         
         # 如果没有指定日期，默认返回最近30天
         if not end_date:
@@ -540,27 +641,7 @@ def get_time_data(request):
         if not start_date:
             start_date = (datetime.datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         
-        # 生成时间序列数据
-        time_series = []
-        current_date = datetime.datetime.strptime(start_date, '%Y-%m-%d')
-        end_dt = datetime.datetime.strptime(end_date, '%Y-%m-%d')
-        base_value = 3800000.00
-        
-        while current_date <= end_dt:
-            # 添加随机波动
-            daily_change = random.uniform(-0.02, 0.02)  # -2% 到 +2%
-            base_value = base_value * (1 + daily_change)
-            
-            # 计算回报率（简化计算）
-            return_rate = (base_value - 3800000.00) / 3800000.00 * 100
-            
-            time_series.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'totalAssets': round(base_value, 2),
-                'returnRate': round(return_rate, 2)
-            })
-            
-            current_date += timedelta(days=1)
+        time_series = mock_time_series(start_date, end_date)
         
         return JsonResponse({
             'time_series': time_series
@@ -642,3 +723,16 @@ def get_time_data(request):
                 }
             ]
         })
+
+
+@api_view(['GET'])
+def get_metadata_status(request):
+    """
+    查询启动预热（全A股合约信息和板块成分股）的进度
+    
+    返回:
+        JsonResponse: get_warmup_status() 的结果，ready为True表示预热已完成
+    """
+    from apps.utils.metadata_warmup import get_warmup_status
+    
+    return JsonResponse(get_warmup_status())
@@ -0,0 +1,468 @@
+"""
+实时风险阈值告警引擎
+由交易回调（成交、持仓、资产）和行情推送驱动，每个事件以O(1)增量更新账户的实时资产，
+并按账户阈值判断以下指标：
+1. max_drawdown: 当前资产相对历史峰值的回撤(%)
+2. max_principal_loss: 当前资产相对初始资金的亏损率(%)
+3. var: 参数法日VaR(%)（95%置信水平，正态分布），与综合风险评估中 var_status 使用相同的警告/危险水平。
+   日收益率的均值和方差取自在线风险状态的Welford累计值，当天相对上一交易日收盘的收益率作为临时观测计入，
+   因此VaR随实时资产变化，每个事件仍为O(1)
+
+触发的告警经过去重（同一账户、指标、等级在去重窗口内只告警一次，等级升高立即告警）
+和限流（每个账户每分钟最多若干条）后进入内存队列，通过轮询或SSE接口读取。
+每个事件的处理耗时都会记录，用于统计评估延迟。
+
+峰值、初始资金、上一交易日收盘和日收益率的累计均值/方差取自快照写入时维护的在线风险状态（online_risk）。
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+
+from .var_engine import norm_ppf
+
+logger = logging.getLogger(__name__)
+
+# 默认阈值：(警告, 危险)，与综合风险评估中各指标状态的划分一致
+DEFAULT_ALERT_THRESHOLDS = {
+    'max_drawdown': (15, 25),
+    'max_principal_loss': (10, 20),
+    'var': (3, 5),
+}
+
+# 告警使用的VaR置信水平及对应的正态分位数
+ALERT_VAR_CONFIDENCE = 0.95
+_VAR_Z = float(norm_ppf(1 - ALERT_VAR_CONFIDENCE))
+
+# 按账户覆盖的阈值，例如 {'1000000365': {'max_drawdown': (10, 20)}}
+RISK_ALERT_THRESHOLDS = getattr(settings, 'RISK_ALERT_THRESHOLDS', {})
+
+# 告警队列长度（超出后丢弃最早的告警）
+ALERT_QUEUE_SIZE = getattr(settings, 'RISK_ALERT_QUEUE_SIZE', 1000)
+
+# 同一账户、指标、等级的去重窗口（秒）
+ALERT_DEDUP_SECONDS = getattr(settings, 'RISK_ALERT_DEDUP_SECONDS', 300)
+
+# 每个账户每分钟最多发出的告警数
+ALERT_RATE_LIMIT = getattr(settings, 'RISK_ALERT_RATE_LIMIT', 10)
+
+# 用于计算延迟分位数的最近事件数
+LATENCY_SAMPLE_SIZE = 1024
+
+INDICATOR_NAMES = {
+    'max_drawdown': '回撤',
+    'max_principal_loss': '本金亏损',
+    'var': 'VaR',
+}
+
+# 成交回调中的买入方向（48买 49卖）
+_OFFSET_FLAG_BUY = 48
+
+
+def get_account_thresholds(account_id):
+    """获取账户的告警阈值（默认阈值叠加账户覆盖）"""
+    return {**DEFAULT_ALERT_THRESHOLDS, **RISK_ALERT_THRESHOLDS.get(str(account_id), {})}
+
+
+class AccountMonitor:
+    """
+    单个账户的实时资产和风险基准
+
+    总资产 = 可用资金 + Σ持仓数量×最新价，价格或持仓变化时按差额增量更新持仓市值
+    """
+
+    def __init__(self, account_id):
+        self.account_id = account_id
+        self.cash = 0.0
+        self.volumes = {}
+        self.prices = {}
+        self.market_value = 0.0
+        self.peak = None
+        self.initial_capital = None
+        self.previous_close = None
+        # 截至上一交易日收盘的日收益率个数、均值和离差平方和（Welford）
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        # 收到完整的资产和持仓（load_account）之前总资产不可靠，不做判断
+        self.calibrated = False
+        self.thresholds = get_account_thresholds(account_id)
+        self._load_baseline()
+
+    def _load_baseline(self):
+        """从在线风险状态读取峰值、初始资金和上一交易日收盘"""
+        try:
+            from .online_risk import get_risk_state
+
+            state = get_risk_state(self.account_id)
+        except Exception as e:
+            logger.warning(f'读取账户 {self.account_id} 风险状态失败，使用首个事件作为基准: {str(e)}')
+            return
+        if state is None or state.current_date is None:
+            return
+
+        today = datetime.now().date().isoformat()
+        self.initial_capital = state.initial_capital
+        self.peak = state.peak
+        self.previous_close = state.last_close if state.current_date == today else state.current_value
+        if state.current_date != today and (self.peak is None or state.current_value > self.peak):
+            self.peak = state.current_value
+
+        # 状态中当天的值是临时的；当天之前的最后一个值已收盘，计入累计统计
+        committed = state if state.current_date == today else state._with_current()
+        self.return_count = committed.count
+        self.return_mean = committed.mean
+        self.return_m2 = committed.m2
+
+    @property
+    def total_asset(self):
+        return self.cash + self.market_value
+
+    def parametric_var(self, value):
+        """
+        参数法日VaR(%)：当天收益率作为临时观测计入Welford均值/方差（不修改累计值）
+
+        返回:
+            float: VaR比率，累计收益率不足时返回None
+        """
+        if not self.return_count or not self.previous_close:
+            return None
+        daily_return = (value - self.previous_close) / self.previous_close
+        count = self.return_count + 1
+        delta = daily_return - self.return_mean
+        mean = self.return_mean + delta / count
+        m2 = self.return_m2 + delta * (daily_return - mean)
+        return abs(mean + _VAR_Z * math.sqrt(m2 / count)) * 100
+
+    def set_position(self, stock_code, volume, price=None):
+        old_volume = self.volumes.get(stock_code, 0)
+        if price is None:
+            price = self.prices.get(stock_code, 0.0)
+        old_price = self.prices.get(stock_code, 0.0)
+        self.market_value += volume * price - old_volume * old_price
+        self.prices[stock_code] = price
+        if volume:
+            self.volumes[stock_code] = volume
+        else:
+            self.volumes.pop(stock_code, None)
+
+    def set_price(self, stock_code, price):
+        volume = self.volumes.get(stock_code, 0)
+        self.market_value += volume * (price - self.prices.get(stock_code, 0.0))
+        self.prices[stock_code] = price
+
+    def set_asset(self, total_asset):
+        """用资产回调校准资金部分（可用+冻结），使总资产与柜台一致"""
+        self.cash = total_asset - self.market_value
+
+    def load(self, total_asset, positions):
+        """用完整的资产和持仓重置状态"""
+        self.volumes = {}
+        self.prices = {}
+        self.market_value = 0.0
+        for stock_code, volume, market_value in positions:
+            if volume:
+                self.set_position(stock_code, volume, market_value / volume)
+        self.set_asset(total_asset)
+        self.calibrated = True
+
+    def evaluate(self):
+        """
+        计算当前指标并与阈值比较
+
+        返回:
+            list: [(indicator, level, value, threshold), ...]，只包含达到警告或危险的指标
+        """
+        value = self.total_asset
+        if not self.calibrated or value <= 0:
+            return []
+        if self.initial_capital is None:
+            self.initial_capital = value
+        if self.previous_close is None:
+            self.previous_close = value
+        if self.peak is None or value > self.peak:
+            self.peak = value
+
+        current = {
+            'max_drawdown': (self.peak - value) / self.peak * 100,
+            'max_principal_loss': (self.initial_capital - value) / self.initial_capital * 100,
+            'var': self.parametric_var(value),
+        }
+
+        breaches = []
+        for indicator, (warning, danger) in self.thresholds.items():
+            indicator_value = current.get(indicator)
+            if indicator_value is None:
+                continue
+            if indicator_value >= danger:
+                breaches.append((indicator, '危险', indicator_value, danger))
+            elif indicator_value >= warning:
+                breaches.append((indicator, '警告', indicator_value, warning))
+        return breaches
+
+
+class AlertEngine:
+    """风险告警引擎（线程安全，回调线程写入、接口线程读取）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._monitors = {}
+        self._holders = {}
+        self._alerts = deque(maxlen=ALERT_QUEUE_SIZE)
+        self._next_id = 1
+        self._last_emitted = {}
+        self._emit_times = {}
+        self._latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)
+        self._stats = {'events': 0, 'alerts': 0, 'deduplicated': 0, 'rate_limited': 0, 'total_latency': 0.0, 'max_latency': 0.0}
+
+    # ---------- 事件入口 ----------
+
+    def load_account(self, account_id, total_asset, positions):
+        """
+        账户校准事件：查询到账户的完整资产和持仓后调用
+
+        参数:
+            account_id: 账户ID
+            total_asset: 总资产
+            positions: [(stock_code, volume, market_value), ...]
+        """
+        account_id = str(account_id)
+
+        def apply(monitor):
+            for stock_code in monitor.volumes:
+                self._holders.get(stock_code, set()).discard(account_id)
+            monitor.load(total_asset, positions)
+            for stock_code in monitor.volumes:
+                self._holders.setdefault(stock_code, set()).add(account_id)
+        self._handle(account_id, apply)
+
+    def on_trade(self, account_id, stock_code, offset_flag, price, volume):
+        """成交事件：更新持仓数量和可用资金"""
+        account_id = str(account_id)
+
+        def apply(monitor):
+            signed = volume if offset_flag == _OFFSET_FLAG_BUY else -volume
+            monitor.cash -= signed * price
+            monitor.set_position(stock_code, monitor.volumes.get(stock_code, 0) + signed, price)
+            if monitor.volumes.get(stock_code):
+                self._holders.setdefault(stock_code, set()).add(account_id)
+            else:
+                self._holders.get(stock_code, set()).discard(account_id)
+        self._handle(account_id, apply)
+
+    def on_position(self, account_id, stock_code, volume, market_value):
+        """持仓事件：以柜台持仓为准"""
+        account_id = str(account_id)
+
+        def apply(monitor):
+            price = market_value / volume if volume else None
+            monitor.set_position(stock_code, volume, price)
+            if volume:
+                self._holders.setdefault(stock_code, set()).add(account_id)
+            else:
+                self._holders.get(stock_code, set()).discard(account_id)
+        self._handle(account_id, apply)
+
+    def on_asset(self, account_id, total_asset):
+        """资产事件：以柜台总资产校准资金部分"""
+        self._handle(account_id, lambda monitor: monitor.set_asset(total_asset))
+
+    def on_quotes(self, prices):
+        """
+        行情事件：更新持有这些股票的账户的市值
+
+        参数:
+            prices: {stock_code: 最新价}
+        """
+        start = time.perf_counter()
+        with self._lock:
+            affected = set()
+            for stock_code, price in prices.items():
+                if not price:
+                    continue
+                for account_id in self._holders.get(stock_code, ()):
+                    self._monitors[account_id].set_price(stock_code, price)
+                    affected.add(account_id)
+            for account_id in affected:
+                self._evaluate(self._monitors[account_id])
+            self._record_latency(time.perf_counter() - start)
+
+    def _handle(self, account_id, apply):
+        start = time.perf_counter()
+        account_id = str(account_id)
+        with self._lock:
+            monitor = self._monitors.get(account_id)
+        if monitor is None:
+            # 创建时读取风险状态（可能访问MongoDB），不占用引擎锁
+            created = AccountMonitor(account_id)
+        with self._lock:
+            if monitor is None:
+                # 其他线程可能已经先创建了同一账户的监控
+                monitor = self._monitors.setdefault(account_id, created)
+            apply(monitor)
+            self._evaluate(monitor)
+            self._record_latency(time.perf_counter() - start)
+
+    def _record_latency(self, seconds):
+        self._stats['events'] += 1
+        self._stats['total_latency'] += seconds
+        self._stats['max_latency'] = max(self._stats['max_latency'], seconds)
+        self._latencies.append(seconds)
+
+    # ---------- 告警生成 ----------
+
+    def _evaluate(self, monitor):
+        now = time.time()
+        for indicator, level, value, threshold in monitor.evaluate():
+            key = (monitor.account_id, indicator)
+            last = self._last_emitted.get(key)
+            # 去重：去重窗口内相同等级不重复告警，等级从警告升到危险时立即告警
+            if last is not None and now - last[1] < ALERT_DEDUP_SECONDS and not (last[0] == '警告' and level == '危险'):
+                self._stats['deduplicated'] += 1
+                continue
+
+            # 限流：每个账户最近60秒内的告警数
+            emit_times = self._emit_times.setdefault(monitor.account_id, deque())
+            while emit_times and now - emit_times[0] > 60:
+                emit_times.popleft()
+            if len(emit_times) >= ALERT_RATE_LIMIT:
+                self._stats['rate_limited'] += 1
+                continue
+
+            emit_times.append(now)
+            self._last_emitted[key] = (level, now)
+            self._alerts.append({
+                'id': self._next_id,
+                'account_id': monitor.account_id,
+                'indicator': indicator,
+                'level': level,
+                'value': round(value, 2),
+                'threshold': threshold,
+                'total_asset': round(monitor.total_asset, 2),
+                'message': f'账户 {monitor.account_id} {INDICATOR_NAMES[indicator]} {value:.2f}% 达到{level}阈值 {threshold}%',
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+            self._next_id += 1
+            self._stats['alerts'] += 1
+            logger.warning(self._alerts[-1]['message'])
+            self._condition.notify_all()
+
+    # ---------- 读取 ----------
+
+    def get_alerts(self, since_id=0, account_id=None, limit=100):
+        """
+        读取告警（按ID升序）
+
+        参数:
+            since_id: 只返回ID大于该值的告警
+            account_id: 只返回该账户的告警（可选）
+            limit: 最多返回条数
+        """
+        with self._lock:
+            alerts = [
+                alert for alert in self._alerts
+                if alert['id'] > since_id and (account_id is None or alert['account_id'] == account_id)
+            ]
+        return alerts[:limit]
+
+    def wait_for_alerts(self, since_id, timeout):
+        """阻塞等待新告警（用于SSE），超时返回False"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._next_id - 1 > since_id, timeout=timeout)
+
+    def stats(self):
+        """事件处理和告警统计（延迟单位为微秒）"""
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = np.array(self._latencies) * 1e6
+            accounts = len(self._monitors)
+            queued = len(self._alerts)
+
+        events = stats.pop('events')
+        total_latency = stats.pop('total_latency')
+        max_latency = stats.pop('max_latency')
+        return {
+            'events': events,
+            **stats,
+            'accounts': accounts,
+            'queued': queued,
+            'latency_us': {
+                'mean': round(total_latency / events * 1e6, 1) if events else None,
+                'max': round(max_latency * 1e6, 1) if events else None,
+                'p50': round(float(np.percentile(latencies, 50)), 1) if latencies.size else None,
+                'p99': round(float(np.percentile(latencies, 99)), 1) if latencies.size else None
+            }
+        }
+
+
+alert_engine = AlertEngine()
+
+
+# ==================== 回调适配 ====================
+
+def load_account_positions(account_id, total_asset, positions):
+    """
+    用查询到的完整资产和持仓校准告警引擎中的账户（由账户信息接口调用）
+
+    参数:
+        account_id: 账户ID
+        total_asset: 总资产
+        positions: xttrader.query_stock_positions 返回的持仓对象列表
+    """
+    holdings = [(str(pos.stock_code), int(pos.volume), float(pos.market_value)) for pos in positions or []]
+    alert_engine.load_account(account_id, float(total_asset), holdings)
+    for stock_code, volume, _ in holdings:
+        if volume:
+            _ensure_quote_subscription(stock_code)
+
+
+def handle_trade_callback(trade):
+    """XtQuantTraderCallback.on_stock_trade 的适配"""
+    alert_engine.on_trade(trade.account_id, trade.stock_code, trade.offset_flag,
+                          float(trade.traded_price), int(trade.traded_volume))
+    _ensure_quote_subscription(trade.stock_code)
+
+
+def handle_position_callback(position):
+    """XtQuantTraderCallback.on_stock_position 的适配"""
+    alert_engine.on_position(position.account_id, position.stock_code,
+                             int(position.volume), float(position.market_value))
+    _ensure_quote_subscription(position.stock_code)
+
+
+def handle_asset_callback(asset):
+    """XtQuantTraderCallback.on_stock_asset 的适配"""
+    alert_engine.on_asset(asset.account_id, float(asset.total_asset))
+
+
+def handle_quote_callback(datas):
+    """
+    xtdata 行情订阅回调的适配
+
+    参数:
+        datas: {stock_code: 行情字典} 或 {stock_code: [行情字典, ...]}
+    """
+    prices = {}
+    for stock_code, data in datas.items():
+        if isinstance(data, list):
+            data = data[-1] if data else {}
+        price = data.get('lastPrice')
+        if price:
+            prices[stock_code] = float(price)
+    if prices:
+        alert_engine.on_quotes(prices)
+
+
+def _ensure_quote_subscription(stock_code):
+    """首次持有某只股票时加入全推行情订阅（行情缓存统一订阅，推送转发给预警引擎）"""
+    from apps.utils.quote_cache import add_quote_listener, subscribe_codes
+
+    add_quote_listener(handle_quote_callback)
+    subscribe_codes([stock_code])
@@ -0,0 +1,184 @@
+"""
+批量风险评估
+一次性评估多个账户（或全部账户）的风险并按风险分数排序：
+1. 用一次$in查询批量读取所有账户的历史数据
+2. 在进程池中并行计算各账户的风险指标
+3. 按 get_risk_score 的分数降序生成排名表
+
+进程池中执行的函数只依赖 risk_kernel（numpy），子进程不需要初始化Django
+"""
+
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .risk_kernel import HistoryArrays, build_history_arrays, compute_risk_indicators
+
+logger = logging.getLogger(__name__)
+
+# 总观测数少于该值时直接在当前进程计算：单进程约每百万个观测1秒，
+# 与进程池（Windows下为spawn方式）的启动开销相当
+PROCESS_POOL_MIN_OBSERVATIONS = 1000000
+
+
+def _compute_account_indicators(task):
+    """
+    进程池任务：计算单个账户的风险指标
+
+    参数:
+        task: (account_id, values, date_labels, confidence_level, trading_days)
+
+    返回:
+        tuple: (account_id, indicators)
+    """
+    account_id, values, date_labels, confidence_level, trading_days = task
+    arrays = HistoryArrays(values, date_labels=date_labels)
+    return account_id, compute_risk_indicators(arrays, confidence_level=confidence_level, trading_days=trading_days)
+
+
+def compute_indicators_batch(histories, confidence_level=0.95, workers=None):
+    """
+    批量计算多个账户的风险指标
+
+    参数:
+        histories: {account_id: 历史数据列表}
+        confidence_level: VaR置信水平
+        workers: 进程数，默认为CPU核数；为1时不使用进程池
+
+    返回:
+        dict: {account_id: compute_risk_indicators 的结果}
+    """
+    from apps.utils.trading_calendar import annual_trading_days
+
+    # 年化交易日数在主进程中从交易日历取一次，随任务传给子进程
+    trading_days = annual_trading_days()
+    tasks = []
+    observations = 0
+    for account_id, account_history in histories.items():
+        arrays = build_history_arrays(account_history)
+        if arrays is None:
+            continue
+        # 只传递数组和日期字符串，减少进程间序列化的数据量
+        tasks.append((account_id, arrays.values, [arrays.date_str(i) for i in range(len(arrays))], confidence_level, trading_days))
+        observations += len(arrays)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) < 2 or observations < PROCESS_POOL_MIN_OBSERVATIONS:
+        return dict(map(_compute_account_indicators, tasks))
+
+    workers = min(workers, len(tasks))
+    chunksize = max(1, len(tasks) // (workers * 4))
+    logger.info(f'使用 {workers} 个进程计算 {len(tasks)} 个账户的风险指标，chunksize={chunksize}')
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(_compute_account_indicators, tasks, chunksize=chunksize))
+
+
+def rank_accounts(indicators_by_account):
+    """
+    按综合风险分数对账户排序
+
+    参数:
+        indicators_by_account: {account_id: compute_risk_indicators 的结果}
+
+    返回:
+        tuple: (rows, skipped)
+            - rows: 排名表（按风险分数降序，同分按最大回撤降序）
+            - skipped: 数据不足无法评估的账户ID列表
+    """
+    from .views import get_risk_score, get_risk_level_by_score
+
+    rows = []
+    skipped = []
+    for account_id, indicators in indicators_by_account.items():
+        max_loss = indicators['max_principal_loss']
+        volatility = indicators['volatility']
+        max_dd = indicators['max_drawdown']
+        var = indicators['var']
+        if not (max_loss and volatility and max_dd and var):
+            skipped.append(account_id)
+            continue
+
+        risk_score = get_risk_score(
+            abs(max_loss['max_loss_rate']),
+            volatility['annual_volatility'],
+            max_dd['max_drawdown'],
+            var['var_rate']
+        )
+        rows.append({
+            'account_id': account_id,
+            'risk_score': risk_score,
+            'risk_level': get_risk_level_by_score(risk_score),
+            'max_loss_rate': max_loss['max_loss_rate'],
+            'annual_volatility': volatility['annual_volatility'],
+            'max_drawdown': max_dd['max_drawdown'],
+            'var_rate': var['var_rate'],
+            'current_value': var['current_value']
+        })
+
+    rows.sort(key=lambda row: (-row['risk_score'], -row['max_drawdown'], row['account_id']))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+
+    return rows, sorted(skipped)
+
+
+def assess_accounts(account_ids=None, days=30, confidence_level=0.95, workers=None):
+    """
+    批量风险评估
+
+    参数:
+        account_ids: 账户ID列表，为空时评估数据库中的全部账户
+        days: 时间窗口（天）
+        confidence_level: VaR置信水平
+        workers: 进程数
+
+    返回:
+        dict: {
+            'assessment_date': 评估日期,
+            'period_days': 时间窗口,
+            'count': 参与排名的账户数,
+            'accounts': 排名表,
+            'skipped': 数据不足的账户ID列表
+        }
+    """
+    from apps.utils.data_storage import get_all_account_ids, get_accounts_history_bulk
+    from apps.utils.trading_calendar import trading_days_within
+
+    if not account_ids:
+        account_ids = get_all_account_ids()
+    account_ids = [str(account_id) for account_id in account_ids]
+
+    histories = get_accounts_history_bulk(account_ids, trading_days=trading_days_within(days))
+    indicators = compute_indicators_batch(histories, confidence_level=confidence_level, workers=workers)
+    rows, skipped = rank_accounts(indicators)
+
+    # 没有历史数据的账户也计入跳过列表
+    skipped = sorted(set(skipped) | (set(account_ids) - set(histories)))
+
+    logger.info(f'批量风险评估完成: {len(rows)} 个账户参与排名，{len(skipped)} 个账户数据不足')
+    return {
+        'assessment_date': datetime.now().strftime('%Y-%m-%d'),
+        'period_days': days,
+        'count': len(rows),
+        'accounts': rows,
+        'skipped': skipped
+    }
+
+
+def iter_ndjson(result):
+    """
+    将批量评估结果逐行序列化为NDJSON（用于流式输出）
+
+    第一行为汇总信息，之后每行一个账户
+    """
+    yield json.dumps({
+        'assessment_date': result['assessment_date'],
+        'period_days': result['period_days'],
+        'count': result['count'],
+        'skipped': result['skipped']
+    }, ensure_ascii=False) + '\n'
+
+    for row in result['accounts']:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
@@ -0,0 +1,3 @@
+"""
+风险计算基准测试
+"""
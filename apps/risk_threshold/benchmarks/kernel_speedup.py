@@ -0,0 +1,192 @@
+"""
+风险内核加速比基准测试
+对比原逐条循环实现与向量化内核在长历史数据上的耗时，并校验两者结果一致
+
+运行方式:
+    python -m apps.risk_threshold.benchmarks.kernel_speedup [--years 10] [--repeat 20]
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from apps.risk_threshold.risk_kernel import build_history_arrays, compute_risk_indicators
+
+
+# ==================== 原实现（逐条循环，作为对照） ====================
+
+def _legacy_daily_returns(account_history):
+    daily_returns = []
+    for i in range(1, len(account_history)):
+        prev_value = account_history[i-1]['total_assets']
+        curr_value = account_history[i]['total_assets']
+        if prev_value > 0:
+            daily_returns.append((curr_value - prev_value) / prev_value)
+    return daily_returns
+
+
+def legacy_max_principal_loss(account_history):
+    initial_capital = account_history[0]['total_assets']
+    current_capital = account_history[-1]['total_assets']
+    loss_amount = initial_capital - current_capital
+    loss_rate = (loss_amount / initial_capital * 100) if initial_capital > 0 else 0
+    return {
+        'max_loss_amount': round(loss_amount, 2),
+        'max_loss_rate': round(loss_rate, 2),
+        'initial_capital': round(initial_capital, 2),
+        'current_capital': round(current_capital, 2)
+    }
+
+
+def legacy_volatility(account_history):
+    daily_returns = _legacy_daily_returns(account_history)
+    daily_volatility = np.std(daily_returns) * 100
+    annual_volatility = daily_volatility * np.sqrt(252)
+    if annual_volatility < 10:
+        volatility_level = '低'
+    elif annual_volatility < 20:
+        volatility_level = '中'
+    else:
+        volatility_level = '高'
+    return {
+        'daily_volatility': round(daily_volatility, 2),
+        'annual_volatility': round(annual_volatility, 2),
+        'volatility_level': volatility_level
+    }
+
+
+def legacy_max_drawdown(account_history):
+    max_drawdown = 0
+    max_drawdown_amount = 0
+    peak_value = account_history[0]['total_assets']
+    peak_date = account_history[0]['date']
+    valley_value = peak_value
+    valley_date = peak_date
+    current_peak = peak_value
+    current_peak_date = peak_date
+
+    for record in account_history:
+        current_value = record['total_assets']
+        current_date = record['date']
+        if current_value > current_peak:
+            current_peak = current_value
+            current_peak_date = current_date
+        drawdown = (current_peak - current_value) / current_peak if current_peak > 0 else 0
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+            max_drawdown_amount = current_peak - current_value
+            peak_value = current_peak
+            peak_date = current_peak_date
+            valley_value = current_value
+            valley_date = current_date
+
+    return {
+        'max_drawdown': round(max_drawdown * 100, 2),
+        'max_drawdown_amount': round(max_drawdown_amount, 2),
+        'peak_value': round(peak_value, 2),
+        'peak_date': peak_date,
+        'valley_value': round(valley_value, 2),
+        'valley_date': valley_date
+    }
+
+
+def legacy_var(account_history, confidence_level=0.95):
+    daily_returns = _legacy_daily_returns(account_history)
+    current_value = account_history[-1]['total_assets']
+    var_percentile = np.percentile(daily_returns, (1 - confidence_level) * 100)
+    return {
+        'var_amount': round(abs(current_value * var_percentile), 2),
+        'var_rate': round(abs(var_percentile * 100), 2),
+        'confidence_level': confidence_level * 100,
+        'current_value': round(current_value, 2)
+    }
+
+
+def legacy_risk_indicators(account_history, confidence_level=0.95):
+    return {
+        'max_principal_loss': legacy_max_principal_loss(account_history),
+        'volatility': legacy_volatility(account_history),
+        'max_drawdown': legacy_max_drawdown(account_history),
+        'var': legacy_var(account_history, confidence_level=confidence_level)
+    }
+
+
+# ==================== 基准测试 ====================
+
+def make_history(days, seed=0):
+    """生成指定天数的合成账户历史（每个日历日一条记录）"""
+    rng = np.random.default_rng(seed)
+    values = 4100000.00 * np.cumprod(1 + rng.normal(0.0003, 0.015, days))
+    start = date.today() - timedelta(days=days)
+    return [
+        {
+            'date': (start + timedelta(days=i)).isoformat(),
+            'total_assets': round(float(value), 2),
+            'market_value': round(float(value) * 0.7, 2),
+            'cash': round(float(value) * 0.3, 2)
+        }
+        for i, value in enumerate(values)
+    ]
+
+
+def _best_time(func, history, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(history)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(years=10, repeat=20):
+    """
+    运行基准测试
+
+    kernel_ms 包含列表到数组的转换；compute_ms 只统计在已转换数组上的计算，
+    对应历史数组被缓存复用的场景
+
+    返回:
+        dict: {'days', 'legacy_ms', 'kernel_ms', 'compute_ms', 'speedup', 'compute_speedup', 'results_match'}
+    """
+    history = make_history(int(years * 365))
+
+    legacy_result = legacy_risk_indicators(history)
+    kernel_result = compute_risk_indicators(history)
+
+    def compute_only(arrays):
+        arrays._returns = None  # 每次都重新计算收益率
+        return compute_risk_indicators(arrays)
+
+    legacy_time = _best_time(legacy_risk_indicators, history, repeat)
+    kernel_time = _best_time(compute_risk_indicators, history, repeat)
+    compute_time = _best_time(compute_only, build_history_arrays(history), repeat)
+
+    return {
+        'days': len(history),
+        'legacy_ms': round(legacy_time * 1000, 3),
+        'kernel_ms': round(kernel_time * 1000, 3),
+        'compute_ms': round(compute_time * 1000, 3),
+        'speedup': round(legacy_time / kernel_time, 1),
+        'compute_speedup': round(legacy_time / compute_time, 1),
+        'results_match': legacy_result == kernel_result
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='风险内核加速比基准测试')
+    parser.add_argument('--years', type=float, default=10, help='历史数据年数')
+    parser.add_argument('--repeat', type=int, default=20, help='重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    result = run(years=args.years, repeat=args.repeat)
+    print(f"历史长度: {result['days']} 天")
+    print(f"原实现:   {result['legacy_ms']:.3f} ms")
+    print(f"向量内核: {result['kernel_ms']:.3f} ms（含数组转换，加速比 {result['speedup']}x）")
+    print(f"仅计算:   {result['compute_ms']:.3f} ms（数组复用，加速比 {result['compute_speedup']}x）")
+    print(f"结果一致: {result['results_match']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+风险计算基准测试套件
+在不同历史长度（30天 ~ 20年）和账户数（1 ~ 1000）下，分别计时：
+- 四个风险指标函数（calculate_max_principal_loss / calculate_volatility /
+  calculate_max_drawdown / calculate_var）
+- 完整的综合风险评估接口（get_risk_assessment，包含JSON渲染）
+- 多账户批量评估（批量计算、排名和JSON序列化）
+
+结果写成JSON，可以与保存的基线对比，判断某次修改让计算变快还是变慢。
+合成数据来自 apps.utils.mock_data（固定种子，每次运行数据相同）。
+
+需要Django环境，通过管理命令运行:
+    python manage.py risk_benchmark
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# 单账户历史长度（天）：30天、90天、1年、5年、10年、20年
+DEFAULT_LENGTHS = (30, 90, 365, 1825, 3650, 7300)
+
+# 批量评估的账户数
+DEFAULT_ACCOUNT_COUNTS = (1, 10, 100, 1000)
+
+# 批量评估中每个账户的历史长度（天）
+DEFAULT_BATCH_DAYS = 365
+
+# 默认基线文件
+DEFAULT_BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+INDICATOR_CASES = ('max_principal_loss', 'volatility', 'max_drawdown', 'var')
+
+
+def _measure(func, repeat, setup=None):
+    """
+    重复执行并计时
+
+    返回:
+        dict: {'median_ms', 'min_ms', 'repeat'}
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 4),
+        'min_ms': round(min(timings) * 1000, 4),
+        'repeat': repeat
+    }
+
+
+def _case_key(case, days, accounts):
+    return f'{case}/{days}d/{accounts}a'
+
+
+def _indicator_functions():
+    from apps.risk_threshold import views
+
+    return {
+        'max_principal_loss': views.calculate_max_principal_loss,
+        'volatility': views.calculate_volatility,
+        'max_drawdown': views.calculate_max_drawdown,
+        'var': views.calculate_var,
+    }
+
+
+def bench_history_length(days, repeat):
+    """单账户、指定历史长度下的各项计时"""
+    from django.test import RequestFactory
+    from apps.risk_threshold.views import get_risk_assessment
+    from apps.risk_threshold.risk_context import invalidate_risk_context
+    from apps.utils.mock_data import mock_account_history
+
+    history = mock_account_history(days)
+    results = []
+    for case, func in _indicator_functions().items():
+        results.append({'case': case, 'days': days, 'accounts': 1, **_measure(lambda: func(history), repeat)})
+
+    # 完整接口路径：每次清空风险上下文缓存，模拟数据本身保持缓存（相当于数据源耗时不计入）
+    request = RequestFactory().get('/api/risk-threshold/assessment/', {
+        'account_id': 'BENCH000001', 'days': days, 'mock': 'true'
+    })
+
+    def render():
+        response = get_risk_assessment(request)
+        if response.status_code != 200:
+            raise RuntimeError(f'get_risk_assessment 返回 {response.status_code}')
+        return response.content
+
+    results.append({
+        'case': 'risk_assessment', 'days': days, 'accounts': 1,
+        **_measure(render, repeat, setup=invalidate_risk_context)
+    })
+    return results
+
+
+def bench_account_count(accounts, days, repeat):
+    """多账户批量评估计时（单进程计算，排名后序列化为JSON）"""
+    from apps.risk_threshold.batch import compute_indicators_batch, rank_accounts
+    from apps.risk_threshold.risk_kernel import HistoryArrays
+    from apps.utils.mock_data import mock_accounts_history
+
+    fixtures = mock_accounts_history(accounts, days)
+
+    def run():
+        histories = {
+            account_id: HistoryArrays(values, date_labels=labels)
+            for account_id, (values, labels) in fixtures.items()
+        }
+        rows, skipped = rank_accounts(compute_indicators_batch(histories, workers=1))
+        return json.dumps({'accounts': rows, 'skipped': skipped}, ensure_ascii=False)
+
+    return [{'case': 'batch_assessment', 'days': days, 'accounts': accounts, **_measure(run, repeat)}]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, timeout=5, cwd=Path(__file__).parent
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(lengths=DEFAULT_LENGTHS, account_counts=DEFAULT_ACCOUNT_COUNTS,
+              batch_days=DEFAULT_BATCH_DAYS, repeat=7, progress=None):
+    """
+    运行完整基准测试
+
+    参数:
+        lengths: 单账户历史长度列表（天）
+        account_counts: 批量评估的账户数列表
+        batch_days: 批量评估中每个账户的历史长度
+        repeat: 每项重复次数（取中位数）
+        progress: 进度回调，参数为当前完成的结果列表
+
+    返回:
+        dict: {'meta': 运行环境, 'results': [{'key', 'case', 'days', 'accounts', 'median_ms', 'min_ms', 'repeat'}, ...]}
+    """
+    results = []
+    for days in lengths:
+        batch = bench_history_length(days, repeat)
+        results.extend(batch)
+        if progress:
+            progress(batch)
+    for accounts in account_counts:
+        batch = bench_account_count(accounts, batch_days, repeat)
+        results.extend(batch)
+        if progress:
+            progress(batch)
+
+    for result in results:
+        result['key'] = _case_key(result['case'], result['days'], result['accounts'])
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def load_results(path):
+    """读取保存的基准测试结果"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    """保存基准测试结果"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def compare_results(current, baseline, tolerance=0.10):
+    """
+    与基线对比（按中位数耗时）
+
+    参数:
+        current: 本次结果
+        baseline: 基线结果
+        tolerance: 允许的相对波动，超过视为变慢（regression）或变快（improvement）
+
+    返回:
+        list: [{'key', 'baseline_ms', 'current_ms', 'ratio', 'status'}, ...]，只包含两边都有的测试项
+    """
+    baseline_by_key = {result['key']: result for result in baseline['results']}
+    comparison = []
+    for result in current['results']:
+        base = baseline_by_key.get(result['key'])
+        if base is None or base['median_ms'] <= 0:
+            continue
+        ratio = result['median_ms'] / base['median_ms']
+        if ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 - tolerance:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        comparison.append({
+            'key': result['key'],
+            'baseline_ms': base['median_ms'],
+            'current_ms': result['median_ms'],
+            'ratio': round(ratio, 3),
+            'status': status
+        })
+    return comparison
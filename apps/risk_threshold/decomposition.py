@@ -0,0 +1,254 @@
+"""
+持仓级别风险分解
+基于账户当前持仓的日收盘价历史，计算协方差矩阵，
+并用向量化线性代数得到每只股票的边际VaR、成分VaR和波动率贡献
+
+收益率矩阵按 (股票代码集合, 时间窗口) 缓存，同一交易日内的请求复用，
+日线数据在交易日切换时才会变化
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from .risk_kernel import TRADING_DAYS_PER_YEAR
+from .var_engine import norm_ppf
+
+logger = logging.getLogger(__name__)
+
+# 缓存的收益率矩阵数量上限（LRU淘汰）
+RETURNS_MATRIX_CACHE_SIZE = 64
+
+_matrix_cache = OrderedDict()
+_matrix_lock = threading.Lock()
+
+
+class ReturnsMatrix:
+    """
+    对齐后的日收益率矩阵
+
+    属性:
+        codes: 股票代码列表（与矩阵列顺序一致）
+        dates: 收益率对应的日期（datetime64[D]）
+        returns: T×N 的日收益率矩阵
+        missing_codes: 没有价格数据的股票代码
+        as_of: 数据所属日期（用于判断缓存是否过期）
+        price_version: 价格数据版本（各股票本地日线的行数，同步追加后变化；模拟价格为None）
+    """
+
+    __slots__ = ('codes', 'dates', 'returns', 'missing_codes', 'as_of', 'price_version', '_covariance')
+
+    def __init__(self, codes, dates, returns, missing_codes, as_of, price_version=None):
+        self.codes = codes
+        self.dates = dates
+        self.returns = returns
+        self.missing_codes = missing_codes
+        self.as_of = as_of
+        self.price_version = price_version
+        self._covariance = None
+
+    @property
+    def covariance(self):
+        """日收益率协方差矩阵（N×N，只计算一次）"""
+        if self._covariance is None:
+            self._covariance = np.atleast_2d(np.cov(self.returns, rowvar=False))
+        return self._covariance
+
+
+def _forward_fill(prices):
+    """沿时间轴向前填充NaN（停牌日沿用前一日收盘价）"""
+    valid = ~np.isnan(prices)
+    index = np.where(valid, np.arange(prices.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    return prices[index, np.arange(prices.shape[1])]
+
+
+def prices_to_returns_matrix(codes, dates, prices, as_of):
+    """
+    将收盘价矩阵转换为对齐的收益率矩阵
+
+    参数:
+        codes: 股票代码列表
+        dates: 日期数组（datetime64[D]，长度T）
+        prices: T×N 收盘价矩阵（缺失为NaN）
+        as_of: 数据所属日期
+
+    返回:
+        ReturnsMatrix
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    has_data = ~np.isnan(prices).all(axis=0)
+    missing_codes = [code for code, ok in zip(codes, has_data) if not ok]
+    codes = [code for code, ok in zip(codes, has_data) if ok]
+    prices = _forward_fill(prices[:, has_data])
+
+    # 去掉还有股票未上市（填充后仍为NaN）的早期日期
+    complete = ~np.isnan(prices).any(axis=1)
+    prices = prices[complete]
+    dates = np.asarray(dates, dtype='datetime64[D]')[complete]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(prices, axis=0) / prices[:-1]
+    returns[~np.isfinite(returns)] = 0.0
+
+    return ReturnsMatrix(codes, dates[1:], returns, missing_codes, as_of)
+
+
+def _load_xt_prices(codes, days):
+    """
+    从本地日K线存储读取对齐的前复权日收盘价
+
+    请求中不访问迅投：本地还没有的股票登记给后台同步线程，本次按缺失处理
+
+    返回:
+        tuple: (dates, prices)，prices为 T×N 矩阵
+    """
+    from apps.utils.kline_store import read_window, require_codes, stored_length
+
+    missing = [code for code in codes if stored_length(code) == 0]
+    if missing:
+        logger.info(f'本地没有 {len(missing)} 只股票的日线，已登记后台同步')
+        require_codes(missing)
+    return read_window(codes, field='close', adjusted=True, count=days + 1)
+
+
+def _load_mock_prices(codes, days, seed=7):
+    """生成模拟收盘价（单因子模型，使用局部随机数生成器）"""
+    rng = np.random.default_rng(seed)
+    count = len(codes)
+    market = rng.normal(0.0004, 0.012, size=(days + 1, 1))
+    betas = rng.uniform(0.6, 1.4, size=(1, count))
+    idiosyncratic = rng.normal(0.0, 0.015, size=(days + 1, count))
+    prices = 20.0 * np.cumprod(1 + market * betas + idiosyncratic, axis=0)
+
+    end = np.datetime64(datetime.now().date(), 'D')
+    dates = end - np.arange(days, -1, -1)
+    return dates, prices
+
+
+def _price_version(codes):
+    """本地日线的版本：各股票已保存的行数（只追加，每日同步后变化）"""
+    from apps.utils.kline_store import stored_length
+
+    return tuple(stored_length(code) for code in codes)
+
+
+def get_returns_matrix(codes, days=60, use_mock=False, refresh=False):
+    """
+    获取持仓股票的对齐收益率矩阵（价格数据没有变化时复用缓存）
+
+    参数:
+        codes: 股票代码列表
+        days: 时间窗口（交易日）
+        use_mock: 是否使用模拟价格
+        refresh: 是否强制重新加载
+
+    返回:
+        ReturnsMatrix
+    """
+    key = (tuple(sorted(codes)), days, use_mock)
+    as_of = datetime.now().date().isoformat()
+    # 模拟价格只随日期变化；本地日线在收盘后同步追加，行数变化时重新加载
+    price_version = None if use_mock else _price_version(key[0])
+
+    with _matrix_lock:
+        matrix = _matrix_cache.get(key)
+        if matrix is not None and matrix.as_of == as_of and matrix.price_version == price_version and not refresh:
+            _matrix_cache.move_to_end(key)
+            return matrix
+
+    sorted_codes = list(key[0])
+    if use_mock:
+        dates, prices = _load_mock_prices(sorted_codes, days)
+    else:
+        dates, prices = _load_xt_prices(sorted_codes, days)
+    matrix = prices_to_returns_matrix(sorted_codes, dates, prices, as_of)
+    matrix.price_version = price_version
+
+    # 有缺失股票时不缓存，后台同步完成后的请求可以读到
+    if not matrix.missing_codes:
+        with _matrix_lock:
+            _matrix_cache[key] = matrix
+            _matrix_cache.move_to_end(key)
+            while len(_matrix_cache) > RETURNS_MATRIX_CACHE_SIZE:
+                _matrix_cache.popitem(last=False)
+
+    logger.info(f'收益率矩阵已加载: {len(matrix.codes)} 只股票 × {matrix.returns.shape[0]} 个交易日')
+    return matrix
+
+
+def decompose_risk(matrix, market_values, confidence_level=0.95, trading_days=TRADING_DAYS_PER_YEAR):
+    """
+    持仓风险分解（参数法）
+
+    设持仓金额向量为w、日收益率协方差矩阵为Σ：
+        组合日波动（金额）  σp = sqrt(wᵀΣw)
+        组合VaR             VaR = z·σp
+        边际VaR             MVaR = z·Σw / σp
+        成分VaR             CVaR_i = w_i·MVaR_i（各股票之和等于组合VaR）
+        波动率贡献          w_i·(Σw)_i / σp（各股票之和等于组合波动）
+
+    参数:
+        matrix: ReturnsMatrix
+        market_values: 与 matrix.codes 顺序一致的持仓市值数组
+        confidence_level: 置信水平
+        trading_days: 年化使用的交易日数
+
+    返回:
+        dict: {'portfolio': 组合层面指标, 'positions': 每只股票的分解结果}
+    """
+    weights = np.asarray(market_values, dtype=np.float64)
+    total_value = float(weights.sum())
+    covariance = matrix.covariance
+    z = float(norm_ppf(confidence_level))
+    annualize = float(np.sqrt(trading_days))
+
+    sigma_w = covariance @ weights
+    portfolio_sigma = float(np.sqrt(max(weights @ sigma_w, 0.0)))
+    stock_sigma = np.sqrt(np.maximum(np.diag(covariance), 0.0))
+
+    if portfolio_sigma > 0:
+        marginal_var = z * sigma_w / portfolio_sigma
+        volatility_contribution = weights * sigma_w / portfolio_sigma
+    else:
+        marginal_var = np.zeros_like(weights)
+        volatility_contribution = np.zeros_like(weights)
+    component_var = weights * marginal_var
+    portfolio_var = z * portfolio_sigma
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        component_pct = np.where(portfolio_var > 0, component_var / portfolio_var * 100, 0.0)
+        weight_pct = weights / total_value * 100 if total_value > 0 else np.zeros_like(weights)
+        volatility_contribution_pct = volatility_contribution / total_value * annualize * 100 if total_value > 0 else np.zeros_like(weights)
+
+    undiversified_sigma = float(weights @ stock_sigma)
+    positions = [
+        {
+            'stock_code': code,
+            'market_value': round(float(weights[i]), 2),
+            'weight': round(float(weight_pct[i]), 2),
+            'annual_volatility': round(float(stock_sigma[i] * annualize * 100), 2),
+            'marginal_var': round(float(marginal_var[i] * 100), 4),
+            'component_var': round(float(component_var[i]), 2),
+            'component_var_pct': round(float(component_pct[i]), 2),
+            'volatility_contribution': round(float(volatility_contribution_pct[i]), 2)
+        }
+        for i, code in enumerate(matrix.codes)
+    ]
+    positions.sort(key=lambda item: item['component_var'], reverse=True)
+
+    return {
+        'portfolio': {
+            'total_value': round(total_value, 2),
+            'var_amount': round(portfolio_var, 2),
+            'var_rate': round(portfolio_var / total_value * 100, 2) if total_value > 0 else 0,
+            'annual_volatility': round(portfolio_sigma / total_value * annualize * 100, 2) if total_value > 0 else 0,
+            'diversification_ratio': round(undiversified_sigma / portfolio_sigma, 2) if portfolio_sigma > 0 else 1.0,
+            'confidence_level': confidence_level * 100,
+            'observations': int(matrix.returns.shape[0])
+        },
+        'positions': positions
+    }
@@ -0,0 +1,39 @@
+"""
+预先计算风险报告命令
+每个交易日收盘后运行（如Windows任务计划程序每天16:00），
+为全部账户的30/90/180/365天窗口生成综合风险评估并保存到 risk_reports 集合
+
+用法:
+    python manage.py compute_risk_reports                     # 全部账户、全部标准窗口
+    python manage.py compute_risk_reports --accounts A B C    # 指定账户
+    python manage.py compute_risk_reports --windows 30 90     # 指定窗口
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.risk_threshold.reports import REPORT_WINDOWS, compute_risk_reports
+
+
+class Command(BaseCommand):
+    help = '预先计算并保存全部账户各标准窗口的综合风险评估报告'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', nargs='*', default=None, help='账户ID列表，不指定时处理全部账户')
+        parser.add_argument('--windows', nargs='*', type=int, default=list(REPORT_WINDOWS), help='时间窗口（天），默认30 90 180 365')
+        parser.add_argument('--confidence', type=float, default=0.95, help='VaR置信水平，默认0.95')
+        parser.add_argument('--workers', type=int, default=None, help='计算进程数，默认为CPU核数')
+
+    def handle(self, *args, **options):
+        result = compute_risk_reports(
+            options['accounts'],
+            windows=options['windows'],
+            confidence_level=options['confidence'],
+            workers=options['workers']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['generated_at']} 已为 {result['accounts']} 个账户保存 {result['saved']} 份风险报告"
+        ))
+        for days, account_ids in result['skipped'].items():
+            if account_ids:
+                self.stdout.write(f"{days}天窗口数据不足: {', '.join(account_ids)}")
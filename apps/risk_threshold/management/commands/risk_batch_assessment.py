@@ -0,0 +1,58 @@
+"""
+批量风险评估命令
+每天早上为风控人员生成全部账户的风险排名
+
+用法:
+    python manage.py risk_batch_assessment                    # 全部账户
+    python manage.py risk_batch_assessment --accounts A B C   # 指定账户
+    python manage.py risk_batch_assessment --format ndjson --output ranking.ndjson
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.risk_threshold.batch import assess_accounts, iter_ndjson
+
+
+class Command(BaseCommand):
+    help = '批量评估账户风险并按风险分数排名'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', nargs='*', default=None, help='账户ID列表，不指定时评估全部账户')
+        parser.add_argument('--days', type=int, default=30, help='时间窗口（天），默认30')
+        parser.add_argument('--confidence', type=float, default=0.95, help='VaR置信水平，默认0.95')
+        parser.add_argument('--workers', type=int, default=None, help='计算进程数，默认为CPU核数')
+        parser.add_argument('--format', choices=['table', 'ndjson'], default='table', help='输出格式')
+        parser.add_argument('--output', default=None, help='输出文件路径，不指定时输出到标准输出')
+
+    def handle(self, *args, **options):
+        result = assess_accounts(
+            options['accounts'],
+            days=options['days'],
+            confidence_level=options['confidence'],
+            workers=options['workers']
+        )
+
+        if options['format'] == 'ndjson':
+            lines = iter_ndjson(result)
+        else:
+            lines = self._iter_table(result)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            self.stdout.write(self.style.SUCCESS(f"已写入 {result['count']} 个账户的排名: {options['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+
+    def _iter_table(self, result):
+        yield f"评估日期: {result['assessment_date']}  时间窗口: {result['period_days']} 天  账户数: {result['count']}\n"
+        yield f"{'排名':>4}  {'账户':<16}{'分数':>6}{'等级':>4}{'本金损失%':>10}{'年化波动%':>10}{'最大回撤%':>10}{'VaR%':>8}\n"
+        for row in result['accounts']:
+            yield (
+                f"{row['rank']:>4}  {row['account_id']:<16}{row['risk_score']:>6}{row['risk_level']:>4}"
+                f"{row['max_loss_rate']:>10.2f}{row['annual_volatility']:>10.2f}"
+                f"{row['max_drawdown']:>10.2f}{row['var_rate']:>8.2f}\n"
+            )
+        if result['skipped']:
+            yield f"数据不足未参与排名: {', '.join(result['skipped'])}\n"
@@ -0,0 +1,82 @@
+"""
+风险计算基准测试命令
+计时各项风险指标、综合风险评估接口和批量评估，并与保存的基线对比
+
+用法:
+    python manage.py risk_benchmark                               # 全部测试项，与默认基线对比（如存在）
+    python manage.py risk_benchmark --output bench.json           # 保存本次结果
+    python manage.py risk_benchmark --save-baseline               # 将本次结果保存为默认基线
+    python manage.py risk_benchmark --baseline old.json --fail-on-regression
+    python manage.py risk_benchmark --lengths 30 365 --accounts 1 100 --repeat 3
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.risk_threshold.benchmarks.suite import (
+    DEFAULT_ACCOUNT_COUNTS,
+    DEFAULT_BASELINE_PATH,
+    DEFAULT_BATCH_DAYS,
+    DEFAULT_LENGTHS,
+    compare_results,
+    load_results,
+    run_suite,
+    save_results
+)
+
+
+class Command(BaseCommand):
+    help = '风险计算基准测试（不同历史长度和账户数），可与基线对比'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lengths', nargs='*', type=int, default=list(DEFAULT_LENGTHS), help='单账户历史长度（天）')
+        parser.add_argument('--accounts', nargs='*', type=int, default=list(DEFAULT_ACCOUNT_COUNTS), help='批量评估的账户数')
+        parser.add_argument('--batch-days', type=int, default=DEFAULT_BATCH_DAYS, help='批量评估中每个账户的历史长度（天）')
+        parser.add_argument('--repeat', type=int, default=7, help='每项重复次数（取中位数），默认7')
+        parser.add_argument('--output', default=None, help='结果JSON文件路径')
+        parser.add_argument('--baseline', default=None, help=f'基线JSON文件路径，默认 {DEFAULT_BASELINE_PATH.name}（存在时）')
+        parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为默认基线')
+        parser.add_argument('--tolerance', type=float, default=0.10, help='判断变快/变慢的相对阈值，默认0.10')
+        parser.add_argument('--fail-on-regression', action='store_true', help='有测试项变慢时以非零状态退出')
+
+    def handle(self, *args, **options):
+        def progress(batch):
+            for result in batch:
+                self.stdout.write(
+                    f"{result['case']:<20}{result['days']:>7}天{result['accounts']:>6}账户"
+                    f"{result['median_ms']:>12.3f} ms（最快 {result['min_ms']:.3f} ms）"
+                )
+
+        results = run_suite(
+            lengths=options['lengths'],
+            account_counts=options['accounts'],
+            batch_days=options['batch_days'],
+            repeat=options['repeat'],
+            progress=progress
+        )
+
+        if options['output']:
+            save_results(results, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"结果已保存: {options['output']}"))
+
+        baseline_path = options['baseline'] or (DEFAULT_BASELINE_PATH if DEFAULT_BASELINE_PATH.exists() else None)
+        regressions = []
+        if baseline_path and not options['save_baseline']:
+            baseline = load_results(baseline_path)
+            comparison = compare_results(results, baseline, tolerance=options['tolerance'])
+            self.stdout.write(f"\n与基线对比（{baseline_path}，提交 {baseline['meta'].get('commit')}）:")
+            for item in comparison:
+                line = f"{item['key']:<36}{item['baseline_ms']:>12.3f} -> {item['current_ms']:>10.3f} ms  x{item['ratio']:<7}{item['status']}"
+                if item['status'] == 'regression':
+                    regressions.append(item)
+                    self.stdout.write(self.style.ERROR(line))
+                elif item['status'] == 'improvement':
+                    self.stdout.write(self.style.SUCCESS(line))
+                else:
+                    self.stdout.write(line)
+
+        if options['save_baseline']:
+            save_results(results, DEFAULT_BASELINE_PATH)
+            self.stdout.write(self.style.SUCCESS(f'基线已保存: {DEFAULT_BASELINE_PATH}'))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} 个测试项比基线慢超过 {options["tolerance"]:.0%}')
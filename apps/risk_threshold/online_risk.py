@@ -0,0 +1,436 @@
+"""
+在线风险状态
+每个账户维护一个增量风险累加器，在 save_account_snapshot 写入快照时以O(1)更新：
+- 日收益率的Welford均值/方差
+- 运行峰值与最大回撤
+- 初始资金
+- 收益率直方图草图（用于分位数/VaR）
+- 最近一年的每日收盘资产（用于30/90/180/365天标准窗口）
+
+状态保存在与快照同库的 risk_states 集合中，
+"成立以来"和标准窗口的风险指标可以直接从状态得到，无需读取历史快照。
+多个进程可能同时写入同一账户的快照：每次更新都从集合重新读取状态，
+按 version 字段条件写回，版本已变化时重新读取后重试（乐观锁），不会丢失更新。
+
+同一天可能多次保存快照，累加器以每天最后一次快照的资产作为当日收盘：
+当天的值是"临时"的，只有进入下一个交易日时才计入累计统计。
+周末、节假日保存的快照与前一个交易日重复，不计入（否则会作为0收益率拉低波动率），
+标准窗口按交易日历定位起点，与综合风险评估读取的历史窗口一致。
+"""
+
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from apps.utils.trading_calendar import annual_trading_days, is_trading_day, last_trading_days, trading_days_within
+
+from .risk_kernel import HistoryArrays, compute_risk_indicators
+
+logger = logging.getLogger(__name__)
+
+# 保留的最近每日收盘数（覆盖最长的标准窗口365天）
+RECENT_DAYS = 366
+
+# 标准窗口（天）
+STANDARD_WINDOWS = (30, 90, 180, 365)
+
+# 收益率直方图的桶宽和范围（±20%以外的收益率计入两端的桶）
+SKETCH_BIN_WIDTH = 0.0005
+SKETCH_MAX_BIN = 400
+
+# 状态更新版本冲突时的最多重试次数
+UPDATE_RETRIES = 5
+
+# 进程内缓存的有效期（秒），其他进程的更新最迟在此之后可见
+STATE_CACHE_SECONDS = 60
+
+# account_id -> (状态, 缓存时间)；缓存中的状态不会被修改，读取方拿到的是副本
+_states = {}
+_states_lock = threading.Lock()
+# 串行化本进程内的状态更新（减少版本冲突）
+_update_lock = threading.Lock()
+
+
+def _sketch_bin(value):
+    return min(max(math.floor(value / SKETCH_BIN_WIDTH), -SKETCH_MAX_BIN), SKETCH_MAX_BIN - 1)
+
+
+class RiskAccumulator:
+    """
+    单个账户的增量风险累加器
+
+    count/mean/m2/peak/sketch 等为截至前一个交易日的累计统计，
+    current_date/current_value 为当天（临时）的值
+    """
+
+    def __init__(self, account_id):
+        self.account_id = str(account_id)
+        # 保存次数，用于条件写回
+        self.version = 0
+        self.first_date = None
+        self.initial_capital = None
+        # 截至前一交易日的累计统计
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.peak = None
+        self.peak_date = None
+        self.max_drawdown = 0.0
+        self.max_drawdown_amount = 0.0
+        self.drawdown_peak_value = None
+        self.drawdown_peak_date = None
+        self.drawdown_valley_value = None
+        self.drawdown_valley_date = None
+        self.sketch = {}
+        self.last_close = None
+        self.recent_dates = []
+        self.recent_values = []
+        # 当天（临时）的值
+        self.current_date = None
+        self.current_value = None
+
+    # ---------- 更新 ----------
+
+    def update(self, date, value):
+        """
+        用一条快照更新累加器（O(1)）
+
+        参数:
+            date: 快照日期（YYYY-MM-DD）
+            value: 总资产
+        """
+        if not is_trading_day(date):
+            return
+        value = float(value)
+        if self.current_date is None:
+            self.first_date = date
+            self.initial_capital = value
+        elif date < self.current_date:
+            logger.warning(f'账户 {self.account_id} 快照日期 {date} 早于当前状态日期 {self.current_date}，忽略')
+            return
+        elif date > self.current_date:
+            self._commit_current()
+
+        self.current_date = date
+        self.current_value = value
+
+    def _commit_current(self):
+        """把当天的临时值计入累计统计"""
+        date, value = self.current_date, self.current_value
+
+        if self.last_close is not None and self.last_close > 0:
+            self._add_return((value - self.last_close) / self.last_close)
+
+        self._update_drawdown(date, value)
+
+        self.last_close = value
+        self.recent_dates.append(date)
+        self.recent_values.append(value)
+        if len(self.recent_dates) > RECENT_DAYS:
+            del self.recent_dates[0]
+            del self.recent_values[0]
+
+    def _add_return(self, daily_return):
+        self.count += 1
+        delta = daily_return - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (daily_return - self.mean)
+        key = _sketch_bin(daily_return)
+        self.sketch[key] = self.sketch.get(key, 0) + 1
+
+    def _update_drawdown(self, date, value):
+        if self.peak is None or value > self.peak:
+            self.peak = value
+            self.peak_date = date
+        drawdown = (self.peak - value) / self.peak if self.peak > 0 else 0
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+            self.max_drawdown_amount = self.peak - value
+            self.drawdown_peak_value = self.peak
+            self.drawdown_peak_date = self.peak_date
+            self.drawdown_valley_value = value
+            self.drawdown_valley_date = date
+
+    # ---------- 查询 ----------
+
+    def copy(self):
+        return RiskAccumulator.from_document(self.to_document())
+
+    def _with_current(self):
+        """返回一个计入当天临时值的副本（不修改自身）"""
+        snapshot = self.copy()
+        if snapshot.current_date is not None:
+            snapshot._commit_current()
+        return snapshot
+
+    def _sketch_quantile(self, quantile):
+        """从直方图草图估计收益率分位数（桶内线性插值）"""
+        if self.count == 0:
+            return None
+        target = quantile * (self.count - 1)
+        cumulative = 0
+        for key in sorted(self.sketch):
+            bin_count = self.sketch[key]
+            if cumulative + bin_count > target:
+                return (key + (target - cumulative + 0.5) / bin_count) * SKETCH_BIN_WIDTH
+            cumulative += bin_count
+        return (max(self.sketch) + 1) * SKETCH_BIN_WIDTH
+
+    def inception_indicators(self, confidence_level=0.95):
+        """
+        成立以来的风险指标（只使用累计统计，不读取历史）
+
+        返回:
+            dict: 与 compute_risk_indicators 相同的结构
+        """
+        state = self._with_current()
+        result = {'max_principal_loss': None, 'volatility': None, 'max_drawdown': None, 'var': None}
+        if state.initial_capital is None:
+            return result
+
+        current_value = state.last_close
+        loss_amount = state.initial_capital - current_value
+        result['max_principal_loss'] = {
+            'max_loss_amount': round(loss_amount, 2),
+            'max_loss_rate': round(loss_amount / state.initial_capital * 100, 2) if state.initial_capital > 0 else 0,
+            'initial_capital': round(state.initial_capital, 2),
+            'current_capital': round(current_value, 2)
+        }
+
+        if state.count == 0:
+            return result
+
+        daily_volatility = math.sqrt(state.m2 / state.count) * 100
+        annual_volatility = daily_volatility * math.sqrt(annual_trading_days())
+        result['volatility'] = {
+            'daily_volatility': round(daily_volatility, 2),
+            'annual_volatility': round(annual_volatility, 2),
+            'volatility_level': '低' if annual_volatility < 10 else '中' if annual_volatility < 20 else '高'
+        }
+
+        if state.max_drawdown > 0:
+            result['max_drawdown'] = {
+                'max_drawdown': round(state.max_drawdown * 100, 2),
+                'max_drawdown_amount': round(state.max_drawdown_amount, 2),
+                'peak_value': round(state.drawdown_peak_value, 2),
+                'peak_date': state.drawdown_peak_date,
+                'valley_value': round(state.drawdown_valley_value, 2),
+                'valley_date': state.drawdown_valley_date
+            }
+        else:
+            result['max_drawdown'] = {
+                'max_drawdown': 0.0,
+                'max_drawdown_amount': 0.0,
+                'peak_value': round(state.initial_capital, 2),
+                'peak_date': state.first_date,
+                'valley_value': round(state.initial_capital, 2),
+                'valley_date': state.first_date
+            }
+
+        var_percentile = state._sketch_quantile(1 - confidence_level)
+        result['var'] = {
+            'var_amount': round(abs(current_value * var_percentile), 2),
+            'var_rate': round(abs(var_percentile * 100), 2),
+            'confidence_level': confidence_level * 100,
+            'current_value': round(current_value, 2)
+        }
+        return result
+
+    def window_start(self, days, end=None):
+        """
+        最近days天窗口的第一个交易日（YYYY-MM-DD），与 get_account_history 读取的交易日窗口相同
+
+        参数:
+            days: 窗口（日历日）
+            end: 窗口最后一天，默认今天（与综合风险评估相同）
+        """
+        return str(last_trading_days(trading_days_within(days, end), end)[0])
+
+    def window_indicators(self, days, confidence_level=0.95):
+        """
+        最近days天的风险指标（使用状态中保存的每日收盘，不读取历史）
+
+        返回:
+            dict: 与 compute_risk_indicators 相同的结构
+        """
+        state = self._with_current()
+        if not state.recent_dates:
+            return compute_risk_indicators(None, confidence_level=confidence_level)
+
+        start = state.window_start(days)
+        begin = next(i for i, date in enumerate(state.recent_dates) if date >= start)
+        arrays = HistoryArrays(np.array(state.recent_values[begin:]), date_labels=state.recent_dates[begin:])
+        return compute_risk_indicators(arrays, confidence_level=confidence_level, trading_days=annual_trading_days())
+
+    # ---------- 持久化 ----------
+
+    def to_document(self):
+        """转换为MongoDB文档"""
+        return {
+            'account_id': self.account_id,
+            'version': self.version,
+            'first_date': self.first_date,
+            'initial_capital': self.initial_capital,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'peak': self.peak,
+            'peak_date': self.peak_date,
+            'max_drawdown': self.max_drawdown,
+            'max_drawdown_amount': self.max_drawdown_amount,
+            'drawdown_peak_value': self.drawdown_peak_value,
+            'drawdown_peak_date': self.drawdown_peak_date,
+            'drawdown_valley_value': self.drawdown_valley_value,
+            'drawdown_valley_date': self.drawdown_valley_date,
+            # MongoDB文档的键必须是字符串
+            'sketch': {str(key): count for key, count in self.sketch.items()},
+            'last_close': self.last_close,
+            'recent_dates': list(self.recent_dates),
+            'recent_values': list(self.recent_values),
+            'current_date': self.current_date,
+            'current_value': self.current_value,
+            'updated_at': datetime.now()
+        }
+
+    @classmethod
+    def from_document(cls, document):
+        """从MongoDB文档恢复"""
+        state = cls(document['account_id'])
+        for field in ('version', 'first_date', 'initial_capital', 'count', 'mean', 'm2', 'peak', 'peak_date',
+                      'max_drawdown', 'max_drawdown_amount', 'drawdown_peak_value', 'drawdown_peak_date',
+                      'drawdown_valley_value', 'drawdown_valley_date', 'last_close',
+                      'current_date', 'current_value'):
+            setattr(state, field, document.get(field, getattr(state, field)))
+        state.sketch = {int(key): count for key, count in document.get('sketch', {}).items()}
+        state.recent_dates = list(document.get('recent_dates', []))
+        state.recent_values = list(document.get('recent_values', []))
+        return state
+
+
+# ==================== 状态读写 ====================
+
+def rebuild_risk_state(account_id):
+    """
+    从全部历史快照重建账户的风险状态（首次启用或数据修复时使用）
+
+    返回:
+        RiskAccumulator: 重建后的状态（已保存），账户没有快照时返回None
+    """
+    from apps.utils.db import get_mongodb_db
+    from apps.utils.snapshot_dates import date_sort, snapshot_date
+
+    db = get_mongodb_db()
+    snapshots = db.account_snapshots.find(
+        {'account_id': str(account_id)},
+        projection={'_id': 0, 'date': 1, 'date_key': 1, 'total_asset': 1}
+    ).sort(date_sort(('timestamp', 1)))
+
+    state = RiskAccumulator(account_id)
+    # 接着已有状态的版本，让基于旧状态的并发更新写回失败后重试
+    existing = db.risk_states.find_one({'account_id': str(account_id)}, projection={'version': 1})
+    state.version = (existing or {}).get('version') or 0
+    for snapshot in snapshots:
+        state.update(snapshot_date(snapshot), snapshot.get('total_asset', 0))
+
+    if state.current_date is None:
+        return None
+
+    _save_state(state)
+    logger.info(f'账户 {account_id} 风险状态已从历史快照重建，{state.count} 个日收益率')
+    return state
+
+
+def _cache_state(state):
+    with _states_lock:
+        _states[state.account_id] = (state, time.monotonic())
+
+
+def _save_state(state, expected_version=None):
+    """
+    保存状态（version加1）
+
+    参数:
+        state: 风险状态
+        expected_version: 集合中状态应有的版本，None表示无条件覆盖（重建时使用）
+
+    返回:
+        bool: 是否保存成功（集合中的版本已变化时为False）
+    """
+    from apps.utils.db import get_mongodb_db
+
+    query = {'account_id': state.account_id}
+    if expected_version is not None:
+        # 旧文档没有version字段，视为版本0
+        query['version'] = expected_version if expected_version else {'$in': [0, None]}
+
+    document = state.to_document()
+    document['version'] = state.version + 1
+    result = get_mongodb_db().risk_states.replace_one(query, document, upsert=expected_version is None)
+    if expected_version is not None and result.matched_count == 0:
+        return False
+
+    state.version += 1
+    _cache_state(state)
+    return True
+
+
+def _load_state(account_id):
+    """从risk_states集合读取状态，不存在时返回None"""
+    from apps.utils.db import get_mongodb_db
+
+    document = get_mongodb_db().risk_states.find_one({'account_id': account_id}, projection={'_id': 0})
+    return RiskAccumulator.from_document(document) if document is not None else None
+
+
+def get_risk_state(account_id):
+    """
+    获取账户的风险状态（进程内缓存，未命中或过期时从risk_states集合读取）
+
+    返回:
+        RiskAccumulator: 风险状态的副本（调用方可以修改，不影响缓存），不存在时返回None
+    """
+    account_id = str(account_id)
+    with _states_lock:
+        cached = _states.get(account_id)
+    if cached is not None and time.monotonic() - cached[1] < STATE_CACHE_SECONDS:
+        return cached[0].copy()
+
+    state = _load_state(account_id)
+    if state is None:
+        return None
+    _cache_state(state)
+    return state.copy()
+
+
+def update_risk_state(account_id, date, total_asset):
+    """
+    用新写入的快照更新账户的风险状态（由 save_account_snapshot 调用）
+
+    每次从集合重新读取最新状态，按版本条件写回，版本冲突时重试；
+    状态不存在时从已保存的快照（包含本次快照）重建一次
+
+    参数:
+        account_id: 账户ID
+        date: 快照日期（YYYY-MM-DD）
+        total_asset: 总资产
+    """
+    account_id = str(account_id)
+    with _update_lock:
+        for _ in range(UPDATE_RETRIES):
+            state = _load_state(account_id)
+            if state is None:
+                rebuild_risk_state(account_id)
+                return
+
+            version = state.version
+            state.update(date, total_asset)
+            if _save_state(state, expected_version=version):
+                return
+
+        # 多次冲突说明写入非常频繁，从快照重建（包含本次快照）
+        logger.warning(f'账户 {account_id} 风险状态更新多次版本冲突，从快照重建')
+        rebuild_risk_state(account_id)
@@ -0,0 +1,86 @@
+"""
+持仓数据读取
+为持仓级别的风险分析（风险分解等）提供账户当前持仓
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_mock_positions():
+    """
+    返回模拟持仓（与 /api/account-info/ 模拟数据中的持仓一致）
+
+    返回:
+        list: 持仓列表，每项包含 stock_code / stock_name / volume / market_value 等字段
+    """
+    from apps.account.views import mock_account_data
+
+    return mock_account_data()['accounts'][0]['positions']
+
+
+def load_positions(account_id, use_mock=True):
+    """
+    读取账户当前的全部持仓
+
+    参数:
+        account_id: 账户ID
+        use_mock: 是否使用模拟数据
+
+    返回:
+        tuple: (positions, is_mock)
+            - positions: 持仓列表（convert_positions 的格式，包含 stock_code / stock_name / volume / market_value 等），
+                         连接失败或无持仓时退回模拟持仓
+            - is_mock: 是否为模拟数据
+    """
+    if use_mock:
+        return get_mock_positions(), True
+
+    try:
+        from apps.utils.xt_trader import get_xt_trader_connection, create_stock_account
+
+        xt_trader, connected = get_xt_trader_connection()
+        if not connected:
+            logger.error('连接交易接口失败，使用模拟持仓')
+            return get_mock_positions(), True
+
+        acc = create_stock_account(account_id)
+        xt_trader.subscribe(acc)
+        positions = xt_trader.query_stock_positions(acc)
+        if not positions:
+            logger.warning(f'账户 {account_id} 未查询到持仓信息，使用模拟持仓')
+            return get_mock_positions(), True
+
+        from apps.account.views import convert_positions
+
+        # 风险分析需要全部持仓，不做前10条截断
+        return [pos for pos in convert_positions(positions, account_id, limit=None) if pos['market_value'] > 0], False
+
+    except Exception as e:
+        logger.error(f'读取账户 {account_id} 持仓失败: {str(e)}', exc_info=True)
+        return get_mock_positions(), True
+
+
+def load_total_asset(account_id):
+    """
+    从交易接口读取账户当前总资产
+
+    返回:
+        float: 总资产，连接失败或未查询到资产时返回None
+    """
+    try:
+        from apps.utils.xt_trader import get_xt_trader_connection, create_stock_account
+
+        xt_trader, connected = get_xt_trader_connection()
+        if not connected:
+            return None
+
+        acc = create_stock_account(account_id)
+        xt_trader.subscribe(acc)
+        asset = xt_trader.query_stock_asset(acc)
+        return float(asset.total_asset) if asset else None
+
+    except Exception as e:
+        logger.error(f'读取账户 {account_id} 总资产失败: {str(e)}', exc_info=True)
+        return None
@@ -0,0 +1,174 @@
+"""
+预先计算的风险报告
+收盘后由定时任务（manage.py compute_risk_reports）为全部账户的每个标准窗口
+计算完整的综合风险评估，保存到 risk_reports 集合（每个账户每个窗口一条）。
+综合风险评估接口默认直接返回保存的报告，只在显式刷新或报告过期时重新计算。
+报告保存生成时账户最新快照的版本（snapshot_version），之后写入了新快照的报告视为过期。
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from .batch import compute_indicators_batch
+
+logger = logging.getLogger(__name__)
+
+# 预先计算的标准窗口（天）
+REPORT_WINDOWS = (30, 90, 180, 365)
+
+# 报告的最长有效时间（小时），超过后接口重新计算
+RISK_REPORT_MAX_AGE_HOURS = getattr(settings, 'RISK_REPORT_MAX_AGE_HOURS', 24)
+
+
+def get_stored_report(account_id, days):
+    """
+    读取保存的风险报告
+
+    返回:
+        dict: {'account_id', 'period_days', 'report_date', 'generated_at', 'report'}，不存在或读取失败时返回None
+    """
+    try:
+        from apps.utils.db import get_mongodb_db
+
+        return get_mongodb_db().risk_reports.find_one(
+            {'account_id': str(account_id), 'period_days': days},
+            projection={'_id': 0}
+        )
+    except Exception as e:
+        logger.error(f'读取账户 {account_id} 的风险报告失败: {str(e)}', exc_info=True)
+        return None
+
+
+def is_report_stale(report, snapshot_version, now=None):
+    """
+    判断报告是否过期
+
+    参数:
+        report: get_stored_report 的结果
+        snapshot_version: 账户当前最新快照的版本（get_latest_snapshot_version）
+        now: 当前时间，默认系统时间
+
+    返回:
+        bool: 超过最长有效时间，或生成之后写入了新快照时为True
+    """
+    now = now or datetime.now()
+    if report.get('snapshot_version') != snapshot_version:
+        return True
+    return report['generated_at'] < now - timedelta(hours=RISK_REPORT_MAX_AGE_HOURS)
+
+
+def _report_document(account_id, days, report, generated_at, snapshot_version):
+    return {
+        'account_id': str(account_id),
+        'period_days': days,
+        'report_date': report['assessment_date'],
+        'generated_at': generated_at,
+        'snapshot_version': snapshot_version,
+        'report': report
+    }
+
+
+def save_report(account_id, days, report, snapshot_version, generated_at=None):
+    """
+    保存（覆盖）账户某个窗口的风险报告
+
+    参数:
+        account_id: 账户ID
+        days: 时间窗口（天）
+        report: build_risk_assessment 的结果
+        snapshot_version: 计算报告所用历史的最新快照版本
+        generated_at: 生成时间，默认为当前时间
+    """
+    try:
+        from apps.utils.db import get_mongodb_db
+
+        document = _report_document(account_id, days, report, generated_at or datetime.now(), snapshot_version)
+        get_mongodb_db().risk_reports.replace_one(
+            {'account_id': document['account_id'], 'period_days': days},
+            document,
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f'保存账户 {account_id} 的风险报告失败: {str(e)}', exc_info=True)
+
+
+def _slice_history(account_history, days, end_date):
+    """从较长窗口的历史数据中截取最近days天（按交易日历定位窗口起点，与实时评估读取的窗口一致）"""
+    from apps.utils.trading_calendar import last_trading_days, trading_days_within
+
+    start = str(last_trading_days(trading_days_within(days, end_date), end_date)[0])
+    return [record for record in account_history if record['date'] >= start]
+
+
+def compute_risk_reports(account_ids=None, windows=REPORT_WINDOWS, confidence_level=0.95, workers=None):
+    """
+    为多个账户的每个窗口计算并保存综合风险评估报告
+
+    所有账户只按最长窗口读取一次历史数据，较短窗口从中截取；
+    各窗口的指标用 compute_indicators_batch 批量计算，报告用一次 bulk_write 写入
+
+    参数:
+        account_ids: 账户ID列表，为空时处理数据库中的全部账户
+        windows: 时间窗口列表（天）
+        confidence_level: VaR置信水平
+        workers: 计算进程数
+
+    返回:
+        dict: {
+            'generated_at': 生成时间,
+            'accounts': 处理的账户数,
+            'saved': 保存的报告数,
+            'skipped': {窗口天数: 数据不足的账户ID列表}
+        }
+    """
+    from pymongo import ReplaceOne
+    from apps.utils.db import get_mongodb_db
+    from apps.utils.data_storage import get_all_account_ids, get_accounts_history_bulk, get_latest_snapshot_version
+    from apps.utils.trading_calendar import trading_days_within
+    from .views import build_risk_assessment
+
+    if not account_ids:
+        account_ids = get_all_account_ids()
+    account_ids = [str(account_id) for account_id in account_ids]
+
+    generated_at = datetime.now()
+    end_date = generated_at.date()
+    # 先读取版本再读取历史：之间写入的新快照会让报告被判为过期，而不是被漏掉
+    versions = {account_id: get_latest_snapshot_version(account_id) for account_id in account_ids}
+    histories = get_accounts_history_bulk(account_ids, trading_days=trading_days_within(max(windows), end_date), end_date=end_date)
+
+    operations = []
+    skipped = {}
+    for days in windows:
+        window_histories = {}
+        for account_id, account_history in histories.items():
+            sliced = _slice_history(account_history, days, end_date)
+            if sliced:
+                window_histories[account_id] = sliced
+
+        indicators_by_account = compute_indicators_batch(window_histories, confidence_level=confidence_level, workers=workers)
+
+        window_skipped = set(account_ids) - set(indicators_by_account)
+        for account_id, indicators in indicators_by_account.items():
+            if not all(indicators.values()):
+                window_skipped.add(account_id)
+                continue
+            report = build_risk_assessment(account_id, days, indicators, False)
+            document = _report_document(account_id, days, report, generated_at, versions.get(account_id))
+            operations.append(ReplaceOne({'account_id': account_id, 'period_days': days}, document, upsert=True))
+        skipped[days] = sorted(window_skipped)
+
+    if operations:
+        collection = get_mongodb_db().risk_reports
+        collection.create_index([('account_id', 1), ('period_days', 1)], unique=True)
+        collection.bulk_write(operations, ordered=False)
+
+    logger.info(f'风险报告计算完成: {len(account_ids)} 个账户，保存 {len(operations)} 份报告')
+    return {
+        'generated_at': generated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'accounts': len(account_ids),
+        'saved': len(operations),
+        'skipped': skipped
+    }
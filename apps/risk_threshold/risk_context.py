@@ -0,0 +1,179 @@
+"""
+风险上下文缓存
+前端风险页面一次加载会同时调用 assessment/、max-principal-loss/、volatility/、
+max-drawdown/、var/ 五个接口，它们需要的是同一个 (account_id, days) 的历史数据。
+
+本模块按 (账户, 时间窗口, 最新快照版本) 缓存历史数组和已计算的风险指标，
+与单个请求无关，五个接口之间只读取一次数据库、只计算一次指标。
+有新快照写入时版本变化，缓存自动失效。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+
+from .risk_kernel import build_history_arrays, compute_risk_indicators
+
+logger = logging.getLogger(__name__)
+
+# 缓存的最大上下文数量（LRU淘汰）
+RISK_CONTEXT_CACHE_SIZE = getattr(settings, 'RISK_CONTEXT_CACHE_SIZE', 256)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+# 每个缓存键一把锁，并发请求同一个键时只有一个去读取数据库
+_key_locks = {}
+
+
+class RiskContext:
+    """
+    一个 (账户, 时间窗口, 快照版本) 对应的风险计算上下文
+
+    属性:
+        account_id: 账户ID
+        days: 时间窗口（天）
+        version: 快照版本标识（模拟数据为生成日期）
+        is_mock: 是否为模拟数据
+        history: 原始历史数据列表
+        arrays: 历史数据的数组形式（HistoryArrays）
+    """
+
+    __slots__ = ('account_id', 'days', 'version', 'is_mock', 'history', 'arrays', '_indicators', '_lock')
+
+    def __init__(self, account_id, days, version, is_mock, history):
+        self.account_id = account_id
+        self.days = days
+        self.version = version
+        self.is_mock = is_mock
+        self.history = history
+        self.arrays = build_history_arrays(history)
+        self._indicators = {}
+        self._lock = threading.Lock()
+
+    def indicators(self, confidence_level=0.95):
+        """
+        获取全部风险指标（按置信水平缓存，只计算一次）
+
+        返回:
+            dict: compute_risk_indicators 的结果，调用方不应修改其中的字典
+        """
+        result = self._indicators.get(confidence_level)
+        if result is None:
+            with self._lock:
+                result = self._indicators.get(confidence_level)
+                if result is None:
+                    from apps.utils.trading_calendar import annual_trading_days
+                    result = compute_risk_indicators(self.arrays, confidence_level=confidence_level, trading_days=annual_trading_days())
+                    self._indicators[confidence_level] = result
+        return result
+
+    def max_principal_loss(self):
+        return self.indicators()['max_principal_loss']
+
+    def volatility(self):
+        return self.indicators()['volatility']
+
+    def max_drawdown(self):
+        return self.indicators()['max_drawdown']
+
+    def var(self, confidence_level=0.95):
+        return self.indicators(confidence_level)['var']
+
+
+def _get_key_lock(key):
+    with _cache_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def _cache_get(key, version):
+    with _cache_lock:
+        context = _cache.get(key)
+        if context is None or context.version != version:
+            return None
+        _cache.move_to_end(key)
+        return context
+
+
+def _cache_put(key, context):
+    with _cache_lock:
+        _cache[key] = context
+        _cache.move_to_end(key)
+        while len(_cache) > RISK_CONTEXT_CACHE_SIZE:
+            old_key, _ = _cache.popitem(last=False)
+            _key_locks.pop(old_key, None)
+
+
+def _load_context(account_id, days, use_mock, version):
+    """读取历史数据并创建上下文（无真实数据时使用模拟数据）"""
+    from .views import get_account_history_from_xt, get_mock_account_history
+
+    account_history = None if use_mock else get_account_history_from_xt(account_id, days)
+
+    if account_history is None:
+        logger.info('使用模拟数据')
+        return RiskContext(account_id, days, version, True, get_mock_account_history(days))
+
+    return RiskContext(account_id, days, version, False, account_history)
+
+
+def get_risk_context(account_id, days=30, use_mock=True):
+    """
+    获取风险上下文（命中缓存时不访问历史数据）
+
+    参数:
+        account_id: 账户ID
+        days: 时间窗口（天）
+        use_mock: 是否使用模拟数据
+
+    返回:
+        RiskContext: 风险上下文
+    """
+    if use_mock:
+        # 模拟数据与账户无关，只随日期变化
+        key = ('mock', days)
+        version = datetime.now().date().isoformat()
+    else:
+        from apps.utils.data_storage import get_latest_snapshot_version
+
+        key = (str(account_id), days)
+        version = get_latest_snapshot_version(account_id)
+
+    context = _cache_get(key, version)
+    if context is not None:
+        return context
+
+    with _get_key_lock(key):
+        # 双重检查：等待锁期间其他请求可能已经加载完成
+        context = _cache_get(key, version)
+        if context is not None:
+            return context
+
+        context = _load_context(account_id, days, use_mock, version)
+        # 没有快照版本（数据库不可用或无数据）时不缓存，下次重新尝试
+        if version is not None:
+            _cache_put(key, context)
+        logger.info(f'风险上下文已加载: key={key}, version={version}, 记录数={len(context.history)}')
+        return context
+
+
+def invalidate_risk_context(account_id=None):
+    """
+    清除风险上下文缓存
+
+    参数:
+        account_id: 只清除指定账户的缓存，为None时清除全部
+    """
+    with _cache_lock:
+        if account_id is None:
+            _cache.clear()
+            _key_locks.clear()
+            return
+        for key in [k for k in _cache if k[0] == str(account_id)]:
+            del _cache[key]
+            _key_locks.pop(key, None)
@@ -0,0 +1,414 @@
+"""
+风险指标计算内核
+将账户历史数据一次性转换为连续的float64数组，只计算一次日收益率，
+最大本金损失、波动率、最大回撤、VaR均基于同一组数组向量化计算
+
+本模块只依赖numpy，不依赖Django，可在进程池和基准测试中直接使用
+"""
+
+import numpy as np
+
+# 年化使用的交易日数
+TRADING_DAYS_PER_YEAR = 252
+
+
+class HistoryArrays:
+    """
+    账户历史数据的数组形式
+
+    属性:
+        values: 每日总资产，float64连续数组
+        dates: 每日日期，datetime64[D]数组（首次访问时由日期字符串转换）
+        returns: 日收益率（首次访问时计算，之后复用）
+    """
+
+    __slots__ = ('values', '_dates', '_date_labels', '_returns')
+
+    def __init__(self, values, dates=None, date_labels=None):
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self._dates = None if dates is None else np.asarray(dates, dtype='datetime64[D]')
+        self._date_labels = date_labels
+        self._returns = None
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def dates(self):
+        """日期数组（datetime64[D]）"""
+        if self._dates is None:
+            self._dates = np.array(self._date_labels, dtype='datetime64[D]')
+        return self._dates
+
+    @property
+    def returns(self):
+        """
+        日收益率数组（只计算一次）
+
+        与原逐条循环的口径一致：前一日资产<=0的收益率被剔除
+        """
+        if self._returns is None:
+            self._returns = compute_returns(self.values)
+        return self._returns
+
+    def date_str(self, index):
+        """返回指定位置的日期字符串（YYYY-MM-DD）"""
+        if self._date_labels is not None:
+            return self._date_labels[index]
+        return str(self._dates[index])
+
+
+def build_history_arrays(account_history):
+    """
+    将账户历史数据列表转换为HistoryArrays
+
+    日期字符串的解析开销远大于数值计算，因此日期只保留原始字符串，
+    需要做日期运算时才转换为datetime64数组
+
+    参数:
+        account_history: 账户历史数据列表（含date和total_assets字段），
+                         如果已经是HistoryArrays则原样返回
+
+    返回:
+        HistoryArrays: 数组形式的历史数据，数据为空时返回None
+    """
+    if isinstance(account_history, HistoryArrays):
+        return account_history
+    if not account_history:
+        return None
+
+    count = len(account_history)
+    values = np.fromiter(
+        (record['total_assets'] for record in account_history),
+        dtype=np.float64,
+        count=count
+    )
+    date_labels = [record['date'][:10] for record in account_history]
+    return HistoryArrays(values, date_labels=date_labels)
+
+
+def compute_returns(values):
+    """
+    向量化计算日收益率
+
+    参数:
+        values: 资产序列数组
+
+    返回:
+        np.ndarray: 日收益率数组（剔除前一日资产<=0的记录）
+    """
+    if values.shape[0] < 2:
+        return np.empty(0, dtype=np.float64)
+
+    prev_values = values[:-1]
+    valid = prev_values > 0
+    if valid.all():
+        return np.diff(values) / prev_values
+    return (values[1:][valid] - prev_values[valid]) / prev_values[valid]
+
+
+# ==================== 风险指标 ====================
+
+def compute_max_principal_loss(arrays):
+    """
+    计算最大本金损失
+
+    公式: (初始资金 - 当前资金) / 初始资金 × 100%
+
+    返回:
+        dict: 与 views.calculate_max_principal_loss 相同的结构
+    """
+    if arrays is None or len(arrays) == 0:
+        return None
+
+    initial_capital = float(arrays.values[0])
+    current_capital = float(arrays.values[-1])
+
+    loss_amount = initial_capital - current_capital
+    loss_rate = (loss_amount / initial_capital * 100) if initial_capital > 0 else 0
+
+    return {
+        'max_loss_amount': round(loss_amount, 2),
+        'max_loss_rate': round(loss_rate, 2),
+        'initial_capital': round(initial_capital, 2),
+        'current_capital': round(current_capital, 2)
+    }
+
+
+def compute_volatility(arrays, trading_days=TRADING_DAYS_PER_YEAR):
+    """
+    计算波动率（日收益率的总体标准差）
+
+    参数:
+        arrays: HistoryArrays
+        trading_days: 年化使用的交易日数
+
+    返回:
+        dict: 与 views.calculate_volatility 相同的结构
+    """
+    if arrays is None or len(arrays) < 2:
+        return None
+
+    returns = arrays.returns
+    if returns.shape[0] == 0:
+        return None
+
+    daily_volatility = float(returns.std()) * 100
+    annual_volatility = daily_volatility * float(np.sqrt(trading_days))
+
+    if annual_volatility < 10:
+        volatility_level = '低'
+    elif annual_volatility < 20:
+        volatility_level = '中'
+    else:
+        volatility_level = '高'
+
+    return {
+        'daily_volatility': round(daily_volatility, 2),
+        'annual_volatility': round(annual_volatility, 2),
+        'volatility_level': volatility_level
+    }
+
+
+def compute_drawdown_series(values):
+    """
+    计算回撤序列（基于运行最大值）
+
+    参数:
+        values: 资产序列数组
+
+    返回:
+        tuple: (running_peak, peak_index, drawdown)
+            - running_peak: 截至每一天的资产最高点
+            - peak_index: 最高点首次出现的位置
+            - drawdown: 每一天的回撤比例（0~1）
+    """
+    count = values.shape[0]
+    running_peak = np.maximum.accumulate(values)
+
+    # 只有严格创新高时才更新峰值日期，与逐条循环的口径一致
+    is_new_peak = np.empty(count, dtype=bool)
+    is_new_peak[0] = True
+    np.greater(values[1:], running_peak[:-1], out=is_new_peak[1:])
+    peak_index = np.maximum.accumulate(np.where(is_new_peak, np.arange(count), 0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(running_peak > 0, (running_peak - values) / running_peak, 0.0)
+
+    return running_peak, peak_index, drawdown
+
+
+def compute_max_drawdown(arrays):
+    """
+    计算最大回撤
+
+    公式: (资产最高点 - 最高点之后的最低点) / 资产最高点 × 100%
+
+    返回:
+        dict: 与 views.calculate_max_drawdown 相同的结构
+    """
+    if arrays is None or len(arrays) < 2:
+        return None
+
+    values = arrays.values
+    running_peak, peak_index, drawdown = compute_drawdown_series(values)
+
+    valley = int(np.argmax(drawdown))
+    max_drawdown = float(drawdown[valley])
+    if max_drawdown > 0:
+        peak = int(peak_index[valley])
+        max_drawdown_amount = float(running_peak[valley] - values[valley])
+    else:
+        # 没有回撤时，峰值和谷底都取第一天
+        peak = valley = 0
+        max_drawdown_amount = 0.0
+
+    return {
+        'max_drawdown': round(max_drawdown * 100, 2),
+        'max_drawdown_amount': round(max_drawdown_amount, 2),
+        'peak_value': round(float(values[peak]), 2),
+        'peak_date': arrays.date_str(peak),
+        'valley_value': round(float(values[valley]), 2),
+        'valley_date': arrays.date_str(valley)
+    }
+
+
+def compute_var(arrays, confidence_level=0.95):
+    """
+    计算VaR值（历史模拟法）
+
+    返回:
+        dict: 与 views.calculate_var 相同的结构
+    """
+    if arrays is None or len(arrays) < 2:
+        return None
+
+    returns = arrays.returns
+    if returns.shape[0] == 0:
+        return None
+
+    current_value = float(arrays.values[-1])
+    var_percentile = float(np.percentile(returns, (1 - confidence_level) * 100))
+    var_amount = abs(current_value * var_percentile)
+    var_rate = abs(var_percentile * 100)
+
+    return {
+        'var_amount': round(var_amount, 2),
+        'var_rate': round(var_rate, 2),
+        'confidence_level': confidence_level * 100,
+        'current_value': round(current_value, 2)
+    }
+
+
+def compute_risk_indicators(account_history, confidence_level=0.95, trading_days=TRADING_DAYS_PER_YEAR):
+    """
+    一次性计算全部风险指标（共享同一组数组和收益率）
+
+    参数:
+        account_history: 账户历史数据列表或HistoryArrays
+        confidence_level: VaR置信水平
+        trading_days: 年化使用的交易日数（Django环境中由交易日历 annual_trading_days 提供）
+
+    返回:
+        dict: {
+            'max_principal_loss': {...},
+            'volatility': {...},
+            'max_drawdown': {...},
+            'var': {...}
+        }
+    """
+    arrays = build_history_arrays(account_history)
+    return {
+        'max_principal_loss': compute_max_principal_loss(arrays),
+        'volatility': compute_volatility(arrays, trading_days=trading_days),
+        'max_drawdown': compute_max_drawdown(arrays),
+        'var': compute_var(arrays, confidence_level=confidence_level)
+    }
+
+
+# ==================== 滚动窗口指标 ====================
+
+def compute_aligned_returns(values):
+    """
+    计算与资产序列等长的日收益率
+
+    第一天以及前一日资产<=0的位置为NaN，便于按日期对齐滚动计算
+
+    参数:
+        values: 资产序列数组
+
+    返回:
+        np.ndarray: 日收益率数组（长度与values相同）
+    """
+    returns = np.full(values.shape[0], np.nan)
+    if values.shape[0] < 2:
+        return returns
+
+    prev_values = values[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = np.where(prev_values > 0, np.diff(values) / prev_values, np.nan)
+    return returns
+
+
+def _window_sums(array, window):
+    """利用前缀和计算每个位置结尾的窗口和（O(n)），窗口不满时为NaN"""
+    prefix = np.concatenate(([0.0], np.cumsum(array)))
+    sums = np.full(array.shape[0], np.nan)
+    if array.shape[0] >= window:
+        sums[window - 1:] = prefix[window:] - prefix[:-window]
+    return sums
+
+
+def rolling_volatility(returns, window, trading_days=TRADING_DAYS_PER_YEAR):
+    """
+    滚动波动率（O(n)，基于收益率的前缀和与平方前缀和）
+
+    参数:
+        returns: compute_aligned_returns 的结果
+        window: 窗口长度（观测数）
+        trading_days: 年化使用的交易日数
+
+    返回:
+        tuple: (daily_volatility, annual_volatility)，单位为%，
+               窗口不满或有效收益率少于2个时为NaN
+    """
+    valid = ~np.isnan(returns)
+    # 先减去整体均值再累加，降低平方和相减带来的精度损失
+    shift = returns[valid].mean() if valid.any() else 0.0
+    centered = np.where(valid, returns - shift, 0.0)
+
+    counts = _window_sums(valid.astype(np.float64), window)
+    sums = _window_sums(centered, window)
+    squares = _window_sums(centered * centered, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = squares / counts - (sums / counts) ** 2
+    variance = np.where(counts >= 2, np.maximum(variance, 0.0), np.nan)
+
+    daily_volatility = np.sqrt(variance) * 100
+    return daily_volatility, daily_volatility * np.sqrt(trading_days)
+
+
+def rolling_var(returns, window, confidence_level=0.95):
+    """
+    滚动历史模拟VaR
+
+    维护一个有序窗口，每步用二分查找插入新收益率、删除移出窗口的收益率，
+    避免每个窗口重新排序；分位数插值方式与np.percentile（linear）一致
+
+    参数:
+        returns: compute_aligned_returns 的结果
+        window: 窗口长度（观测数）
+        confidence_level: 置信水平
+
+    返回:
+        np.ndarray: VaR比率（%），窗口不满或没有有效收益率时为NaN
+    """
+    from bisect import bisect_left, insort
+
+    count = returns.shape[0]
+    result = np.full(count, np.nan)
+    quantile = 1 - confidence_level
+    values = returns.tolist()
+    ordered = []
+
+    for i in range(count):
+        value = values[i]
+        if value == value:  # 跳过NaN
+            insort(ordered, value)
+        if i >= window:
+            removed = values[i - window]
+            if removed == removed:
+                del ordered[bisect_left(ordered, removed)]
+        if i < window - 1 or not ordered:
+            continue
+
+        position = quantile * (len(ordered) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        fraction = position - lower
+        percentile = ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+        result[i] = abs(percentile * 100)
+
+    return result
+
+
+def underwater_duration(values):
+    """
+    水下持续时间：距离最近一次资产创新高经过的观测数（O(n)）
+
+    参数:
+        values: 资产序列数组
+
+    返回:
+        np.ndarray: 每一天的水下持续观测数（处于高点时为0）
+    """
+    count = values.shape[0]
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+
+    running_peak = np.maximum.accumulate(values)
+    positions = np.arange(count)
+    at_peak = values >= running_peak
+    last_peak = np.maximum.accumulate(np.where(at_peak, positions, 0))
+    return positions - last_peak
@@ -0,0 +1,218 @@
+"""
+组合压力测试 / 情景分析
+对账户当前全部持仓施加按股票、地区（get_stock_regions）、行业板块或全市场定义的冲击，
+一次评估多个情景：
+
+    冲击矩阵 S（情景数 × 持仓数） 由各冲击的持仓掩码 × 涨跌幅累加得到
+    情景盈亏 = S @ 持仓市值
+
+同一情景中作用于同一只股票的多个冲击按涨跌幅相加（单只股票最多跌100%），
+相同的冲击目标在所有情景间只计算一次掩码，几百个情景也只需一次矩阵乘法。
+
+冲击定义示例:
+    {
+        "name": "沪市下跌8%且银行下跌5%",
+        "shocks": [
+            {"type": "region", "target": "上海", "change": -0.08},
+            {"type": "sector", "target": "银行", "change": -0.05}
+        ]
+    }
+type 取值: stock（股票代码）、region（地区）、sector（迅投板块名称）、market（全部持仓，无需target）
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHOCK_TYPES = ('stock', 'region', 'sector', 'market')
+
+# 单次请求最多的情景数
+MAX_SCENARIOS = 1000
+
+# 未指定情景时使用的默认情景
+DEFAULT_SCENARIOS = [
+    {'name': '全市场下跌5%', 'shocks': [{'type': 'market', 'change': -0.05}]},
+    {'name': '全市场下跌10%', 'shocks': [{'type': 'market', 'change': -0.10}]},
+    {'name': '全市场下跌20%', 'shocks': [{'type': 'market', 'change': -0.20}]},
+    {'name': '沪市下跌8%', 'shocks': [{'type': 'region', 'target': '上海', 'change': -0.08}]},
+    {'name': '深市下跌8%', 'shocks': [{'type': 'region', 'target': '深圳', 'change': -0.08}]},
+    {'name': '沪市下跌8%且银行下跌5%', 'shocks': [
+        {'type': 'region', 'target': '上海', 'change': -0.08},
+        {'type': 'sector', 'target': '银行', 'change': -0.05}
+    ]},
+]
+
+
+class ScenarioError(ValueError):
+    """情景定义不合法"""
+
+
+def _load_sector_members(sector):
+    """读取迅投板块成分股（优先使用预热的板块缓存），失败时返回None"""
+    from apps.utils.sector_cache import get_sector_members
+
+    members = get_sector_members(sector)
+    if members is not None:
+        return members
+    try:
+        from xtquant import xtdata
+
+        return set(xtdata.get_stock_list_in_sector(sector))
+    except Exception as e:
+        logger.warning(f'读取板块 {sector} 成分股失败: {str(e)}')
+        return None
+
+
+def validate_scenarios(scenarios):
+    """
+    校验情景定义
+
+    异常:
+        ScenarioError: 情景格式不正确
+    """
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ScenarioError('scenarios必须是非空列表')
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ScenarioError(f'情景数不能超过{MAX_SCENARIOS}')
+
+    for i, scenario in enumerate(scenarios):
+        shocks = scenario.get('shocks') if isinstance(scenario, dict) else None
+        if not isinstance(shocks, list) or not shocks:
+            raise ScenarioError(f'第{i + 1}个情景缺少shocks')
+        for shock in shocks:
+            if not isinstance(shock, dict) or shock.get('type') not in SHOCK_TYPES:
+                raise ScenarioError(f'第{i + 1}个情景的冲击类型必须为 {"/".join(SHOCK_TYPES)} 之一')
+            if shock['type'] != 'market' and not shock.get('target'):
+                raise ScenarioError(f'第{i + 1}个情景的{shock["type"]}冲击缺少target')
+            if not isinstance(shock.get('change'), (int, float)) or shock['change'] < -1:
+                raise ScenarioError(f'第{i + 1}个情景的change必须是不小于-1的数值（-0.08表示下跌8%）')
+
+
+def build_shock_matrix(positions, scenarios, sector_loader=_load_sector_members):
+    """
+    构建冲击矩阵
+
+    参数:
+        positions: 持仓列表（至少包含 stock_code）
+        scenarios: 情景定义列表
+        sector_loader: 板块成分股读取函数（返回集合，失败返回None）
+
+    返回:
+        tuple: (shock_matrix, unresolved)
+            - shock_matrix: 情景数 × 持仓数 的涨跌幅矩阵
+            - unresolved: 无法解析的板块名称列表
+    """
+    from apps.utils.stock_info import get_stock_regions
+
+    codes = np.array([pos['stock_code'] for pos in positions])
+    regions = np.array(get_stock_regions(codes.tolist()))
+    everything = np.ones(codes.shape[0], dtype=bool)
+
+    masks = {}
+    unresolved = set()
+
+    def mask_for(shock):
+        key = (shock['type'], shock.get('target'))
+        mask = masks.get(key)
+        if mask is None:
+            if shock['type'] == 'market':
+                mask = everything
+            elif shock['type'] == 'stock':
+                mask = codes == shock['target']
+            elif shock['type'] == 'region':
+                mask = regions == shock['target']
+            else:
+                members = sector_loader(shock['target'])
+                if members is None:
+                    unresolved.add(shock['target'])
+                    members = ()
+                mask = np.isin(codes, list(members))
+            masks[key] = mask
+        return mask
+
+    shock_matrix = np.zeros((len(scenarios), codes.shape[0]))
+    for i, scenario in enumerate(scenarios):
+        for shock in scenario['shocks']:
+            shock_matrix[i] += mask_for(shock) * shock['change']
+    np.maximum(shock_matrix, -1.0, out=shock_matrix)
+
+    return shock_matrix, sorted(unresolved)
+
+
+def run_stress_test(positions, scenarios, total_asset, peak_value=None, indicators=None,
+                    sector_loader=_load_sector_members, top=3):
+    """
+    执行压力测试
+
+    参数:
+        positions: 持仓列表（包含 stock_code / market_value，可选 stock_name）
+        scenarios: 情景定义列表
+        total_asset: 当前总资产
+        peak_value: 历史峰值资产（用于计算冲击后的回撤），默认为当前总资产
+        indicators: 当前风险指标（compute_risk_indicators 的结果），
+                    用于结合冲击后的损失和回撤重新计算风险分数
+        sector_loader: 板块成分股读取函数
+        top: 每个情景返回亏损最大的持仓数
+
+    返回:
+        dict: {'total_asset', 'positions_value', 'scenarios': [...], 'unresolved_sectors': [...]}
+    """
+    from .views import get_risk_score, get_risk_level_by_score
+
+    market_values = np.array([pos['market_value'] for pos in positions], dtype=np.float64)
+    names = [pos.get('stock_name', pos['stock_code']) for pos in positions]
+    peak_value = max(peak_value or total_asset, total_asset)
+
+    shock_matrix, unresolved = build_shock_matrix(positions, scenarios, sector_loader)
+
+    # 一次矩阵乘法得到全部情景的盈亏
+    position_pnl = shock_matrix * market_values
+    pnl = shock_matrix @ market_values
+    stressed_asset = total_asset + pnl
+    loss_rate = -pnl / total_asset * 100 if total_asset > 0 else np.zeros_like(pnl)
+    stressed_drawdown = (peak_value - stressed_asset) / peak_value * 100 if peak_value > 0 else np.zeros_like(pnl)
+    worst = np.argsort(position_pnl, axis=1)[:, :top]
+
+    results = []
+    for i, scenario in enumerate(scenarios):
+        item = {
+            'name': scenario.get('name', f'情景{i + 1}'),
+            'pnl': round(float(pnl[i]), 2),
+            'pnl_rate': round(float(-loss_rate[i]), 2),
+            'stressed_asset': round(float(stressed_asset[i]), 2),
+            'stressed_drawdown': round(float(max(stressed_drawdown[i], 0.0)), 2),
+            'loss_status': '正常' if loss_rate[i] < 10 else '警告' if loss_rate[i] < 20 else '危险',
+            'affected_positions': int(np.count_nonzero(shock_matrix[i])),
+            'worst_positions': [
+                {
+                    'stock_code': positions[j]['stock_code'],
+                    'stock_name': names[j],
+                    'pnl': round(float(position_pnl[i, j]), 2)
+                }
+                for j in worst[i] if position_pnl[i, j] < 0
+            ]
+        }
+
+        if indicators and indicators.get('volatility') and indicators.get('var') and indicators.get('max_drawdown'):
+            # 冲击后的本金损失率相对窗口初始资金计算
+            initial_capital = indicators['max_principal_loss']['initial_capital']
+            stressed_loss_rate = (initial_capital - stressed_asset[i]) / initial_capital * 100 if initial_capital > 0 else 0.0
+            risk_score = get_risk_score(
+                abs(float(stressed_loss_rate)),
+                indicators['volatility']['annual_volatility'],
+                max(indicators['max_drawdown']['max_drawdown'], float(stressed_drawdown[i])),
+                indicators['var']['var_rate']
+            )
+            item['risk_score'] = risk_score
+            item['risk_level'] = get_risk_level_by_score(risk_score)
+
+        results.append(item)
+
+    return {
+        'total_asset': round(float(total_asset), 2),
+        'positions_value': round(float(market_values.sum()), 2),
+        'scenarios': results,
+        'unresolved_sectors': unresolved
+    }
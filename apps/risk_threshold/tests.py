@@ -1,4 +1,174 @@
-from django.test import TestCase
+import numpy as np
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .benchmarks.kernel_speedup import legacy_risk_indicators, make_history
+from .risk_kernel import (
+    TRADING_DAYS_PER_YEAR,
+    compute_aligned_returns,
+    compute_risk_indicators,
+    rolling_var,
+    rolling_volatility
+)
+from .var_engine import (
+    compute_var_engine,
+    historical_var_es,
+    monte_carlo_var_es,
+    norm_pdf,
+    norm_ppf,
+    parametric_var_es,
+    return_moments
+)
 
+
+def _history(values, start='2025-01-01'):
+    dates = np.arange(len(values)) + np.datetime64(start, 'D')
+    return [
+        {'date': str(date), 'total_assets': float(value)}
+        for date, value in zip(dates, values)
+    ]
+
+
+class RiskKernelTest(SimpleTestCase):
+    """向量化内核与原逐条循环实现的结果一致"""
+
+    def assert_matches_legacy(self, history):
+        self.assertEqual(
+            compute_risk_indicators(history, trading_days=TRADING_DAYS_PER_YEAR),
+            legacy_risk_indicators(history)
+        )
+
+    def test_random_histories(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                self.assert_matches_legacy(make_history(500, seed=seed))
+
+    def test_drawdown_and_recovery(self):
+        # 两次回撤，第二次更深；回到原高点不算创新高，峰值日期不变
+        self.assert_matches_legacy(_history([100, 120, 90, 120, 130, 80, 95, 130]))
+
+    def test_monotonic_growth(self):
+        result = compute_risk_indicators(_history([100, 101, 102, 103]))
+        self.assertEqual(result['max_drawdown']['max_drawdown'], 0)
+        self.assertEqual(result['max_drawdown']['peak_date'], '2025-01-01')
+        self.assert_matches_legacy(_history([100, 101, 102, 103]))
+
+    def test_zero_asset_day_skipped_in_returns(self):
+        self.assert_matches_legacy(_history([100, 110, 0, 50, 60, 55]))
+
+    def test_short_history(self):
+        result = compute_risk_indicators(_history([100]))
+        self.assertIsNotNone(result['max_principal_loss'])
+        self.assertIsNone(result['volatility'])
+        self.assertIsNone(result['max_drawdown'])
+        self.assertIsNone(result['var'])
+        self.assertEqual(compute_risk_indicators([]), {
+            'max_principal_loss': None, 'volatility': None, 'max_drawdown': None, 'var': None
+        })
+
+
+class RollingRiskTest(SimpleTestCase):
+    """滚动指标与逐窗口重新计算的结果一致"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        values = 1000000 * np.cumprod(1 + rng.normal(0.0005, 0.02, 300))
+        # 资产为0的一天之后的收益率无效（NaN）
+        values[120] = 0
+        self.returns = compute_aligned_returns(values)
+
+    def windows(self, window):
+        for end in range(window - 1, self.returns.shape[0]):
+            chunk = self.returns[end - window + 1:end + 1]
+            yield end, chunk[~np.isnan(chunk)]
+
+    def test_rolling_volatility(self):
+        for window in (5, 20, 60):
+            with self.subTest(window=window):
+                daily, annual = rolling_volatility(self.returns, window)
+                expected = np.full(self.returns.shape[0], np.nan)
+                for end, chunk in self.windows(window):
+                    if chunk.shape[0] >= 2:
+                        expected[end] = chunk.std() * 100
+                np.testing.assert_allclose(daily, expected, rtol=1e-9, atol=1e-9)
+                np.testing.assert_allclose(annual, expected * np.sqrt(TRADING_DAYS_PER_YEAR), rtol=1e-9, atol=1e-9)
+
+    def test_rolling_var(self):
+        for window in (5, 20, 60):
+            for confidence_level in (0.95, 0.99):
+                with self.subTest(window=window, confidence_level=confidence_level):
+                    result = rolling_var(self.returns, window, confidence_level)
+                    expected = np.full(self.returns.shape[0], np.nan)
+                    for end, chunk in self.windows(window):
+                        if chunk.shape[0]:
+                            expected[end] = abs(np.percentile(chunk, (1 - confidence_level) * 100) * 100)
+                    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+class VarEngineTest(SimpleTestCase):
+    """VaR/ES 各计算方法"""
+
+    confidence_levels = (0.95, 0.99)
+    horizons = (1, 10)
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.returns = rng.normal(0.0004, 0.015, 750)
+        self.moments = return_moments(self.returns)
+
+    def test_norm_ppf(self):
+        np.testing.assert_allclose(
+            norm_ppf([0.01, 0.05, 0.5, 0.95, 0.99]),
+            [-2.3263478740, -1.6448536270, 0.0, 1.6448536270, 2.3263478740],
+            atol=1e-8
+        )
+
+    def test_historical(self):
+        var, es = historical_var_es(self.returns, self.confidence_levels, self.horizons)
+        for i, confidence_level in enumerate(self.confidence_levels):
+            quantile = np.percentile(self.returns, (1 - confidence_level) * 100)
+            tail_mean = self.returns[self.returns <= quantile].mean()
+            for j, horizon in enumerate(self.horizons):
+                self.assertAlmostEqual(var[i, j], -quantile * np.sqrt(horizon), places=12)
+                self.assertAlmostEqual(es[i, j], -tail_mean * np.sqrt(horizon), places=12)
+
+    def test_parametric(self):
+        var, es = parametric_var_es(self.moments, self.confidence_levels, self.horizons)
+        mean, std = self.returns.mean(), self.returns.std()
+        for i, confidence_level in enumerate(self.confidence_levels):
+            z = float(norm_ppf(1 - confidence_level))
+            for j, horizon in enumerate(self.horizons):
+                self.assertAlmostEqual(var[i, j], -(mean * horizon + z * std * np.sqrt(horizon)), places=12)
+                expected_es = -(mean * horizon - std * np.sqrt(horizon) * float(norm_pdf(z)) / (1 - confidence_level))
+                self.assertAlmostEqual(es[i, j], expected_es, places=12)
+        # ES 不小于同一置信水平的 VaR
+        self.assertTrue((es >= var).all())
+
+    def test_monte_carlo_fixed_seed(self):
+        first = monte_carlo_var_es(self.moments, self.confidence_levels, self.horizons, simulations=50000, seed=3)
+        second = monte_carlo_var_es(self.moments, self.confidence_levels, self.horizons, simulations=50000, seed=3)
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+
+        # 单日持有期的模拟结果接近参数法
+        var, es = monte_carlo_var_es(self.moments, self.confidence_levels, (1,), simulations=200000, seed=3)
+        expected_var, expected_es = parametric_var_es(self.moments, self.confidence_levels, (1,))
+        np.testing.assert_allclose(var, expected_var, rtol=0.03)
+        np.testing.assert_allclose(es, expected_es, rtol=0.03)
+
+    def test_monte_carlo_step_limit(self):
+        with self.assertRaises(ValueError):
+            monte_carlo_var_es(self.moments, (0.95,), (250,), simulations=200000)
+
+    def test_compute_var_engine(self):
+        result = compute_var_engine(self.returns, 1000000, methods=('historical', 'parametric'), horizons=(1,))
+        self.assertEqual(result['observations'], 750)
+        self.assertEqual(set(result['results']), {'historical', 'parametric'})
+        row = result['results']['parametric'][0]
+        self.assertEqual(row['confidence_level'], 95.0)
+        self.assertAlmostEqual(row['var_amount'], row['var_rate'] / 100 * 1000000, delta=100)
+
+        self.assertIsNone(compute_var_engine(self.returns[:1], 1000000))
+        with self.assertRaises(ValueError):
+            compute_var_engine(self.returns, 1000000, horizons=(0,))
+        with self.assertRaises(ValueError):
+            compute_var_engine(self.returns, 1000000, horizons=())
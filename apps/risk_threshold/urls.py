@@ -8,7 +8,16 @@ from .views import (
     get_max_principal_loss,
     get_volatility,
     get_max_drawdown,
-    get_var_value
+    get_var_value,
+    get_rolling_risk,
+    get_batch_risk_assessment,
+    get_var_engine,
+    get_risk_decomposition,
+    get_online_risk,
+    get_risk_alerts,
+    get_risk_alert_stream,
+    get_risk_alert_stats,
+    get_stress_test
 )
 
 urlpatterns = [
@@ -20,5 +29,26 @@ urlpatterns = [
     path('volatility/', get_volatility, name='volatility'),
     path('max-drawdown/', get_max_drawdown, name='max_drawdown'),
     path('var/', get_var_value, name='var_value'),
+    path('var-engine/', get_var_engine, name='var_engine'),
+    
+    # 在线风险状态接口（成立以来和标准窗口）
+    path('online/', get_online_risk, name='online_risk'),
+    
+    # 滚动风险时间序列接口
+    path('rolling/', get_rolling_risk, name='rolling_risk'),
+    
+    # 持仓风险分解接口
+    path('decomposition/', get_risk_decomposition, name='risk_decomposition'),
+    
+    # 组合压力测试接口
+    path('stress-test/', get_stress_test, name='stress_test'),
+    
+    # 实时风险告警接口（轮询、SSE推送、引擎统计）
+    path('alerts/', get_risk_alerts, name='risk_alerts'),
+    path('alerts/stream/', get_risk_alert_stream, name='risk_alert_stream'),
+    path('alerts/stats/', get_risk_alert_stats, name='risk_alert_stats'),
+    
+    # 多账户批量风险评估接口
+    path('batch-assessment/', get_batch_risk_assessment, name='batch_risk_assessment'),
 ]
 
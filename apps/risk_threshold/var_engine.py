@@ -0,0 +1,308 @@
+"""
+VaR / CVaR 计算引擎
+在一次调用中按多个置信水平、多个持有期计算风险价值（VaR）和预期损失（ES/CVaR），
+支持四种方法：
+1. historical: 历史模拟法
+2. parametric: 参数法（正态分布）
+3. cornish_fisher: Cornish-Fisher修正（考虑偏度和峰度）
+4. monte_carlo: 蒙特卡洛模拟（正态分布日收益率按持有期复利，分批向量化模拟）
+
+30天窗口只有二十几个收益率，历史模拟法的分位数噪声很大，
+参数法和Cornish-Fisher方法用样本矩估计分布，结果更稳定
+
+本模块只依赖numpy，不依赖Django
+"""
+
+import numpy as np
+
+VAR_METHODS = ('historical', 'parametric', 'cornish_fisher', 'monte_carlo')
+
+# 蒙特卡洛每批模拟的路径数（控制内存占用：每批 路径数 × 最长持有期 个float64）
+MONTE_CARLO_BATCH_SIZE = 25000
+
+# 最长持有期（交易日，约一年）
+MAX_VAR_HORIZON = 250
+
+# 蒙特卡洛模拟的总步数上限（路径数 × 最长持有期），限制单次请求的计算量
+MAX_MONTE_CARLO_STEPS = 25000000
+
+# Cornish-Fisher预期损失在尾部分位数上的积分网格点数
+_CF_TAIL_GRID_SIZE = 2000
+
+# Acklam正态分布逆函数有理逼近系数（相对误差约1e-9）
+_PPF_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+          1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_PPF_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+          6.680131188771972e+01, -1.328068155288572e+01)
+_PPF_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+          -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_PPF_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+          3.754408661907416e+00)
+_PPF_LOW = 0.02425
+
+
+def norm_ppf(p):
+    """
+    标准正态分布的分位数函数（向量化）
+
+    参数:
+        p: 概率（标量或数组，取值在(0, 1)之间）
+
+    返回:
+        np.ndarray: 对应的分位数
+    """
+    p = np.asarray(p, dtype=np.float64)
+    result = np.empty_like(p)
+    a, b, c, d = _PPF_A, _PPF_B, _PPF_C, _PPF_D
+
+    lower = p < _PPF_LOW
+    upper = p > 1 - _PPF_LOW
+    central = ~(lower | upper)
+
+    q = np.sqrt(-2 * np.log(p[lower]))
+    result[lower] = (((((c[0]*q + c[1])*q + c[2])*q + c[3])*q + c[4])*q + c[5]) / \
+                    ((((d[0]*q + d[1])*q + d[2])*q + d[3])*q + 1)
+
+    q = np.sqrt(-2 * np.log(1 - p[upper]))
+    result[upper] = -(((((c[0]*q + c[1])*q + c[2])*q + c[3])*q + c[4])*q + c[5]) / \
+                     ((((d[0]*q + d[1])*q + d[2])*q + d[3])*q + 1)
+
+    q = p[central] - 0.5
+    r = q * q
+    result[central] = (((((a[0]*r + a[1])*r + a[2])*r + a[3])*r + a[4])*r + a[5]) * q / \
+                      (((((b[0]*r + b[1])*r + b[2])*r + b[3])*r + b[4])*r + 1)
+    return result
+
+
+def norm_pdf(x):
+    """标准正态分布的概率密度函数（向量化）"""
+    x = np.asarray(x, dtype=np.float64)
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def return_moments(returns):
+    """
+    计算收益率的样本矩
+
+    返回:
+        dict: {'mean', 'std', 'skewness', 'excess_kurtosis'}（std为总体标准差）
+    """
+    mean = float(returns.mean())
+    std = float(returns.std())
+    if std > 0:
+        standardized = (returns - mean) / std
+        skewness = float(np.mean(standardized ** 3))
+        excess_kurtosis = float(np.mean(standardized ** 4)) - 3
+    else:
+        skewness = excess_kurtosis = 0.0
+    return {'mean': mean, 'std': std, 'skewness': skewness, 'excess_kurtosis': excess_kurtosis}
+
+
+def _sorted_quantile(ordered, probs):
+    """
+    在已排序数组上按线性插值计算分位数（与np.quantile默认方式一致，沿第0轴）
+    """
+    positions = np.asarray(probs) * (ordered.shape[0] - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, ordered.shape[0] - 1)
+    fraction = positions - lower
+    if ordered.ndim > 1:
+        fraction = fraction[:, None]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+def _cornish_fisher_z(z, skewness, excess_kurtosis):
+    """Cornish-Fisher修正后的分位数"""
+    return (z
+            + (z ** 2 - 1) * skewness / 6
+            + (z ** 3 - 3 * z) * excess_kurtosis / 24
+            - (2 * z ** 3 - 5 * z) * skewness ** 2 / 36)
+
+
+# ==================== 各方法（返回损失率，正数表示亏损） ====================
+
+def historical_var_es(returns, confidence_levels, horizons):
+    """
+    历史模拟法VaR/ES（多日持有期按平方根法则放大）
+
+    返回:
+        tuple: (var, es)，形状均为 (len(confidence_levels), len(horizons))
+    """
+    tail_probs = 1 - np.asarray(confidence_levels)
+    scale = np.sqrt(np.asarray(horizons, dtype=np.float64))
+
+    ordered = np.sort(returns)
+    quantiles = _sorted_quantile(ordered, tail_probs)
+    # 每个置信水平下不高于VaR分位数的收益率均值
+    tail_counts = np.maximum(np.searchsorted(ordered, quantiles, side='right'), 1)
+    tail_means = np.cumsum(ordered)[tail_counts - 1] / tail_counts
+
+    var = -quantiles[:, None] * scale[None, :]
+    es = -tail_means[:, None] * scale[None, :]
+    return var, es
+
+
+def parametric_var_es(moments, confidence_levels, horizons):
+    """
+    参数法（正态分布）VaR/ES
+
+    返回:
+        tuple: (var, es)，形状均为 (len(confidence_levels), len(horizons))
+    """
+    tail_probs = 1 - np.asarray(confidence_levels)
+    horizons = np.asarray(horizons, dtype=np.float64)
+    z = norm_ppf(tail_probs)
+
+    mean = moments['mean'] * horizons[None, :]
+    std = moments['std'] * np.sqrt(horizons)[None, :]
+    var = -(mean + z[:, None] * std)
+    es = -(mean - std * (norm_pdf(z) / tail_probs)[:, None])
+    return var, es
+
+
+def cornish_fisher_var_es(moments, confidence_levels, horizons):
+    """
+    Cornish-Fisher VaR/ES
+
+    ES通过在尾部概率网格上对修正分位数求平均得到
+
+    返回:
+        tuple: (var, es)，形状均为 (len(confidence_levels), len(horizons))
+    """
+    tail_probs = 1 - np.asarray(confidence_levels)
+    horizons = np.asarray(horizons, dtype=np.float64)
+    skewness = moments['skewness']
+    excess_kurtosis = moments['excess_kurtosis']
+
+    z_cf = _cornish_fisher_z(norm_ppf(tail_probs), skewness, excess_kurtosis)
+
+    # 尾部网格：每个置信水平在 (0, 1-c) 上取等距中点
+    grid = (np.arange(_CF_TAIL_GRID_SIZE) + 0.5) / _CF_TAIL_GRID_SIZE
+    tail_z = _cornish_fisher_z(norm_ppf(tail_probs[:, None] * grid[None, :]), skewness, excess_kurtosis)
+    tail_z_mean = tail_z.mean(axis=1)
+
+    mean = moments['mean'] * horizons[None, :]
+    std = moments['std'] * np.sqrt(horizons)[None, :]
+    var = -(mean + z_cf[:, None] * std)
+    es = -(mean + tail_z_mean[:, None] * std)
+    return var, es
+
+
+def monte_carlo_var_es(moments, confidence_levels, horizons, simulations=100000, seed=42):
+    """
+    蒙特卡洛VaR/ES
+
+    按正态分布抽取日收益率，沿持有期复利得到各持有期的累计收益，
+    所有持有期共享同一批路径；分批生成以控制内存
+
+    参数:
+        moments: return_moments 的结果
+        confidence_levels: 置信水平列表
+        horizons: 持有期列表（天）
+        simulations: 模拟路径数
+        seed: 随机种子（使用局部Generator，不影响全局随机状态）
+
+    返回:
+        tuple: (var, es)，形状均为 (len(confidence_levels), len(horizons))
+    """
+    rng = np.random.default_rng(seed)
+    tail_probs = 1 - np.asarray(confidence_levels)
+    horizons = np.asarray(horizons, dtype=np.int64)
+    max_horizon = int(horizons.max())
+    if simulations * max_horizon > MAX_MONTE_CARLO_STEPS:
+        raise ValueError(f'蒙特卡洛模拟步数超过上限 {MAX_MONTE_CARLO_STEPS}（路径数 × 最长持有期）')
+
+    cumulative = np.empty((simulations, horizons.shape[0]))
+    for start in range(0, simulations, MONTE_CARLO_BATCH_SIZE):
+        stop = min(start + MONTE_CARLO_BATCH_SIZE, simulations)
+        draws = rng.normal(moments['mean'], moments['std'], size=(stop - start, max_horizon))
+        draws += 1
+        np.cumprod(draws, axis=1, out=draws)
+        cumulative[start:stop] = draws[:, horizons - 1] - 1
+
+    # 对每个持有期只排序一次，所有置信水平共享
+    cumulative.sort(axis=0)
+    tail_counts = np.maximum((tail_probs * simulations).astype(np.int64), 1)
+    prefix = np.cumsum(cumulative, axis=0)
+
+    var = -_sorted_quantile(cumulative, tail_probs)
+    es = -prefix[tail_counts - 1] / tail_counts[:, None]
+    return var, es
+
+
+# ==================== 统一入口 ====================
+
+def compute_var_engine(returns, current_value, confidence_levels=(0.95, 0.99), horizons=(1,),
+                       methods=VAR_METHODS, simulations=100000, seed=42):
+    """
+    按多种方法、多个置信水平和持有期计算VaR和ES
+
+    参数:
+        returns: 日收益率数组
+        current_value: 当前资产价值
+        confidence_levels: 置信水平列表（如 0.95, 0.99）
+        horizons: 持有期列表（天）
+        methods: 计算方法列表，取值见 VAR_METHODS
+        simulations: 蒙特卡洛路径数
+        seed: 蒙特卡洛随机种子
+
+    返回:
+        dict: {
+            'current_value': 当前资产价值,
+            'observations': 收益率个数,
+            'moments': 收益率样本矩,
+            'results': {
+                'historical': [
+                    {
+                        'confidence_level': 95.0,
+                        'horizon': 1,
+                        'var_rate': VaR比率(%),
+                        'var_amount': VaR金额,
+                        'es_rate': 预期损失比率(%),
+                        'es_amount': 预期损失金额
+                    },
+                    ...
+                ],
+                ...
+            }
+        }
+        损失率为正表示亏损，为负表示该分位数上仍为盈利；收益率不足2个时返回None
+        持有期超出 [1, MAX_VAR_HORIZON] 或蒙特卡洛步数超过 MAX_MONTE_CARLO_STEPS 时抛出ValueError
+    """
+    if len(horizons) == 0 or min(horizons) < 1 or max(horizons) > MAX_VAR_HORIZON:
+        raise ValueError(f'持有期必须在1到{MAX_VAR_HORIZON}之间')
+
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.shape[0] < 2:
+        return None
+
+    moments = return_moments(returns)
+    calculators = {
+        'historical': lambda: historical_var_es(returns, confidence_levels, horizons),
+        'parametric': lambda: parametric_var_es(moments, confidence_levels, horizons),
+        'cornish_fisher': lambda: cornish_fisher_var_es(moments, confidence_levels, horizons),
+        'monte_carlo': lambda: monte_carlo_var_es(moments, confidence_levels, horizons, simulations, seed),
+    }
+
+    results = {}
+    for method in methods:
+        var, es = calculators[method]()
+        rows = []
+        for i, confidence_level in enumerate(confidence_levels):
+            for j, horizon in enumerate(horizons):
+                rows.append({
+                    'confidence_level': round(confidence_level * 100, 2),
+                    'horizon': int(horizon),
+                    'var_rate': round(float(var[i, j]) * 100, 2),
+                    'var_amount': round(float(var[i, j]) * current_value, 2),
+                    'es_rate': round(float(es[i, j]) * 100, 2),
+                    'es_amount': round(float(es[i, j]) * current_value, 2)
+                })
+        results[method] = rows
+
+    return {
+        'current_value': round(float(current_value), 2),
+        'observations': int(returns.shape[0]),
+        'moments': {key: round(value, 6) for key, value in moments.items()},
+        'results': results
+    }
@@ -10,9 +10,24 @@
 import logging
 import numpy as np
 from datetime import datetime, timedelta
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.conf import settings
 from rest_framework.decorators import api_view
+from .risk_kernel import (
+    build_history_arrays,
+    compute_max_principal_loss,
+    compute_volatility,
+    compute_max_drawdown,
+    compute_var,
+    compute_aligned_returns,
+    compute_drawdown_series,
+    rolling_volatility,
+    rolling_var,
+    underwater_duration
+)
+from .risk_context import get_risk_context
+from apps.utils.trading_calendar import annual_trading_days, shift_trading_days, trading_days_within
+from .reports import REPORT_WINDOWS, get_stored_report, is_report_stale, save_report
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -20,13 +35,15 @@ logger = logging.getLogger(__name__)
 
 # ==================== 辅助函数：从迅投获取历史数据 ====================
 
-def get_account_history_from_xt(account_id, days=30):
+def get_account_history_from_xt(account_id, days=30, start_date=None, end_date=None):
     """
     从迅投API获取账户历史数据
     
     参数:
         account_id: 账户ID
         days: 获取最近多少天的数据
+        start_date: 开始日期（可选，指定后忽略days）
+        end_date: 结束日期（可选）
     
     返回:
         list: 每日资产数据列表
@@ -44,9 +61,16 @@ def get_account_history_from_xt(account_id, days=30):
         # 从数据库获取账户历史数据
         from apps.utils.data_storage import get_account_history
         
-        logger.info(f'从数据库获取账户 {account_id} 最近 {days} 天的历史数据')
+        if start_date or end_date:
+            logger.info(f'从数据库获取账户 {account_id} {start_date} ~ {end_date} 的历史数据')
+        else:
+            logger.info(f'从数据库获取账户 {account_id} 最近 {days} 天的历史数据')
         
-        history = get_account_history(account_id, days=days)
+        if start_date or end_date:
+            history = get_account_history(account_id, start_date=start_date, end_date=end_date)
+        else:
+            # 按交易日读取：窗口从days个日历日内的第一个交易日开始，只保留交易日的快照
+            history = get_account_history(account_id, trading_days=trading_days_within(days))
         
         if not history:
             logger.warning(f'未找到账户 {account_id} 的历史数据')
@@ -93,7 +117,7 @@ def calculate_max_principal_loss(account_history):
     公式: (初始资金 - 当前资金) / 初始资金 × 100%
     
     参数:
-        account_history: 账户历史数据列表
+        account_history: 账户历史数据列表（或HistoryArrays）
     
     返回:
         dict: {
@@ -103,21 +127,7 @@ def calculate_max_principal_loss(account_history):
             'current_capital': 当前资金
         }
     """
-    if not account_history or len(account_history) == 0:
-        return None
-    
-    initial_capital = account_history[0]['total_assets']
-    current_capital = account_history[-1]['total_assets']
-    
-    loss_amount = initial_capital - current_capital
-    loss_rate = (loss_amount / initial_capital * 100) if initial_capital > 0 else 0
-    
-    return {
-        'max_loss_amount': round(loss_amount, 2),
-        'max_loss_rate': round(loss_rate, 2),
-        'initial_capital': round(initial_capital, 2),
-        'current_capital': round(current_capital, 2)
-    }
+    return compute_max_principal_loss(build_history_arrays(account_history))
 
 
 def calculate_volatility(account_history):
@@ -125,7 +135,7 @@ def calculate_volatility(account_history):
     计算波动率（使用日收益率的标准差）
     
     参数:
-        account_history: 账户历史数据列表
+        account_history: 账户历史数据列表（或HistoryArrays）
     
     返回:
         dict: {
@@ -134,38 +144,7 @@ def calculate_volatility(account_history):
             'volatility_level': 波动性等级
         }
     """
-    if not account_history or len(account_history) < 2:
-        return None
-    
-    # 计算日收益率
-    daily_returns = []
-    for i in range(1, len(account_history)):
-        prev_value = account_history[i-1]['total_assets']
-        curr_value = account_history[i]['total_assets']
-        if prev_value > 0:
-            daily_return = (curr_value - prev_value) / prev_value
-            daily_returns.append(daily_return)
-    
-    if len(daily_returns) == 0:
-        return None
-    
-    # 计算标准差（波动率）
-    daily_volatility = np.std(daily_returns) * 100  # 转换为百分比
-    annual_volatility = daily_volatility * np.sqrt(252)  # 年化波动率（假设252个交易日）
-    
-    # 判断波动性等级
-    if annual_volatility < 10:
-        volatility_level = '低'
-    elif annual_volatility < 20:
-        volatility_level = '中'
-    else:
-        volatility_level = '高'
-    
-    return {
-        'daily_volatility': round(daily_volatility, 2),
-        'annual_volatility': round(annual_volatility, 2),
-        'volatility_level': volatility_level
-    }
+    return compute_volatility(build_history_arrays(account_history), trading_days=annual_trading_days())
 
 
 def calculate_max_drawdown(account_history):
@@ -175,7 +154,7 @@ def calculate_max_drawdown(account_history):
     公式: (资产最高点 - 最高点之后的最低点) / 资产最高点 × 100%
     
     参数:
-        account_history: 账户历史数据列表
+        account_history: 账户历史数据列表（或HistoryArrays）
     
     返回:
         dict: {
@@ -187,47 +166,7 @@ def calculate_max_drawdown(account_history):
             'valley_date': 谷底日期
         }
     """
-    if not account_history or len(account_history) < 2:
-        return None
-    
-    max_drawdown = 0
-    max_drawdown_amount = 0
-    peak_value = account_history[0]['total_assets']
-    peak_date = account_history[0]['date']
-    valley_value = peak_value
-    valley_date = peak_date
-    current_peak = peak_value
-    current_peak_date = peak_date
-    
-    for record in account_history:
-        current_value = record['total_assets']
-        current_date = record['date']
-        
-        # 更新当前峰值
-        if current_value > current_peak:
-            current_peak = current_value
-            current_peak_date = current_date
-        
-        # 计算回撤
-        drawdown = (current_peak - current_value) / current_peak if current_peak > 0 else 0
-        
-        # 更新最大回撤
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
-            max_drawdown_amount = current_peak - current_value
-            peak_value = current_peak
-            peak_date = current_peak_date
-            valley_value = current_value
-            valley_date = current_date
-    
-    return {
-        'max_drawdown': round(max_drawdown * 100, 2),  # 转换为百分比
-        'max_drawdown_amount': round(max_drawdown_amount, 2),
-        'peak_value': round(peak_value, 2),
-        'peak_date': peak_date,
-        'valley_value': round(valley_value, 2),
-        'valley_date': valley_date
-    }
+    return compute_max_drawdown(build_history_arrays(account_history))
 
 
 def calculate_var(account_history, confidence_level=0.95):
@@ -237,7 +176,7 @@ def calculate_var(account_history, confidence_level=0.95):
     使用历史模拟法计算在指定置信水平下的最大可能损失
     
     参数:
-        account_history: 账户历史数据列表
+        account_history: 账户历史数据列表（或HistoryArrays）
         confidence_level: 置信水平，默认95%
     
     返回:
@@ -248,81 +187,31 @@ def calculate_var(account_history, confidence_level=0.95):
             'current_value': 当前资产价值
         }
     """
-    if not account_history or len(account_history) < 2:
-        return None
-    
-    # 计算日收益率
-    daily_returns = []
-    for i in range(1, len(account_history)):
-        prev_value = account_history[i-1]['total_assets']
-        curr_value = account_history[i]['total_assets']
-        if prev_value > 0:
-            daily_return = (curr_value - prev_value) / prev_value
-            daily_returns.append(daily_return)
-    
-    if len(daily_returns) == 0:
-        return None
-    
-    # 计算VaR（历史模拟法）
-    current_value = account_history[-1]['total_assets']
-    var_percentile = np.percentile(daily_returns, (1 - confidence_level) * 100)
-    var_amount = abs(current_value * var_percentile)
-    var_rate = abs(var_percentile * 100)
-    
-    return {
-        'var_amount': round(var_amount, 2),
-        'var_rate': round(var_rate, 2),
-        'confidence_level': confidence_level * 100,
-        'current_value': round(current_value, 2)
-    }
+    return compute_var(build_history_arrays(account_history), confidence_level=confidence_level)
 
 
 # ==================== 模拟数据生成函数 ====================
 
-def get_mock_account_history(days=30):
+def get_mock_account_history(days=30, seed=42):
     """
     生成模拟的账户历史数据
     
     参数:
         days: 生成多少天的数据
+        seed: 随机种子（使用局部随机数生成器，不影响全局随机状态）
     
     返回:
         list: 模拟的账户历史数据
     """
-    logger.info(f'生成 {days} 天的模拟账户历史数据')
-    
-    # 设置随机种子以获得可复现的结果
-    np.random.seed(42)
-    
-    base_value = 4100000.00  # 初始资产
-    current_date = datetime.now()
-    
-    history = []
-    current_value = base_value
+    from apps.utils.mock_data import mock_account_history
     
-    for i in range(days, 0, -1):
-        date = (current_date - timedelta(days=i)).strftime('%Y-%m-%d')
-        
-        # 添加随机波动（日收益率在-2%到+2%之间）
-        daily_return = np.random.normal(0.001, 0.015)  # 均值0.1%，标准差1.5%
-        current_value = current_value * (1 + daily_return)
-        
-        # 确保不会变成负数
-        current_value = max(current_value, base_value * 0.7)
-        
-        history.append({
-            'date': date,
-            'total_assets': round(current_value, 2),
-            'market_value': round(current_value * 0.7, 2),
-            'cash': round(current_value * 0.3, 2)
-        })
-    
-    return history
+    logger.info(f'生成 {days} 天的模拟账户历史数据')
+    return mock_account_history(days, seed=seed)
 
 
-def get_risk_level(max_loss_rate, volatility, max_drawdown, var_rate):
+def get_risk_score(max_loss_rate, volatility, max_drawdown, var_rate):
     """
-    根据各项风险指标综合判断风险等级
+    根据各项风险指标计算综合风险分数
     
     参数:
         max_loss_rate: 最大本金损失率(%)
@@ -331,9 +220,8 @@ def get_risk_level(max_loss_rate, volatility, max_drawdown, var_rate):
         var_rate: VaR比率(%)
     
     返回:
-        str: 风险等级 ('低', '中', '高')
+        int: 风险分数（0-100，四项指标各占25分）
     """
-    # 计算风险分数（0-100）
     risk_score = 0
     
     # 最大本金损失占25分
@@ -368,7 +256,16 @@ def get_risk_level(max_loss_rate, volatility, max_drawdown, var_rate):
     elif var_rate > 2:
         risk_score += 5
     
-    # 根据总分判断等级
+    return risk_score
+
+
+def get_risk_level_by_score(risk_score):
+    """
+    根据风险分数判断风险等级
+    
+    返回:
+        str: 风险等级 ('低', '中', '高')
+    """
     if risk_score >= 60:
         return '高'
     elif risk_score >= 30:
@@ -377,6 +274,95 @@ def get_risk_level(max_loss_rate, volatility, max_drawdown, var_rate):
         return '低'
 
 
+def get_risk_level(max_loss_rate, volatility, max_drawdown, var_rate):
+    """
+    根据各项风险指标综合判断风险等级
+    
+    参数:
+        max_loss_rate: 最大本金损失率(%)
+        volatility: 年化波动率(%)
+        max_drawdown: 最大回撤(%)
+        var_rate: VaR比率(%)
+    
+    返回:
+        str: 风险等级 ('低', '中', '高')
+    """
+    return get_risk_level_by_score(get_risk_score(max_loss_rate, volatility, max_drawdown, var_rate))
+
+
+def build_risk_assessment(account_id, days, indicators, is_mock):
+    """
+    根据风险指标构建综合风险评估结果（各指标状态、综合评分和建议）
+    
+    参数:
+        account_id: 账户ID
+        days: 时间窗口（天）
+        indicators: compute_risk_indicators 的结果
+        is_mock: 是否为模拟数据
+    
+    返回:
+        dict: 综合风险评估接口的返回数据
+    """
+    max_loss = indicators['max_principal_loss']
+    volatility = indicators['volatility']
+    max_dd = indicators['max_drawdown']
+    var = indicators['var']
+    
+    # 判断各指标状态
+    max_loss_status = '正常' if abs(max_loss['max_loss_rate']) < 10 else '警告' if abs(max_loss['max_loss_rate']) < 20 else '危险'
+    volatility_status = '正常' if volatility['annual_volatility'] < 20 else '警告' if volatility['annual_volatility'] < 30 else '危险'
+    max_dd_status = '正常' if max_dd['max_drawdown'] < 15 else '警告' if max_dd['max_drawdown'] < 25 else '危险'
+    var_status = '正常' if var['var_rate'] < 3 else '警告' if var['var_rate'] < 5 else '危险'
+    
+    # 综合风险评估
+    risk_score = get_risk_score(
+        abs(max_loss['max_loss_rate']),
+        volatility['annual_volatility'],
+        max_dd['max_drawdown'],
+        var['var_rate']
+    )
+    risk_level = get_risk_level_by_score(risk_score)
+    
+    # 生成建议
+    if risk_level == '低':
+        recommendation = '当前风险较低，可以适当增加投资'
+    elif risk_level == '中':
+        recommendation = '当前风险处于中等水平，建议关注市场波动'
+    else:
+        recommendation = '当前风险较高，建议降低仓位或采取对冲措施'
+    
+    # 构建返回数据
+    response_data = {
+        'account_id': account_id,
+        'assessment_date': datetime.now().strftime('%Y-%m-%d'),
+        'period_days': days,
+        'max_principal_loss': {
+            **max_loss,
+            'status': max_loss_status
+        },
+        'volatility': {
+            **volatility,
+            'status': volatility_status
+        },
+        'max_drawdown': {
+            **max_dd,
+            'status': max_dd_status
+        },
+        'var': {
+            **var,
+            'status': var_status
+        },
+        'overall_risk': {
+            'risk_level': risk_level,
+            'risk_score': risk_score,
+            'recommendation': recommendation
+        },
+        'is_mock': is_mock
+    }
+    
+    return response_data
+
+
 # ==================== API视图函数 ====================
 
 @api_view(['GET'])
@@ -386,7 +372,13 @@ def get_risk_assessment(request):
     返回所有风险指标和综合评级
     
     API路径: /api/risk-threshold/assessment/
-    参数: account_id (必填), days (可选，默认30天), mock (可选，默认true)
+    参数: account_id (必填), days (可选，默认30天), mock (可选，默认true),
+          refresh (可选，默认false；为true时忽略预先计算的报告重新计算)
+    
+    真实数据的标准窗口（30/90/180/365天）默认返回夜间任务（compute_risk_reports）
+    保存的报告，报告不存在或已过期时重新计算并写回；
+    report_source 为 stored（预先计算）或 computed（本次计算），
+    computed 时 report_reason 说明原因：refresh / stale / missing / mock / window（非标准窗口）
     
     返回数据示例:
     {
@@ -427,7 +419,10 @@ def get_risk_assessment(request):
             "risk_score": 35,
             "recommendation": "当前风险处于中等水平，建议关注市场波动"
         },
-        "is_mock": true
+        "is_mock": true,
+        "report_source": "computed",
+        "report_reason": "mock",
+        "generated_at": "2025-01-15 16:05:12"
     }
     """
     logger.info('收到风险评估请求')
@@ -436,6 +431,7 @@ def get_risk_assessment(request):
     account_id = request.GET.get('account_id')
     days = int(request.GET.get('days', 30))
     use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    refresh = request.GET.get('refresh', 'false').lower() == 'true'
     
     if not account_id:
         logger.error('缺少account_id参数')
@@ -447,74 +443,39 @@ def get_risk_assessment(request):
             }
         }, status=400)
     
-    # 获取历史数据
-    if not use_mock:
-        account_history = get_account_history_from_xt(account_id, days)
-    else:
-        account_history = None
-    
-    # 如果没有真实数据，使用模拟数据
-    if account_history is None:
-        logger.info('使用模拟数据')
-        account_history = get_mock_account_history(days)
-        is_mock = True
-    else:
-        is_mock = False
-    
-    # 计算各项风险指标
-    max_loss = calculate_max_principal_loss(account_history)
-    volatility = calculate_volatility(account_history)
-    max_dd = calculate_max_drawdown(account_history)
-    var = calculate_var(account_history, confidence_level=0.95)
-    
-    # 判断各指标状态
-    max_loss_status = '正常' if abs(max_loss['max_loss_rate']) < 10 else '警告' if abs(max_loss['max_loss_rate']) < 20 else '危险'
-    volatility_status = '正常' if volatility['annual_volatility'] < 20 else '警告' if volatility['annual_volatility'] < 30 else '危险'
-    max_dd_status = '正常' if max_dd['max_drawdown'] < 15 else '警告' if max_dd['max_drawdown'] < 25 else '危险'
-    var_status = '正常' if var['var_rate'] < 3 else '警告' if var['var_rate'] < 5 else '危险'
-    
-    # 综合风险评估
-    risk_level = get_risk_level(
-        abs(max_loss['max_loss_rate']),
-        volatility['annual_volatility'],
-        max_dd['max_drawdown'],
-        var['var_rate']
-    )
-    
-    # 生成建议
-    if risk_level == '低':
-        recommendation = '当前风险较低，可以适当增加投资'
-    elif risk_level == '中':
-        recommendation = '当前风险处于中等水平，建议关注市场波动'
-    else:
-        recommendation = '当前风险较高，建议降低仓位或采取对冲措施'
+    # 默认返回夜间任务预先计算的报告（模拟数据和非标准窗口除外）
+    report_reason = 'refresh' if refresh else 'mock' if use_mock else 'window'
+    if not use_mock and not refresh and days in REPORT_WINDOWS:
+        from apps.utils.data_storage import get_latest_snapshot_version
+        
+        report = get_stored_report(account_id, days)
+        if report is not None and not is_report_stale(report, get_latest_snapshot_version(account_id)):
+            logger.info(f'返回预先计算的风险报告: {report["generated_at"]}')
+            return JsonResponse({
+                **report['report'],
+                'report_source': 'stored',
+                'generated_at': report['generated_at'].strftime('%Y-%m-%d %H:%M:%S')
+            })
+        report_reason = 'missing' if report is None else 'stale'
+    
+    # 获取风险上下文（五个风险接口共享同一份历史数据和计算结果）
+    context = get_risk_context(account_id, days, use_mock)
+    
+    # 计算各项风险指标（历史数据只转换一次，收益率只计算一次）
+    indicators = context.indicators(confidence_level=0.95)
+    response_data = build_risk_assessment(account_id, days, indicators, context.is_mock)
+    risk_level = response_data['overall_risk']['risk_level']
+    
+    # 真实数据的标准窗口结果写回报告集合，供后续请求复用
+    generated_at = datetime.now()
+    if not context.is_mock and days in REPORT_WINDOWS:
+        save_report(account_id, days, response_data, context.version, generated_at)
     
-    # 构建返回数据
     response_data = {
-        'account_id': account_id,
-        'assessment_date': datetime.now().strftime('%Y-%m-%d'),
-        'period_days': days,
-        'max_principal_loss': {
-            **max_loss,
-            'status': max_loss_status
-        },
-        'volatility': {
-            **volatility,
-            'status': volatility_status
-        },
-        'max_drawdown': {
-            **max_dd,
-            'status': max_dd_status
-        },
-        'var': {
-            **var,
-            'status': var_status
-        },
-        'overall_risk': {
-            'risk_level': risk_level,
-            'recommendation': recommendation
-        },
-        'is_mock': is_mock
+        **response_data,
+        'report_source': 'computed',
+        'report_reason': report_reason,
+        'generated_at': generated_at.strftime('%Y-%m-%d %H:%M:%S')
     }
     
     logger.info(f'风险评估完成: {risk_level}')
@@ -534,13 +495,10 @@ def get_max_principal_loss(request):
     if not account_id:
         return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
     
-    account_history = get_mock_account_history(days) if use_mock else get_account_history_from_xt(account_id, days)
-    
-    if account_history is None:
-        account_history = get_mock_account_history(days)
+    context = get_risk_context(account_id, days, use_mock)
     
-    result = calculate_max_principal_loss(account_history)
-    result['is_mock'] = use_mock
+    # 缓存中的结果是共享的，返回副本
+    result = {**context.max_principal_loss(), 'is_mock': context.is_mock}
     
     return JsonResponse(result)
 
@@ -558,13 +516,10 @@ def get_volatility(request):
     if not account_id:
         return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
     
-    account_history = get_mock_account_history(days) if use_mock else get_account_history_from_xt(account_id, days)
+    context = get_risk_context(account_id, days, use_mock)
     
-    if account_history is None:
-        account_history = get_mock_account_history(days)
-    
-    result = calculate_volatility(account_history)
-    result['is_mock'] = use_mock
+    # 缓存中的结果是共享的，返回副本
+    result = {**context.volatility(), 'is_mock': context.is_mock}
     
     return JsonResponse(result)
 
@@ -582,13 +537,10 @@ def get_max_drawdown(request):
     if not account_id:
         return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
     
-    account_history = get_mock_account_history(days) if use_mock else get_account_history_from_xt(account_id, days)
-    
-    if account_history is None:
-        account_history = get_mock_account_history(days)
+    context = get_risk_context(account_id, days, use_mock)
     
-    result = calculate_max_drawdown(account_history)
-    result['is_mock'] = use_mock
+    # 缓存中的结果是共享的，返回副本
+    result = {**context.max_drawdown(), 'is_mock': context.is_mock}
     
     return JsonResponse(result)
 
@@ -607,13 +559,681 @@ def get_var_value(request):
     if not account_id:
         return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
     
-    account_history = get_mock_account_history(days) if use_mock else get_account_history_from_xt(account_id, days)
+    context = get_risk_context(account_id, days, use_mock)
+    
+    # 缓存中的结果是共享的，返回副本
+    result = {**context.var(confidence_level=confidence), 'is_mock': context.is_mock}
     
-    if account_history is None:
-        account_history = get_mock_account_history(days)
+    return JsonResponse(result)
+
+
+
+@api_view(['GET'])
+def get_rolling_risk(request):
+    """
+    滚动风险时间序列接口
+    返回区间内每一天的滚动波动率、滚动VaR、回撤和水下持续时间，用于绘制风险走势图
+    
+    API路径: /api/risk-threshold/rolling/
+    参数:
+        account_id (必填)
+        start_date (可选，YYYY-MM-DD，默认为end_date前days天)
+        end_date (可选，YYYY-MM-DD，默认今天)
+        days (可选，未指定start_date时使用，默认365天)
+        window (可选，滚动窗口观测数，默认20)
+        confidence (可选，VaR置信水平，默认0.95)
+        mock (可选，默认true)
+    
+    返回数据示例:
+    {
+        "account_id": "DEMO000001",
+        "window": 20,
+        "confidence_level": 95.0,
+        "series": [
+            {
+                "date": "2025-01-15",
+                "total_assets": 4100000.00,
+                "rolling_volatility": 18.52,
+                "rolling_var": 2.31,
+                "drawdown": 1.25,
+                "underwater_days": 3
+            },
+            ...
+        ],
+        "is_mock": true
+    }
+    
+    窗口不满时 rolling_volatility / rolling_var 为 null；
+    drawdown 和 underwater_days 以区间起点为基准累计
+    """
+    account_id = request.GET.get('account_id')
+    days = int(request.GET.get('days', 365))
+    window = int(request.GET.get('window', 20))
+    confidence = float(request.GET.get('confidence', 0.95))
+    use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    
+    if not account_id:
+        return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
     
-    result = calculate_var(account_history, confidence_level=confidence)
-    result['is_mock'] = use_mock
+    if window < 2:
+        return JsonResponse({'success': False, 'error': 'window参数必须大于等于2'}, status=400)
+    
+    try:
+        end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date() if request.GET.get('end_date') else datetime.now().date()
+        start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date() if request.GET.get('start_date') else end_date - timedelta(days=days)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '日期格式错误，应为YYYY-MM-DD'}, status=400)
+    
+    if start_date >= datetime.now().date() or start_date > end_date:
+        return JsonResponse({'success': False, 'error': 'start_date必须早于今天且不晚于end_date'}, status=400)
+    
+    # 向前多取window个交易日作为滚动窗口的预热期（按交易日历定位，不多取）
+    warmup_start = shift_trading_days(start_date, -window).astype(object)
+    
+    account_history = None
+    if not use_mock:
+        account_history = get_account_history_from_xt(account_id, start_date=warmup_start, end_date=end_date)
+    
+    is_mock = account_history is None
+    if is_mock:
+        account_history = get_mock_account_history((datetime.now().date() - warmup_start).days)
+    
+    arrays = build_history_arrays(account_history)
+    if arrays is None:
+        return JsonResponse({'success': False, 'error': '区间内没有历史数据'}, status=400)
+    values = arrays.values
+    
+    # 滚动指标在包含预热期的完整序列上计算
+    returns = compute_aligned_returns(values)
+    _, annual_volatility = rolling_volatility(returns, window, trading_days=annual_trading_days(end_date))
+    var_rates = rolling_var(returns, window, confidence_level=confidence)
+    
+    # 只输出请求区间内的数据，回撤从区间起点开始累计
+    dates = arrays.dates
+    in_range = (dates >= np.datetime64(start_date)) & (dates <= np.datetime64(end_date))
+    range_values = values[in_range]
+    if range_values.shape[0] > 0:
+        _, _, drawdown = compute_drawdown_series(range_values)
+        underwater = underwater_duration(range_values)
+    else:
+        drawdown = underwater = range_values
+    
+    def to_list(array):
+        rounded = np.round(array, 2)
+        return [None if value != value else value for value in rounded.tolist()]
+    
+    series = [
+        {
+            'date': date,
+            'total_assets': total_assets,
+            'rolling_volatility': rolling_vol,
+            'rolling_var': rolling_var_rate,
+            'drawdown': dd,
+            'underwater_days': days_underwater
+        }
+        for date, total_assets, rolling_vol, rolling_var_rate, dd, days_underwater in zip(
+            dates[in_range].astype(str).tolist(),
+            np.round(range_values, 2).tolist(),
+            to_list(annual_volatility[in_range]),
+            to_list(var_rates[in_range]),
+            to_list(drawdown * 100),
+            underwater.tolist()
+        )
+    ]
+    
+    logger.info(f'滚动风险序列计算完成: 账户 {account_id}，{len(series)} 个日期，窗口 {window}')
+    return JsonResponse({
+        'account_id': account_id,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'window': window,
+        'confidence_level': confidence * 100,
+        'series': series,
+        'is_mock': is_mock
+    })
+
+
+@api_view(['GET'])
+def get_batch_risk_assessment(request):
+    """
+    批量风险评估接口
+    一次评估多个账户（或全部账户），按综合风险分数降序排名
+    
+    API路径: /api/risk-threshold/batch-assessment/
+    参数:
+        account_ids (可选，逗号分隔；不传时评估全部账户)
+        days (可选，默认30天)
+        confidence (可选，VaR置信水平，默认0.95)
+        stream (可选，默认false；为true时以NDJSON逐行输出，适合账户数很多的情况)
+    
+    返回数据示例:
+    {
+        "assessment_date": "2025-01-15",
+        "period_days": 30,
+        "count": 2,
+        "accounts": [
+            {
+                "rank": 1,
+                "account_id": "DEMO000002",
+                "risk_score": 45,
+                "risk_level": "中",
+                "max_loss_rate": 6.20,
+                "annual_volatility": 24.10,
+                "max_drawdown": 12.30,
+                "var_rate": 2.80,
+                "current_value": 3850000.00
+            },
+            ...
+        ],
+        "skipped": []
+    }
+    """
+    from .batch import assess_accounts, iter_ndjson
+    
+    account_ids = [a.strip() for a in request.GET.get('account_ids', '').split(',') if a.strip()]
+    days = int(request.GET.get('days', 30))
+    confidence = float(request.GET.get('confidence', 0.95))
+    stream = request.GET.get('stream', 'false').lower() == 'true'
+    
+    logger.info(f'收到批量风险评估请求: {len(account_ids) or "全部"} 个账户，{days} 天')
+    result = assess_accounts(account_ids, days=days, confidence_level=confidence)
+    
+    if stream:
+        return StreamingHttpResponse(iter_ndjson(result), content_type='application/x-ndjson; charset=utf-8')
     
     return JsonResponse(result)
 
+
+@api_view(['GET'])
+def get_var_engine(request):
+    """
+    多方法VaR/CVaR接口
+    一次返回历史模拟、参数法、Cornish-Fisher、蒙特卡洛四种方法
+    在多个置信水平和持有期下的VaR和预期损失（ES）
+    
+    API路径: /api/risk-threshold/var-engine/
+    参数:
+        account_id (必填)
+        days (可选，默认30天)
+        confidence (可选，逗号分隔，默认 0.95,0.99)
+        horizons (可选，持有期天数，逗号分隔，默认 1,5,10)
+        methods (可选，逗号分隔，默认全部：historical,parametric,cornish_fisher,monte_carlo)
+        simulations (可选，蒙特卡洛路径数，默认100000)
+        seed (可选，蒙特卡洛随机种子，默认42)
+        mock (可选，默认true)
+    
+    返回数据示例:
+    {
+        "account_id": "DEMO000001",
+        "period_days": 30,
+        "current_value": 4100000.00,
+        "observations": 29,
+        "moments": {"mean": 0.0012, "std": 0.0151, "skewness": -0.21, "excess_kurtosis": 0.85},
+        "results": {
+            "historical": [
+                {"confidence_level": 95.0, "horizon": 1, "var_rate": 2.31, "var_amount": 94710.00,
+                 "es_rate": 2.95, "es_amount": 120950.00},
+                ...
+            ],
+            "parametric": [...],
+            "cornish_fisher": [...],
+            "monte_carlo": [...]
+        },
+        "is_mock": true
+    }
+    """
+    from .var_engine import MAX_MONTE_CARLO_STEPS, MAX_VAR_HORIZON, VAR_METHODS, compute_var_engine
+    
+    account_id = request.GET.get('account_id')
+    days = int(request.GET.get('days', 30))
+    use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    
+    if not account_id:
+        return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
+    
+    try:
+        confidence_levels = [float(c) for c in request.GET.get('confidence', '0.95,0.99').split(',') if c.strip()]
+        horizons = [int(h) for h in request.GET.get('horizons', '1,5,10').split(',') if h.strip()]
+        methods = [m.strip() for m in request.GET.get('methods', ','.join(VAR_METHODS)).split(',') if m.strip()]
+        simulations = int(request.GET.get('simulations', 100000))
+        seed = int(request.GET.get('seed', 42))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '参数格式错误'}, status=400)
+    
+    unknown_methods = [m for m in methods if m not in VAR_METHODS]
+    if unknown_methods:
+        return JsonResponse({'success': False, 'error': f'不支持的计算方法: {", ".join(unknown_methods)}'}, status=400)
+    if not confidence_levels or not all(0 < c < 1 for c in confidence_levels):
+        return JsonResponse({'success': False, 'error': 'confidence参数必须在0和1之间'}, status=400)
+    if not horizons or min(horizons) < 1 or max(horizons) > MAX_VAR_HORIZON:
+        return JsonResponse({'success': False, 'error': f'horizons必须在1到{MAX_VAR_HORIZON}之间'}, status=400)
+    if not 1 <= simulations <= 1000000:
+        return JsonResponse({'success': False, 'error': 'simulations参数超出范围'}, status=400)
+    if 'monte_carlo' in methods and simulations * max(horizons) > MAX_MONTE_CARLO_STEPS:
+        return JsonResponse({
+            'success': False,
+            'error': f'simulations × 最长持有期不能超过{MAX_MONTE_CARLO_STEPS}'
+        }, status=400)
+    
+    context = get_risk_context(account_id, days, use_mock)
+    arrays = context.arrays
+    if arrays is None or arrays.returns.shape[0] < 2:
+        return JsonResponse({'success': False, 'error': '历史数据不足，无法计算VaR'}, status=400)
+    
+    result = compute_var_engine(
+        arrays.returns,
+        float(arrays.values[-1]),
+        confidence_levels=confidence_levels,
+        horizons=horizons,
+        methods=methods,
+        simulations=simulations,
+        seed=seed
+    )
+    
+    return JsonResponse({
+        'account_id': account_id,
+        'period_days': days,
+        **result,
+        'is_mock': context.is_mock
+    })
+
+
+@api_view(['GET'])
+def get_risk_decomposition(request):
+    """
+    持仓风险分解接口
+    基于当前持仓的日收盘价历史，返回每只股票的边际VaR、成分VaR和波动率贡献
+    
+    API路径: /api/risk-threshold/decomposition/
+    参数:
+        account_id (必填)
+        days (可选，价格历史的交易日数，默认60)
+        confidence (可选，VaR置信水平，默认0.95)
+        refresh (可选，默认false；为true时重新加载价格数据)
+        mock (可选，默认true)
+    
+    返回数据示例:
+    {
+        "account_id": "DEMO000001",
+        "portfolio": {
+            "total_value": 2850000.00,
+            "var_amount": 52300.00,
+            "var_rate": 1.84,
+            "annual_volatility": 17.80,
+            "diversification_ratio": 1.32,
+            "confidence_level": 95.0,
+            "observations": 60
+        },
+        "positions": [
+            {
+                "stock_code": "600519.SH",
+                "stock_name": "贵州茅台",
+                "market_value": 840250.00,
+                "weight": 29.48,
+                "annual_volatility": 24.10,
+                "marginal_var": 2.1034,
+                "component_var": 17673.50,
+                "component_var_pct": 33.79,
+                "volatility_contribution": 6.02
+            },
+            ...
+        ],
+        "missing_codes": [],
+        "is_mock": true
+    }
+    """
+    from .positions import load_positions
+    from .decomposition import get_returns_matrix, decompose_risk
+    
+    account_id = request.GET.get('account_id')
+    days = int(request.GET.get('days', 60))
+    confidence = float(request.GET.get('confidence', 0.95))
+    refresh = request.GET.get('refresh', 'false').lower() == 'true'
+    use_mock = request.GET.get('mock', 'true').lower() == 'true'
+    
+    if not account_id:
+        return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
+    
+    try:
+        positions, is_mock = load_positions(account_id, use_mock)
+        
+        market_values = {}
+        stock_names = {}
+        for pos in positions:
+            market_values[pos['stock_code']] = market_values.get(pos['stock_code'], 0.0) + pos['market_value']
+            stock_names[pos['stock_code']] = pos.get('stock_name', pos['stock_code'])
+        
+        matrix = get_returns_matrix(list(market_values), days=days, use_mock=is_mock, refresh=refresh)
+        if not matrix.codes or matrix.returns.shape[0] < 2:
+            return JsonResponse({'success': False, 'error': '持仓价格数据不足，无法进行风险分解'}, status=400)
+        
+        result = decompose_risk(matrix, [market_values[code] for code in matrix.codes], confidence_level=confidence, trading_days=annual_trading_days())
+        for item in result['positions']:
+            item['stock_name'] = stock_names.get(item['stock_code'], item['stock_code'])
+        
+        return JsonResponse({
+            'account_id': account_id,
+            **result,
+            'missing_codes': matrix.missing_codes,
+            'is_mock': is_mock
+        })
+    
+    except Exception as e:
+        logger.error(f'持仓风险分解失败: {str(e)}', exc_info=True)
+        return JsonResponse({'success': False, 'error': f'持仓风险分解失败: {str(e)}'}, status=500)
+
+
+@api_view(['GET'])
+def get_online_risk(request):
+    """
+    在线风险状态接口
+    直接从快照写入时增量维护的风险状态返回指标，不读取历史快照
+    
+    API路径: /api/risk-threshold/online/
+    参数:
+        account_id (必填)
+        window (可选，inception 表示成立以来，或 30/90/180/365 天标准窗口，默认inception)
+        confidence (可选，VaR置信水平，默认0.95)
+    
+    返回数据示例:
+    {
+        "account_id": "1000000365",
+        "window": "inception",
+        "since": "2024-03-01",
+        "as_of": "2025-01-15",
+        "max_principal_loss": {...},
+        "volatility": {...},
+        "max_drawdown": {...},
+        "var": {...},
+        "overall_risk": {"risk_level": "中", "risk_score": 35}
+    }
+    
+    成立以来的VaR由收益率直方图草图估计（精度为0.05%）
+    """
+    from .online_risk import STANDARD_WINDOWS, get_risk_state
+    
+    account_id = request.GET.get('account_id')
+    window = request.GET.get('window', 'inception')
+    confidence = float(request.GET.get('confidence', 0.95))
+    
+    if not account_id:
+        return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
+    if window != 'inception' and (not window.isdigit() or int(window) not in STANDARD_WINDOWS):
+        return JsonResponse({
+            'success': False,
+            'error': f'window参数必须为inception或{"/".join(map(str, STANDARD_WINDOWS))}'
+        }, status=400)
+    if not 0 < confidence < 1:
+        return JsonResponse({'success': False, 'error': 'confidence参数必须在0和1之间'}, status=400)
+    
+    try:
+        state = get_risk_state(account_id)
+        if state is None:
+            return JsonResponse({'success': False, 'error': f'账户 {account_id} 没有风险状态'}, status=404)
+        
+        if window == 'inception':
+            indicators = state.inception_indicators(confidence_level=confidence)
+            since = state.first_date
+        else:
+            indicators = state.window_indicators(int(window), confidence_level=confidence)
+            since = state.window_start(int(window))
+        
+        response_data = {
+            'account_id': account_id,
+            'window': window,
+            'since': since,
+            'as_of': state.current_date,
+            **indicators
+        }
+        
+        max_loss = indicators['max_principal_loss']
+        volatility = indicators['volatility']
+        max_dd = indicators['max_drawdown']
+        var = indicators['var']
+        if max_loss and volatility and max_dd and var:
+            risk_score = get_risk_score(
+                abs(max_loss['max_loss_rate']),
+                volatility['annual_volatility'],
+                max_dd['max_drawdown'],
+                var['var_rate']
+            )
+            response_data['overall_risk'] = {
+                'risk_level': get_risk_level_by_score(risk_score),
+                'risk_score': risk_score
+            }
+        
+        return JsonResponse(response_data)
+    
+    except Exception as e:
+        logger.error(f'读取在线风险状态失败: {str(e)}', exc_info=True)
+        return JsonResponse({'success': False, 'error': f'读取在线风险状态失败: {str(e)}'}, status=500)
+
+
+@api_view(['GET'])
+def get_risk_alerts(request):
+    """
+    风险告警轮询接口
+    返回实时告警引擎队列中的告警（按ID升序）
+    
+    API路径: /api/risk-threshold/alerts/
+    参数:
+        since (可选，只返回ID大于该值的告警，默认0)
+        account_id (可选，只返回该账户的告警)
+        limit (可选，最多返回条数，默认100)
+    
+    返回数据示例:
+    {
+        "alerts": [
+            {
+                "id": 12,
+                "account_id": "1000000365",
+                "indicator": "max_drawdown",
+                "level": "危险",
+                "value": 25.31,
+                "threshold": 25,
+                "total_asset": 3062500.00,
+                "message": "账户 1000000365 回撤 25.31% 达到危险阈值 25%",
+                "timestamp": "2025-01-15 10:32:05"
+            }
+        ],
+        "last_id": 12
+    }
+    """
+    from .alerts import alert_engine
+    
+    try:
+        since_id = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', 100))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '参数格式错误'}, status=400)
+    
+    alerts = alert_engine.get_alerts(since_id, request.GET.get('account_id'), limit)
+    return JsonResponse({
+        'alerts': alerts,
+        'last_id': alerts[-1]['id'] if alerts else since_id
+    })
+
+
+def get_risk_alert_stream(request):
+    """
+    风险告警SSE推送接口
+    
+    API路径: /api/risk-threshold/alerts/stream/
+    参数:
+        since (可选，从该ID之后开始推送，默认0；断线重连时也可使用Last-Event-ID请求头)
+        account_id (可选，只推送该账户的告警)
+        timeout (可选，连接保持的秒数，默认300)
+    
+    每条告警为一个 event: alert 事件，无告警时每15秒发送一次注释行保持连接
+    """
+    import json
+    import time
+    from .alerts import alert_engine
+    
+    try:
+        since_id = int(request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('since', 0))
+        timeout = min(int(request.GET.get('timeout', 300)), 3600)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '参数格式错误'}, status=400)
+    account_id = request.GET.get('account_id')
+    
+    def event_stream():
+        last_id = since_id
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if alert_engine.wait_for_alerts(last_id, timeout=min(15, max(deadline - time.monotonic(), 0))):
+                alerts = alert_engine.get_alerts(last_id)
+                for alert in alerts:
+                    last_id = alert['id']
+                    if account_id is None or alert['account_id'] == account_id:
+                        yield f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(alert, ensure_ascii=False)}\n\n"
+            else:
+                yield ': keep-alive\n\n'
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+def get_risk_alert_stats(request):
+    """
+    风险告警引擎统计接口
+    返回已处理事件数、告警数、去重/限流抑制数和每个事件的评估延迟
+    
+    API路径: /api/risk-threshold/alerts/stats/
+    
+    返回数据示例:
+    {
+        "events": 182340,
+        "alerts": 7,
+        "deduplicated": 1542,
+        "rate_limited": 0,
+        "accounts": 3,
+        "queued": 7,
+        "latency_us": {"mean": 6.2, "max": 310.5, "p50": 4.8, "p99": 21.7}
+    }
+    """
+    from .alerts import alert_engine
+    
+    return JsonResponse(alert_engine.stats())
+
+
+@api_view(['GET', 'POST'])
+def get_stress_test(request):
+    """
+    组合压力测试接口
+    对当前全部持仓施加情景冲击，返回每个情景的盈亏和冲击后的风险等级
+    
+    API路径: /api/risk-threshold/stress-test/
+    GET参数: account_id (必填), days (可选，当前风险指标的时间窗口，默认30), mock (可选，默认true)
+             使用内置的默认情景
+    POST请求体（JSON）:
+    {
+        "account_id": "DEMO000001",
+        "days": 30,
+        "mock": true,
+        "scenarios": [
+            {
+                "name": "沪市下跌8%且银行下跌5%",
+                "shocks": [
+                    {"type": "region", "target": "上海", "change": -0.08},
+                    {"type": "sector", "target": "银行", "change": -0.05}
+                ]
+            }
+        ]
+    }
+    冲击类型 type: stock（股票代码）/ region（地区）/ sector（迅投板块名称）/ market（全部持仓）
+    
+    返回数据示例:
+    {
+        "account_id": "DEMO000001",
+        "total_asset": 4100000.00,
+        "positions_value": 2850000.00,
+        "scenarios": [
+            {
+                "name": "沪市下跌8%且银行下跌5%",
+                "pnl": -214500.00,
+                "pnl_rate": -5.23,
+                "stressed_asset": 3885500.00,
+                "stressed_drawdown": 6.12,
+                "loss_status": "正常",
+                "affected_positions": 4,
+                "worst_positions": [{"stock_code": "600519.SH", "stock_name": "贵州茅台", "pnl": -67220.00}],
+                "risk_score": 35,
+                "risk_level": "中"
+            }
+        ],
+        "unresolved_sectors": [],
+        "nav_source": "history",
+        "is_mock": true
+    }
+    
+    总资产、历史峰值和当前风险指标与持仓来自同一数据源（nav_source）：
+    - history: 账户历史快照（持仓为模拟数据时为模拟历史）
+    - account: 持仓为真实数据但没有历史快照时，交易接口查询的当前总资产（不计算冲击后的风险分数）
+    - positions: 交易接口也没有返回资产时，只按持仓市值计算
+    """
+    from .positions import load_positions, load_total_asset
+    from .stress import DEFAULT_SCENARIOS, ScenarioError, validate_scenarios, run_stress_test
+    
+    if request.method == 'POST':
+        params = request.data
+        scenarios = params.get('scenarios', DEFAULT_SCENARIOS)
+        use_mock = str(params.get('mock', 'true')).lower() == 'true'
+    else:
+        params = request.GET
+        scenarios = DEFAULT_SCENARIOS
+        use_mock = params.get('mock', 'true').lower() == 'true'
+    
+    account_id = params.get('account_id')
+    if not account_id:
+        return JsonResponse({'success': False, 'error': '缺少account_id参数'}, status=400)
+    
+    try:
+        days = int(params.get('days', 30))
+        validate_scenarios(scenarios)
+    except (ValueError, ScenarioError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    try:
+        positions, is_mock = load_positions(account_id, use_mock)
+        if not positions:
+            return JsonResponse({'success': False, 'error': '账户没有持仓，无法进行压力测试'}, status=400)
+        
+        # 当前总资产、历史峰值和风险指标取自共享的风险上下文
+        context = get_risk_context(account_id, days, is_mock)
+        arrays = context.arrays
+        if context.is_mock == is_mock and arrays is not None:
+            nav_source = 'history'
+            total_asset = float(arrays.values[-1])
+            peak_value = float(arrays.values.max())
+            indicators = context.indicators(confidence_level=0.95)
+        else:
+            # 真实持仓不能与模拟历史的资产混用
+            total_asset = load_total_asset(account_id)
+            nav_source = 'account' if total_asset is not None else 'positions'
+            if total_asset is None:
+                total_asset = sum(pos['market_value'] for pos in positions)
+            peak_value = None
+            indicators = None
+        
+        result = run_stress_test(
+            positions,
+            scenarios,
+            total_asset,
+            peak_value=peak_value,
+            indicators=indicators
+        )
+        
+        return JsonResponse({
+            'account_id': account_id,
+            **result,
+            'nav_source': nav_source,
+            'is_mock': is_mock
+        })
+    
+    except Exception as e:
+        logger.error(f'压力测试失败: {str(e)}', exc_info=True)
+        return JsonResponse({'success': False, 'error': f'压力测试失败: {str(e)}'}, status=500)
@@ -0,0 +1,60 @@
+"""
+分组汇总工具
+资产分类、地区分布、地区对比、资产对比等接口都是"按某个键对持仓市值分组求和、算占比、排序"，
+本模块用一次向量化分组（np.unique + np.bincount）完成，新增一种分组方式只需要提供键：
+
+    groups = aggregate(codes, market_values, key_func=get_stock_regions, total=total_assets)
+    for group in groups:
+        group['key'], group['sum'], group['weight'], group['count']
+
+键可以是预先算好的一列（与values等长），也可以传入 key_func 从一列原始值（如股票代码）批量算出。
+"""
+
+import numpy as np
+
+
+def aggregate(keys, values, key_func=None, total=None, order='sum'):
+    """
+    按键分组求和
+
+    参数:
+        keys: 分组键列（与values等长）；指定key_func时为key_func的输入（如股票代码列表）
+        values: 数值列（如持仓市值）
+        key_func: 批量计算分组键的函数（列表 → 等长列表），如 get_stock_regions
+        total: 计算占比的分母，默认为全部values之和
+        order: 'sum' 按合计降序，'first' 按键第一次出现的顺序，'key' 按键排序
+
+    返回:
+        list: [{'key', 'sum', 'weight', 'count'}, ...]，weight为占total的百分比（未四舍五入）
+    """
+    if key_func is not None:
+        keys = key_func(list(keys))
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[0] == 0:
+        return []
+
+    labels, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=labels.shape[0])
+    counts = np.bincount(inverse, minlength=labels.shape[0])
+
+    total = float(values.sum()) if total is None else float(total)
+    weights = sums / total * 100 if total > 0 else np.zeros_like(sums)
+
+    if order == 'sum':
+        # 合计相同时按出现顺序
+        positions = np.lexsort((first_index, -sums))
+    elif order == 'first':
+        positions = np.argsort(first_index)
+    else:
+        positions = np.arange(labels.shape[0])
+
+    labels = labels.tolist()
+    sums = sums.tolist()
+    weights = weights.tolist()
+    counts = counts.tolist()
+    return [
+        {'key': labels[i], 'sum': sums[i], 'weight': weights[i], 'count': counts[i]}
+        for i in positions.tolist()
+    ]
+
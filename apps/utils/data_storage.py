@@ -7,10 +7,99 @@ import logging
 from datetime import datetime, timedelta
 from django.conf import settings
 from apps.utils.db import get_mongodb_db
+from apps.utils.snapshot_dates import date_condition, date_sort, snapshot_date, snapshot_days, to_date_key
 
 logger = logging.getLogger(__name__)
 
 
+# 历史数据查询只需要的字段（不读取positions等大字段）
+HISTORY_PROJECTION = {
+    '_id': 0,
+    'account_id': 1,
+    'date': 1,
+    'date_key': 1,
+    'total_asset': 1,
+    'market_value': 1,
+    'cash': 1
+}
+
+
+_indexes_ensured = False
+
+
+def ensure_snapshot_indexes(db=None):
+    """
+    创建快照集合的索引（每个进程只执行一次）：
+    - (account_id, timestamp)：get_latest_snapshot_version 判断缓存是否失效时按账户取最新快照
+    - (account_id, date_key)：按账户和日期范围查询历史
+    """
+    global _indexes_ensured
+
+    if _indexes_ensured:
+        return
+    db = db or get_mongodb_db()
+    db.account_snapshots.create_index([('account_id', 1), ('timestamp', 1)])
+    db.account_snapshots.create_index([('account_id', 1), ('date_key', 1)])
+    _indexes_ensured = True
+
+
+def _build_date_query(days=30, start_date=None, end_date=None):
+    """
+    构建快照日期范围查询条件
+
+    参数:
+        days: 最近多少天（start_date和end_date都未指定时使用）
+        start_date: 开始日期（YYYY-MM-DD格式或datetime对象）
+        end_date: 结束日期（YYYY-MM-DD格式或datetime对象）
+
+    返回:
+        dict: 可以合并到查询中的日期条件（迁移完成后为 date_key 整数范围，见 snapshot_dates）
+    """
+    if start_date or end_date:
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    else:
+        # 如果没有指定日期范围，获取最近days天的数据
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days)
+    return date_condition(start_date, end_date)
+
+
+def _trading_window(trading_days, end_date=None):
+    """截止end_date（默认今天）的最近trading_days个交易日的第一天和最后一天（YYYY-MM-DD）"""
+    from apps.utils.trading_calendar import last_trading_days
+
+    window = last_trading_days(trading_days, end_date)
+    return str(window[0]), str(window[-1])
+
+
+def _trading_day_records(history):
+    """
+    每个交易日一条观测：去掉周末、节假日保存的快照（与前一个交易日重复），
+    同一天有多条快照时保留最后一条（history按日期、写入时间升序）
+    """
+    from apps.utils.trading_calendar import trading_day_mask
+
+    if not history:
+        return history
+    # 按日期覆盖，保留每天最后一条快照
+    by_date = {record['date']: record for record in history}
+    mask = trading_day_mask(list(by_date))
+    return [record for record, keep in zip(by_date.values(), mask.tolist()) if keep]
+
+
+def _to_history_record(snapshot):
+    """将快照文档转换为历史数据记录"""
+    return {
+        'date': snapshot_date(snapshot),
+        'total_assets': float(snapshot.get('total_asset', 0)),
+        'market_value': float(snapshot.get('market_value', 0)),
+        'cash': float(snapshot.get('cash', 0))
+    }
+
+
 def save_account_snapshot(account_id, account_data):
     """
     保存账户快照到MongoDB
@@ -31,9 +120,11 @@ def save_account_snapshot(account_id, account_data):
         # 获取数据库对象
         db = get_mongodb_db()
         
+        today = datetime.now().date()
         snapshot = {
             'account_id': str(account_id),
-            'date': datetime.now().date().isoformat(),  # YYYY-MM-DD格式
+            'date': today.isoformat(),  # YYYY-MM-DD格式（兼容旧数据的读取方，查询使用date_key）
+            'date_key': to_date_key(today),  # yyyymmdd整数
             'timestamp': datetime.now(),
             'total_asset': float(account_data.get('total_asset', 0)),
             'market_value': float(account_data.get('market_value', 0)),
@@ -45,6 +136,14 @@ def save_account_snapshot(account_id, account_data):
         # 保存到account_snapshots集合
         result = db.account_snapshots.insert_one(snapshot)
         logger.info(f'账户 {account_id} 快照保存成功，ID: {result.inserted_id}')
+
+        # 增量更新在线风险状态（失败不影响快照保存结果）
+        try:
+            from apps.risk_threshold.online_risk import update_risk_state
+            update_risk_state(account_id, today.isoformat(), snapshot['total_asset'])
+        except Exception as e:
+            logger.warning(f'更新账户 {account_id} 在线风险状态失败: {str(e)}')
+
         return True
         
     except Exception as e:
@@ -52,7 +151,7 @@ def save_account_snapshot(account_id, account_data):
         return False
 
 
-def get_account_history(account_id, days=30, start_date=None, end_date=None):
+def get_account_history(account_id, days=30, start_date=None, end_date=None, trading_days=None):
     """
     从MongoDB获取账户历史数据
     
@@ -61,6 +160,8 @@ def get_account_history(account_id, days=30, start_date=None, end_date=None):
         days: 获取最近多少天的数据（如果start_date和end_date未指定）
         start_date: 开始日期（YYYY-MM-DD格式或datetime对象）
         end_date: 结束日期（YYYY-MM-DD格式或datetime对象）
+        trading_days: 获取截止end_date（默认今天）的最近多少个交易日（指定后忽略days和start_date），
+            每个交易日只返回最后一条快照，观测数不超过trading_days
     
     返回:
         list: 账户历史数据列表，按日期升序排序
@@ -75,44 +176,25 @@ def get_account_history(account_id, days=30, start_date=None, end_date=None):
         ]
     """
     try:
-        # 构建查询条件
-        query = {'account_id': str(account_id)}
+        if trading_days:
+            # 按交易日历直接定位窗口的第一个交易日，不需要按日历日多取再截取
+            start_date, end_date = _trading_window(trading_days, end_date)
         
-        # 处理日期范围
-        if start_date or end_date:
-            date_query = {}
-            if start_date:
-                if isinstance(start_date, str):
-                    start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                date_query['$gte'] = start_date.isoformat()
-            if end_date:
-                if isinstance(end_date, str):
-                    end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                date_query['$lte'] = end_date.isoformat()
-            if date_query:
-                query['date'] = date_query
-        else:
-            # 如果没有指定日期范围，获取最近days天的数据
-            end_date = datetime.now().date()
-            start_date = end_date - timedelta(days=days)
-            query['date'] = {
-                '$gte': start_date.isoformat(),
-                '$lte': end_date.isoformat()
-            }
+        # 构建查询条件
+        query = {
+            'account_id': str(account_id),
+            **_build_date_query(days, start_date, end_date)
+        }
         
-        # 获取数据库对象并查询数据
+        # 获取数据库对象并查询数据（只取需要的字段，不读取持仓列表）
         db = get_mongodb_db()
-        snapshots = db.account_snapshots.find(query).sort('date', 1)  # 按日期升序排序
+        snapshots = db.account_snapshots.find(query, projection=HISTORY_PROJECTION).sort(date_sort(('timestamp', 1)))  # 按日期、写入时间升序排序
         
         # 转换为前端需要的格式
-        history = []
-        for snapshot in snapshots:
-            history.append({
-                'date': snapshot['date'],
-                'total_assets': float(snapshot.get('total_asset', 0)),
-                'market_value': float(snapshot.get('market_value', 0)),
-                'cash': float(snapshot.get('cash', 0))
-            })
+        history = [_to_history_record(snapshot) for snapshot in snapshots]
+        
+        if trading_days:
+            history = _trading_day_records(history)
         
         logger.info(f'从数据库获取账户 {account_id} 历史数据，共 {len(history)} 条记录')
         return history
@@ -122,6 +204,155 @@ def get_account_history(account_id, days=30, start_date=None, end_date=None):
         return []
 
 
+def get_all_account_ids():
+    """
+    获取所有有快照记录的账户ID
+
+    返回:
+        list: 账户ID列表（已排序）
+    """
+    try:
+        db = get_mongodb_db()
+        return sorted(db.account_snapshots.distinct('account_id'))
+
+    except Exception as e:
+        logger.error(f'获取账户列表失败: {str(e)}', exc_info=True)
+        return []
+
+
+def get_accounts_history_bulk(account_ids, days=30, start_date=None, end_date=None, trading_days=None):
+    """
+    批量获取多个账户的历史数据（一次$in查询）
+
+    参数:
+        account_ids: 账户ID列表
+        days: 获取最近多少天的数据（如果start_date和end_date未指定）
+        start_date: 开始日期（YYYY-MM-DD格式或datetime对象）
+        end_date: 结束日期（YYYY-MM-DD格式或datetime对象）
+        trading_days: 最近多少个交易日，含义与 get_account_history 相同
+
+    返回:
+        dict: {account_id: 历史数据列表}，格式与get_account_history相同，
+              没有数据的账户不出现在结果中
+    """
+    try:
+        if trading_days:
+            start_date, end_date = _trading_window(trading_days, end_date)
+        
+        query = {
+            'account_id': {'$in': [str(account_id) for account_id in account_ids]},
+            **_build_date_query(days, start_date, end_date)
+        }
+
+        db = get_mongodb_db()
+        snapshots = db.account_snapshots.find(query, projection=HISTORY_PROJECTION).sort([('account_id', 1), *date_sort(('timestamp', 1))])
+
+        histories = {}
+        for snapshot in snapshots:
+            histories.setdefault(snapshot['account_id'], []).append(_to_history_record(snapshot))
+        if trading_days:
+            histories = {account_id: _trading_day_records(history) for account_id, history in histories.items()}
+            histories = {account_id: history for account_id, history in histories.items() if history}
+
+        logger.info(f'批量获取 {len(account_ids)} 个账户的历史数据，{len(histories)} 个账户有数据')
+        return histories
+
+    except Exception as e:
+        logger.error(f'批量获取账户历史数据失败: {str(e)}', exc_info=True)
+        return {}
+
+
+def get_position_history(account_id, days=30, start_date=None, end_date=None):
+    """
+    获取账户每日持仓历史（用于按持仓计算分组收益）
+
+    参数:
+        account_id: 账户ID
+        days: 获取最近多少天的数据（如果start_date和end_date未指定）
+        start_date: 开始日期（YYYY-MM-DD格式或datetime对象）
+        end_date: 结束日期（YYYY-MM-DD格式或datetime对象）
+
+    返回:
+        list: 按日期升序排序，同一天有多条快照时取最后一条
+        [
+            {
+                'date': '2025-01-01',
+                'positions': [{'stock_code': '600000.SH', 'volume': 1000, 'market_value': 10000.0}, ...]
+            },
+            ...
+        ]
+    """
+    try:
+        query = {
+            'account_id': str(account_id),
+            **_build_date_query(days, start_date, end_date)
+        }
+        projection = {
+            '_id': 0,
+            'date': 1,
+            'date_key': 1,
+            'positions.stock_code': 1,
+            'positions.volume': 1,
+            'positions.market_value': 1
+        }
+
+        db = get_mongodb_db()
+        snapshots = db.account_snapshots.find(query, projection=projection).sort(date_sort(('timestamp', 1)))
+
+        # 按日期覆盖，保留每天最后一条快照
+        by_date = {snapshot_date(snapshot): snapshot.get('positions', []) for snapshot in snapshots}
+        return [{'date': date, 'positions': positions} for date, positions in by_date.items()]
+
+    except Exception as e:
+        logger.error(f'获取账户持仓历史失败: {str(e)}', exc_info=True)
+        return []
+
+
+def get_held_stock_codes(days=30):
+    """
+    获取最近days天内快照中出现过的全部持仓代码（所有账户）
+
+    返回:
+        list: 股票代码列表（已排序）
+    """
+    try:
+        db = get_mongodb_db()
+        codes = db.account_snapshots.distinct('positions.stock_code', _build_date_query(days))
+        return sorted(code for code in codes if code)
+
+    except Exception as e:
+        logger.error(f'获取持仓代码失败: {str(e)}', exc_info=True)
+        return []
+
+
+def get_latest_snapshot_version(account_id):
+    """
+    获取账户最新快照的版本标识
+
+    版本标识为最新一条快照的_id，只查询一个字段，
+    用于判断基于历史数据的缓存是否需要失效
+
+    参数:
+        account_id: 账户ID
+
+    返回:
+        str: 版本标识，账户没有快照或查询失败时返回None
+    """
+    try:
+        db = get_mongodb_db()
+        ensure_snapshot_indexes(db)
+        snapshot = db.account_snapshots.find_one(
+            {'account_id': str(account_id)},
+            projection={'_id': 1},
+            sort=[('timestamp', -1)]
+        )
+        return str(snapshot['_id']) if snapshot else None
+
+    except Exception as e:
+        logger.error(f'获取账户快照版本失败: {str(e)}', exc_info=True)
+        return None
+
+
 def get_account_snapshot_by_date(account_id, target_date):
     """
     获取指定日期的账户快照
@@ -141,12 +372,12 @@ def get_account_snapshot_by_date(account_id, target_date):
         db = get_mongodb_db()
         snapshot = db.account_snapshots.find_one({
             'account_id': str(account_id),
-            'date': target_date.isoformat()
+            **date_condition(target_date, target_date)
         })
         
         if snapshot:
             return {
-                'date': snapshot['date'],
+                'date': snapshot_date(snapshot),
                 'total_asset': float(snapshot.get('total_asset', 0)),
                 'market_value': float(snapshot.get('market_value', 0)),
                 'cash': float(snapshot.get('cash', 0)),
@@ -160,6 +391,70 @@ def get_account_snapshot_by_date(account_id, target_date):
         return None
 
 
+def get_period_data(account_id, granularity, start_date=None, end_date=None, days=None):
+    """
+    按时间粒度分组的账户历史统计
+    
+    参数:
+        account_id: 账户ID
+        granularity: 'day' / 'week' / 'month' / 'quarter' / 'year'
+        start_date: 开始日期（YYYY-MM-DD格式或datetime对象）
+        end_date: 结束日期（YYYY-MM-DD格式或datetime对象）
+        days: 最近多少天（start_date和end_date都未指定时使用，也未指定时不限日期）
+    
+    返回:
+        list: 按时间升序的周期统计，格式见 apps.utils.periods.bucket_history
+        返回与日期范围有交集的完整周期（周期统计覆盖整个周期，不按日期范围截断），
+        已结束的周期读取 period_summaries 存储；存储不可用时从快照计算，结果相同
+    """
+    from apps.utils.periods import bucket_history, period_range
+    from apps.utils.period_store import STORED_GRANULARITIES, get_period_summaries
+    
+    if not (start_date or end_date) and days:
+        start_date = datetime.now().date() - timedelta(days=days)
+    
+    if granularity in STORED_GRANULARITIES:
+        try:
+            return get_period_summaries(account_id, granularity, start_date=start_date, end_date=end_date)
+        except Exception as e:
+            logger.warning(f'读取周期统计存储失败，从快照重新计算: {str(e)}')
+    
+    try:
+        query = {'account_id': str(account_id)}
+        if start_date or end_date:
+            # 范围扩展到首尾周期的边界，与存储路径返回的完整周期一致
+            query.update(date_condition(*period_range(start_date or None, end_date or None, granularity)))
+        
+        # 只读取需要的字段，10年的日快照也只有几千条；date_key直接换算为datetime64，不解析字符串
+        db = get_mongodb_db()
+        snapshots = list(db.account_snapshots.find(query, projection=HISTORY_PROJECTION).sort(date_sort()))
+        if not snapshots:
+            return []
+        
+        return bucket_history(
+            snapshot_days(snapshots),
+            [float(snapshot.get('total_asset', 0)) for snapshot in snapshots],
+            [float(snapshot.get('market_value', 0)) for snapshot in snapshots],
+            granularity
+        )
+        
+    except Exception as e:
+        logger.error(f'获取时间段数据失败: {str(e)}', exc_info=True)
+        return []
+
+
+def _period_dict(periods):
+    """周期统计列表转换为 {周期: {'totalAssets', 'returnRate', 'investmentRate'}}"""
+    return {
+        period['timePeriod']: {
+            'totalAssets': period['totalAssets'],
+            'returnRate': period['returnRate'],
+            'investmentRate': period['investmentRate']
+        }
+        for period in periods
+    }
+
+
 def get_yearly_data(account_id, start_year=None, end_year=None):
     """
     获取年度汇总数据
@@ -180,65 +475,12 @@ def get_yearly_data(account_id, start_year=None, end_year=None):
             ...
         }
     """
-    try:
-        # 构建查询条件
-        query = {'account_id': str(account_id)}
-        
-        if start_year or end_year:
-            date_query = {}
-            if start_year:
-                date_query['$gte'] = f'{start_year}-01-01'
-            if end_year:
-                date_query['$lte'] = f'{end_year}-12-31'
-            if date_query:
-                query['date'] = date_query
-        
-        # 获取数据库对象并查询所有数据
-        db = get_mongodb_db()
-        snapshots = db.account_snapshots.find(query).sort('date', 1)
-        
-        # 按年份分组
-        yearly_data = {}
-        for snapshot in snapshots:
-            year = snapshot['date'][:4]  # 提取年份
-            if year not in yearly_data:
-                yearly_data[year] = {
-                    'totalAssets': [],
-                    'marketValues': []  # 直接存储market_value，避免重复查询
-                }
-            
-            yearly_data[year]['totalAssets'].append(float(snapshot.get('total_asset', 0)))
-            yearly_data[year]['marketValues'].append(float(snapshot.get('market_value', 0)))
-        
-        # 计算年度统计数据
-        result = {}
-        for year, data in yearly_data.items():
-            if not data['totalAssets']:
-                continue
-            
-            # 年度平均资产（或年末资产）
-            avg_assets = sum(data['totalAssets']) / len(data['totalAssets'])
-            end_assets = data['totalAssets'][-1] if data['totalAssets'] else 0
-            start_assets = data['totalAssets'][0] if data['totalAssets'] else 0
-            
-            # 计算回报率（年度收益率）
-            return_rate = ((end_assets - start_assets) / start_assets * 100) if start_assets > 0 else 0
-            
-            # 计算投资占比（持仓市值占比）
-            avg_market_value = sum(data['marketValues']) / len(data['marketValues']) if data['marketValues'] else 0
-            investment_rate = (avg_market_value / avg_assets * 100) if avg_assets > 0 else 0
-            
-            result[year] = {
-                'totalAssets': round(end_assets, 2),
-                'returnRate': round(return_rate, 2),
-                'investmentRate': round(investment_rate, 2)
-            }
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f'获取年度数据失败: {str(e)}', exc_info=True)
-        return {}
+    return _period_dict(get_period_data(
+        account_id,
+        'year',
+        start_date=f'{start_year}-01-01' if start_year else None,
+        end_date=f'{end_year}-12-31' if end_year else None
+    ))
 
 
 def get_weekly_data(account_id, weeks=4):
@@ -247,7 +489,7 @@ def get_weekly_data(account_id, weeks=4):
     
     参数:
         account_id: 账户ID
-        weeks: 获取最近多少周的数据
+        weeks: 获取最近多少个交易周的数据
     
     返回:
         dict: 周度数据字典
@@ -260,60 +502,10 @@ def get_weekly_data(account_id, weeks=4):
             ...
         }
     """
-    try:
-        # 计算日期范围
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(weeks=weeks)
-        
-        # 获取历史数据
-        history = get_account_history(account_id, start_date=start_date, end_date=end_date)
-        
-        if not history:
-            return {}
-        
-        # 按周分组
-        weekly_data = {}
-        for record in history:
-            date_obj = datetime.strptime(record['date'], '%Y-%m-%d').date()
-            year, week, _ = date_obj.isocalendar()
-            week_key = f'{year}-W{week:02d}'
-            
-            if week_key not in weekly_data:
-                weekly_data[week_key] = {
-                    'totalAssets': [],
-                    'marketValues': []
-                }
-            
-            weekly_data[week_key]['totalAssets'].append(record['total_assets'])
-            weekly_data[week_key]['marketValues'].append(record['market_value'])
-        
-        # 计算周度统计数据
-        result = {}
-        for week_key, data in weekly_data.items():
-            if not data['totalAssets']:
-                continue
-            
-            # 周平均资产（或周末资产）
-            end_assets = data['totalAssets'][-1] if data['totalAssets'] else 0
-            start_assets = data['totalAssets'][0] if data['totalAssets'] else 0
-            
-            # 计算回报率（周收益率）
-            return_rate = ((end_assets - start_assets) / start_assets * 100) if start_assets > 0 else 0
-            
-            # 计算投资占比
-            avg_market_value = sum(data['marketValues']) / len(data['marketValues']) if data['marketValues'] else 0
-            avg_assets = sum(data['totalAssets']) / len(data['totalAssets'])
-            investment_rate = (avg_market_value / avg_assets * 100) if avg_assets > 0 else 0
-            
-            result[week_key] = {
-                'totalAssets': round(end_assets, 2),
-                'returnRate': round(return_rate, 2),
-                'investmentRate': round(investment_rate, 2)
-            }
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f'获取周度数据失败: {str(e)}', exc_info=True)
-        return {}
+    from apps.utils.trading_calendar import trading_week_start
+    
+    # 从最近weeks个有交易日的周开始（整周休市的周如国庆不计入）
+    end_date = datetime.now().date()
+    start_date = trading_week_start(weeks, end_date)
+    return _period_dict(get_period_data(account_id, 'week', start_date=start_date, end_date=end_date))
 
@@ -0,0 +1,302 @@
+"""
+合约基础信息缓存
+缓存股票的名称、交易所、合约类型、板块和上市日期，避免每次请求都调用 xtdata.get_instrument_detail：
+- 启动时从本地JSON文件加载（start_instrument_cache）
+- 后台线程每个交易日刷新一次
+- get_instruments / get_instrument_names 一次调用批量查询多个代码，只读缓存；
+  未命中的代码排队交给后台线程，由后台线程成批读取迅投并写回文件，请求中不访问迅投、不写文件；
+  迅投也取不到的代码（退市代码等）当天不再重复读取
+
+缓存文件格式:
+    {
+        "refreshed_date": "2025-01-15",
+        "instruments": {
+            "600519.SH": {"name": "贵州茅台", "exchange": "SH", "type": "stock", "board": "主板", "list_date": "20010827"},
+            ...
+        }
+    }
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 缓存文件路径
+INSTRUMENT_CACHE_PATH = getattr(
+    settings, 'INSTRUMENT_CACHE_PATH',
+    os.path.join(settings.BASE_DIR, 'data', 'cache', 'instrument_cache.json')
+)
+
+# 每个交易日在该时间（小时）之后刷新（开盘前合约信息已更新）
+INSTRUMENT_REFRESH_HOUR = getattr(settings, 'INSTRUMENT_REFRESH_HOUR', 9)
+
+# 后台线程检查是否需要刷新的间隔（秒），有排队的未命中代码时立即唤醒
+_REFRESH_CHECK_SECONDS = 600
+
+# 后台线程每次读取的排队代码数上限
+_PENDING_BATCH_SIZE = 200
+
+# 迅投 get_instrument_type 返回的类型标志，按优先级取第一个为True的
+_INSTRUMENT_TYPES = ('stock', 'etf', 'fund', 'index', 'bond')
+
+_records = {}
+_lock = threading.Lock()
+_file_lock = threading.Lock()
+_refreshed_date = None
+_started = False
+# 请求中未命中、等待后台线程读取的代码
+_pending = set()
+_wakeup = threading.Event()
+# 迅投也取不到的代码 -> 读取日期（当天不再排队）
+_unresolved = {}
+
+
+def classify_board(stock_code):
+    """
+    根据代码判断所属板块
+
+    返回:
+        str: 主板 / 创业板 / 科创板 / 北交所
+    """
+    code, _, exchange = stock_code.upper().partition('.')
+    if exchange == 'BJ':
+        return '北交所'
+    if code.startswith('688') or code.startswith('689'):
+        return '科创板'
+    if code.startswith('300') or code.startswith('301'):
+        return '创业板'
+    return '主板'
+
+
+def _detail_field(detail, name):
+    """合约信息在不同版本的xtquant中可能是字典或对象"""
+    if isinstance(detail, dict):
+        return detail.get(name)
+    return getattr(detail, name, None)
+
+
+def _to_record(stock_code, detail, type_flags):
+    instrument_type = next((t for t in _INSTRUMENT_TYPES if type_flags and type_flags.get(t)), 'other')
+    open_date = _detail_field(detail, 'OpenDate')
+    return {
+        'name': _detail_field(detail, 'InstrumentName') or stock_code,
+        'exchange': _detail_field(detail, 'ExchangeID') or stock_code.rpartition('.')[2].upper(),
+        'type': instrument_type,
+        'board': classify_board(stock_code),
+        'list_date': str(open_date) if open_date else None
+    }
+
+
+def fetch_instruments(stock_codes):
+    """
+    从迅投读取合约信息（不经过缓存）
+
+    返回:
+        dict: {stock_code: record}，读取失败的代码不出现在结果中
+    """
+    from xtquant import xtdata
+
+    records = {}
+    for stock_code in stock_codes:
+        try:
+            detail = xtdata.get_instrument_detail(stock_code)
+            if not detail:
+                continue
+            records[stock_code] = _to_record(stock_code, detail, xtdata.get_instrument_type(stock_code))
+        except Exception as e:
+            logger.warning(f'获取合约 {stock_code} 信息失败: {str(e)}')
+    return records
+
+
+def load_instrument_cache(path=None):
+    """从本地文件加载缓存，返回加载的合约数"""
+    global _refreshed_date
+
+    path = path or INSTRUMENT_CACHE_PATH
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f'读取合约信息缓存文件失败: {str(e)}')
+        return 0
+
+    with _lock:
+        _records.update(data.get('instruments', {}))
+        _refreshed_date = data.get('refreshed_date')
+    logger.info(f'已从 {path} 加载 {len(data.get("instruments", {}))} 条合约信息')
+    return len(data.get('instruments', {}))
+
+
+def save_instrument_cache(path=None):
+    """将缓存写入本地文件（先写临时文件再替换，避免写到一半的文件）"""
+    path = path or INSTRUMENT_CACHE_PATH
+    with _lock:
+        data = {'refreshed_date': _refreshed_date, 'instruments': dict(_records)}
+
+    with _file_lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+
+def get_instruments(stock_codes):
+    """
+    批量查询合约信息
+
+    参数:
+        stock_codes: 股票代码列表
+
+    返回:
+        dict: {stock_code: record}，缓存中没有的代码值为None（已排队由后台线程读取）
+    """
+    today = datetime.now().date().isoformat()
+    with _lock:
+        result = {code: _records.get(code) for code in stock_codes}
+        missing = [
+            code for code, record in result.items()
+            if record is None and _unresolved.get(code) != today and code not in _pending
+        ]
+        _pending.update(missing)
+    if missing:
+        _wakeup.set()
+    return result
+
+
+def get_instrument_names(stock_codes):
+    """
+    批量查询股票名称
+
+    返回:
+        dict: {stock_code: 名称}，查不到时为股票代码本身
+    """
+    return {
+        code: record['name'] if record else code
+        for code, record in get_instruments(stock_codes).items()
+    }
+
+
+def cached_codes():
+    """已缓存的全部代码"""
+    with _lock:
+        return set(_records)
+
+
+def update_instruments(records, refreshed_date=None):
+    """
+    批量写入合约信息（刷新任务和预热任务使用），不写文件
+
+    参数:
+        records: {stock_code: record}
+        refreshed_date: 刷新日期（指定时同时更新刷新日期）
+    """
+    global _refreshed_date
+
+    with _lock:
+        _records.update(records)
+        if refreshed_date:
+            _refreshed_date = refreshed_date
+
+
+def refresh_instrument_cache(stock_codes=None):
+    """
+    重新读取合约信息并写回文件
+
+    参数:
+        stock_codes: 需要刷新的代码，默认为缓存中的全部代码
+
+    返回:
+        int: 刷新成功的合约数
+    """
+    if stock_codes is None:
+        with _lock:
+            stock_codes = list(_records)
+
+    records = fetch_instruments(stock_codes)
+    if stock_codes and not records:
+        # 数据中心未就绪等情况下全部失败，不记录刷新日期，下次检查时重试
+        logger.warning('合约信息刷新失败，稍后重试')
+        return 0
+
+    update_instruments(records, refreshed_date=datetime.now().date().isoformat())
+    save_instrument_cache()
+    logger.info(f'合约信息缓存已刷新: {len(records)}/{len(stock_codes)}')
+    return len(records)
+
+
+def _needs_refresh(now):
+    """交易日（按交易日历）开盘前后，且当天还没有刷新过"""
+    from apps.utils.trading_calendar import is_trading_day
+
+    return (
+        now.hour >= INSTRUMENT_REFRESH_HOUR
+        and is_trading_day(now.date())
+        and _refreshed_date != now.date().isoformat()
+    )
+
+
+def fetch_pending():
+    """
+    成批读取请求中未命中的代码并写回文件（后台线程调用）
+
+    返回:
+        int: 读取成功的合约数
+    """
+    with _lock:
+        batch = sorted(_pending)[:_PENDING_BATCH_SIZE]
+        _pending.difference_update(batch)
+    if not batch:
+        return 0
+
+    records = fetch_instruments(batch)
+    today = datetime.now().date().isoformat()
+    with _lock:
+        for code in batch:
+            if code not in records:
+                _unresolved[code] = today
+    if records:
+        update_instruments(records)
+        save_instrument_cache()
+    logger.info(f'已补充 {len(records)}/{len(batch)} 条未命中的合约信息')
+    return len(records)
+
+
+def _has_pending():
+    with _lock:
+        return bool(_pending)
+
+
+def _refresh_loop():
+    while True:
+        try:
+            if _needs_refresh(datetime.now()):
+                refresh_instrument_cache()
+            while _has_pending():
+                fetch_pending()
+        except Exception as e:
+            logger.error(f'刷新合约信息缓存失败: {str(e)}', exc_info=True)
+        _wakeup.wait(_REFRESH_CHECK_SECONDS)
+        _wakeup.clear()
+
+
+def start_instrument_cache():
+    """启动缓存：加载本地文件并启动后台刷新线程（只执行一次）"""
+    global _started
+
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    load_instrument_cache()
+    threading.Thread(target=_refresh_loop, name='instrument-cache-refresh', daemon=True).start()
@@ -0,0 +1,320 @@
+"""
+本地日K线存储
+区域收益、风险分解、基准对比等分析需要持仓股票的日线历史。每次请求都调用
+xtdata.get_market_data 既慢又依赖终端，本模块把日线保存在本地，请求只读本地文件：
+
+    data/kline/1d/<股票代码>/date.i8     交易日（datetime64[D] 的天数，升序）
+    data/kline/1d/<股票代码>/<字段>.f8   各字段一个连续的 float64 数组，与日期逐行对应
+
+- 读取时以 np.memmap 映射文件，多只股票的窗口读取按日期对齐成 日期 × 股票 的矩阵
+- 同步时先用 xtdata.download_history_data2 批量下载，再只追加本地最后一个交易日之后的数据
+- 追加顺序为先字段后日期，日期文件长度即有效行数，写到一半中断也不会读到不完整的行
+
+存储不复权价格和昨收价（preClose），复权收盘价由 close / preClose 推出的除权因子计算，
+已写入的历史在分红除权后也不需要改写。
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 存储根目录
+KLINE_STORE_DIR = getattr(
+    settings, 'KLINE_STORE_DIR',
+    os.path.join(settings.BASE_DIR, 'data', 'kline', '1d')
+)
+
+# 保存的字段
+KLINE_FIELDS = ('open', 'high', 'low', 'close', 'preClose', 'volume', 'amount')
+
+# 每个交易日在该时间（小时）之后同步当天日线
+KLINE_SYNC_HOUR = getattr(settings, 'KLINE_SYNC_HOUR', 16)
+
+# 后台线程检查是否需要同步的间隔（秒）
+_SYNC_CHECK_SECONDS = 600
+
+# 每次批量同步的股票数
+_SYNC_CHUNK_SIZE = 200
+
+_DATE_FILE = 'date.i8'
+
+# 必须保存在本地的代码（如基准指数），后台线程发现缺失时立即同步
+_required_codes = set()
+
+_code_locks = {}
+_locks_lock = threading.Lock()
+_last_sync_date = None
+_started = False
+
+
+def _code_dir(stock_code):
+    return os.path.join(KLINE_STORE_DIR, stock_code)
+
+
+def _code_lock(stock_code):
+    with _locks_lock:
+        lock = _code_locks.get(stock_code)
+        if lock is None:
+            lock = _code_locks[stock_code] = threading.Lock()
+        return lock
+
+
+def _map(path, dtype, length):
+    """只读映射文件前length个元素（文件不存在或为空时返回空数组）"""
+    if length == 0 or not os.path.exists(path):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+def stored_length(stock_code):
+    """本地已保存的交易日数"""
+    path = os.path.join(_code_dir(stock_code), _DATE_FILE)
+    return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+
+def read_dates(stock_code):
+    """本地已保存的交易日（datetime64[D]，只读映射）"""
+    length = stored_length(stock_code)
+    dates = _map(os.path.join(_code_dir(stock_code), _DATE_FILE), np.int64, length)
+    return dates.view('datetime64[D]')
+
+
+def read_field(stock_code, field):
+    """本地已保存的某个字段（只读映射，与 read_dates 逐行对应）"""
+    length = stored_length(stock_code)
+    return _map(os.path.join(_code_dir(stock_code), f'{field}.f8'), np.float64, length)
+
+
+def last_date(stock_code):
+    """本地最后一个交易日，没有数据时为None"""
+    dates = read_dates(stock_code)
+    return dates[-1] if dates.shape[0] else None
+
+
+def append_rows(stock_code, dates, columns):
+    """
+    追加日线（只写入晚于本地最后一个交易日的行）
+
+    参数:
+        stock_code: 股票代码
+        dates: datetime64[D] 数组（升序）
+        columns: {字段: 与dates等长的数组}
+
+    返回:
+        int: 实际追加的行数
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    directory = _code_dir(stock_code)
+
+    with _code_lock(stock_code):
+        os.makedirs(directory, exist_ok=True)
+        length = stored_length(stock_code)
+        last = last_date(stock_code)
+        keep = dates > last if last is not None else np.ones(dates.shape[0], dtype=bool)
+        if not keep.any():
+            return 0
+
+        for field in KLINE_FIELDS:
+            path = os.path.join(directory, f'{field}.f8')
+            values = np.asarray(columns.get(field, np.full(dates.shape[0], np.nan)), dtype=np.float64)[keep]
+            with open(path, 'ab') as f:
+                # 上次追加中断时字段文件可能比日期文件长，先截断到有效行数
+                if os.path.getsize(path) != length * 8:
+                    f.truncate(length * 8)
+                f.write(values.tobytes())
+
+        with open(os.path.join(directory, _DATE_FILE), 'ab') as f:
+            f.write(dates[keep].astype(np.int64).tobytes())
+
+        return int(keep.sum())
+
+
+def _parse_dates(labels):
+    return np.array([f'{d[:4]}-{d[4:6]}-{d[6:8]}' for d in map(str, labels)], dtype='datetime64[D]')
+
+
+def sync_klines(stock_codes, start_time=''):
+    """
+    从迅投批量下载并追加日线
+
+    参数:
+        stock_codes: 股票代码列表
+        start_time: 本地没有数据的股票从该日期开始下载（YYYYMMDD，默认全部历史）
+
+    返回:
+        dict: {stock_code: 追加的行数}
+    """
+    from xtquant import xtdata
+
+    appended = {}
+    stock_codes = list(dict.fromkeys(stock_codes))
+    for start in range(0, len(stock_codes), _SYNC_CHUNK_SIZE):
+        chunk = stock_codes[start:start + _SYNC_CHUNK_SIZE]
+
+        # 只需要下载本地最后一个交易日之后的数据
+        lasts = [last_date(code) for code in chunk]
+        known = [d for d in lasts if d is not None]
+        if len(known) == len(chunk):
+            chunk_start = str(min(known) + 1).replace('-', '')
+        else:
+            chunk_start = start_time
+
+        xtdata.download_history_data2(chunk, period='1d', start_time=chunk_start, end_time='')
+        data = xtdata.get_market_data(
+            field_list=list(KLINE_FIELDS),
+            stock_list=chunk,
+            period='1d',
+            start_time=chunk_start,
+            end_time='',
+            dividend_type='none',
+            fill_data=False
+        )
+
+        for code in chunk:
+            close = data['close']
+            if code not in close.index:
+                appended[code] = 0
+                continue
+            dates = _parse_dates(close.columns)
+            columns = {field: data[field].loc[code].values for field in KLINE_FIELDS}
+            # 停牌等没有成交的日期不保存
+            valid = ~np.isnan(np.asarray(columns['close'], dtype=np.float64))
+            appended[code] = append_rows(code, dates[valid], {f: np.asarray(v)[valid] for f, v in columns.items()})
+
+    logger.info(f'日线同步完成: {len(stock_codes)} 只股票，追加 {sum(appended.values())} 行')
+    return appended
+
+
+def stored_codes():
+    """本地已有日线的股票代码"""
+    if not os.path.isdir(KLINE_STORE_DIR):
+        return []
+    return sorted(name for name in os.listdir(KLINE_STORE_DIR) if stored_length(name) > 0)
+
+
+def ensure_klines(stock_codes):
+    """本地还没有数据的股票先同步一次"""
+    missing = [code for code in stock_codes if stored_length(code) == 0]
+    if missing:
+        sync_klines(missing)
+
+
+def _adjusted_close(close, pre_close):
+    """
+    前复权收盘价：除权因子 f[t] = preClose[t] / close[t-1]，
+    复权价 = close[t] × Π_{s>t} f[s]（最新一天价格不变）
+    """
+    factors = np.ones_like(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors[1:] = pre_close[1:] / close[:-1]
+    factors[~np.isfinite(factors) | (factors <= 0)] = 1.0
+    # 自后向前累乘（不含当天）
+    later = np.cumprod(factors[::-1])[::-1]
+    later = np.append(later[1:], 1.0)
+    return close * later
+
+
+def read_window(stock_codes, start=None, end=None, field='close', adjusted=False, count=None):
+    """
+    读取多只股票在时间窗口内按日期对齐的数据
+
+    参数:
+        stock_codes: 股票代码列表
+        start: 开始日期（含，YYYY-MM-DD或datetime64），默认不限
+        end: 结束日期（含），默认不限
+        field: 字段名
+        adjusted: field为close时是否返回前复权收盘价
+        count: 只保留对齐后最后count个交易日
+
+    返回:
+        tuple: (dates, values)
+            - dates: 各股票交易日的并集（datetime64[D]，升序）
+            - values: len(dates) × len(stock_codes) 矩阵，没有数据的位置为NaN
+    """
+    start = np.datetime64(start, 'D') if start is not None else None
+    end = np.datetime64(end, 'D') if end is not None else None
+
+    slices = []
+    for code in stock_codes:
+        dates = read_dates(code)
+        lo = int(np.searchsorted(dates, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(dates, end, side='right')) if end is not None else dates.shape[0]
+        if adjusted and field == 'close':
+            # 复权因子依赖之后的全部除权，按整段计算后再截取窗口
+            values = _adjusted_close(np.asarray(read_field(code, 'close')), np.asarray(read_field(code, 'preClose')))[lo:hi]
+        else:
+            values = np.asarray(read_field(code, field)[lo:hi])
+        slices.append((np.asarray(dates[lo:hi]), values))
+
+    all_dates = np.unique(np.concatenate([d for d, _ in slices])) if slices else np.empty(0, dtype='datetime64[D]')
+    if count is not None:
+        all_dates = all_dates[-count:]
+
+    matrix = np.full((all_dates.shape[0], len(stock_codes)), np.nan)
+    for j, (dates, values) in enumerate(slices):
+        if dates.shape[0] == 0 or all_dates.shape[0] == 0:
+            continue
+        rows = np.searchsorted(all_dates, dates)
+        inside = (rows < all_dates.shape[0]) & (all_dates[np.minimum(rows, all_dates.shape[0] - 1)] == dates)
+        matrix[rows[inside], j] = values[inside]
+
+    return all_dates, matrix
+
+
+def require_codes(stock_codes):
+    """登记必须保存在本地的代码（后台线程会立即同步缺失的代码，之后随每日同步追加）"""
+    with _locks_lock:
+        _required_codes.update(stock_codes)
+
+
+def _needs_sync(now):
+    """交易日（按交易日历）收盘后，且当天还没有同步过"""
+    from apps.utils.trading_calendar import is_trading_day
+
+    return (
+        now.hour >= KLINE_SYNC_HOUR
+        and is_trading_day(now.date())
+        and _last_sync_date != now.date().isoformat()
+    )
+
+
+def _sync_loop():
+    global _last_sync_date
+
+    while True:
+        try:
+            with _locks_lock:
+                required = sorted(_required_codes)
+            ensure_klines(required)
+        except Exception as e:
+            # 迅投数据中心可能还没有初始化完成，下次检查时重试
+            logger.warning(f'同步必需代码的日线失败: {str(e)}')
+        try:
+            now = datetime.now()
+            if _needs_sync(now):
+                codes = stored_codes()
+                if codes:
+                    sync_klines(codes)
+                _last_sync_date = now.date().isoformat()
+        except Exception as e:
+            logger.error(f'日线同步失败: {str(e)}', exc_info=True)
+        time.sleep(_SYNC_CHECK_SECONDS)
+
+
+def start_kline_store():
+    """启动增量同步线程（只执行一次）：补齐必需代码，每个交易日收盘后追加全部已存储代码"""
+    global _started
+
+    with _locks_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=_sync_loop, name='kline-store-sync', daemon=True).start()
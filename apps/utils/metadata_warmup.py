@@ -0,0 +1,171 @@
+"""
+启动预热：全A股合约信息和板块成分股
+迅投数据中心初始化完成后（init_xtdatacenter_once）在后台低优先级线程中执行：
+1. download_sector_data 下载板块数据，并从迅投刷新交易日历（trading_calendar）
+2. 读取全A股代码列表（get_stock_list_in_sector('沪深A股')）
+3. 读取缓存中还没有的合约信息，写入 instrument_cache 并保存到文件
+4. 读取全部板块的成分股，写入 sector_cache（股票 → 板块反向索引），之后每个交易日刷新
+5. 用以上数据重建股票地区/交易所/板块分类表（stock_info）
+
+每处理一批代码/板块后让出一段时间，避免与请求线程争抢CPU和迅投连接。
+完成后 is_metadata_ready() 为True。请求本身从不触发合约信息的冷查询：预热完成前或预热范围之外
+（ETF、债券、退市代码等）未命中的代码由 instrument_cache 的后台线程成批补充。
+进度可通过 get_warmup_status() 查询。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 全A股代码所在的迅投板块
+WARMUP_UNIVERSE_SECTOR = getattr(settings, 'METADATA_WARMUP_UNIVERSE_SECTOR', '沪深A股')
+
+# 需要预热成分股的板块列表，None表示 get_sector_list() 返回的全部板块
+WARMUP_SECTORS = getattr(settings, 'METADATA_WARMUP_SECTORS', None)
+
+# 每批处理的代码/板块数
+WARMUP_CHUNK_SIZE = getattr(settings, 'METADATA_WARMUP_CHUNK_SIZE', 200)
+
+# 每批之间让出的时间（秒）
+WARMUP_PAUSE_SECONDS = getattr(settings, 'METADATA_WARMUP_PAUSE_SECONDS', 0.05)
+
+_ready = threading.Event()
+_status_lock = threading.Lock()
+_status = {
+    'state': 'idle',        # idle / running / ready / failed
+    'phase': None,          # download / calendar / universe / instruments / sectors / classifier
+    'done': 0,
+    'total': 0,
+    'instruments': 0,
+    'sectors': 0,
+    'started_at': None,
+    'finished_at': None,
+    'error': None
+}
+_started = False
+
+
+def _set_status(**fields):
+    with _status_lock:
+        _status.update(fields)
+
+
+def get_warmup_status():
+    """
+    查询预热进度
+
+    返回:
+        dict: {'state', 'phase', 'done', 'total', 'progress', 'ready', 'instruments', 'sectors',
+               'started_at', 'finished_at', 'error'}，progress为当前阶段的完成百分比
+    """
+    with _status_lock:
+        status = dict(_status)
+    status['progress'] = round(status['done'] / status['total'] * 100, 1) if status['total'] else 0.0
+    status['ready'] = _ready.is_set()
+    return status
+
+
+def is_metadata_ready():
+    """合约信息和板块成分股是否已全部预热"""
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout=None):
+    """等待预热完成，返回是否已完成"""
+    return _ready.wait(timeout)
+
+
+def _chunks(items):
+    for start in range(0, len(items), WARMUP_CHUNK_SIZE):
+        yield items[start:start + WARMUP_CHUNK_SIZE]
+
+
+def _warmup_instruments(xtdata):
+    from apps.utils import instrument_cache
+
+    _set_status(phase='universe', done=0, total=0)
+    universe = xtdata.get_stock_list_in_sector(WARMUP_UNIVERSE_SECTOR) or []
+    missing = sorted(set(universe) - instrument_cache.cached_codes())
+    logger.info(f'全A股共 {len(universe)} 只，需要读取合约信息 {len(missing)} 只')
+
+    _set_status(phase='instruments', done=0, total=len(missing))
+    fetched = 0
+    for chunk in _chunks(missing):
+        records = instrument_cache.fetch_instruments(chunk)
+        instrument_cache.update_instruments(records)
+        fetched += len(records)
+        with _status_lock:
+            _status['done'] += len(chunk)
+            _status['instruments'] = fetched
+        time.sleep(WARMUP_PAUSE_SECONDS)
+
+    if fetched:
+        instrument_cache.save_instrument_cache()
+    logger.info(f'合约信息预热完成: {fetched}/{len(missing)}')
+
+
+def _warmup_sectors():
+    from apps.utils.sector_cache import load_sector_members, start_sector_refresh
+
+    _set_status(phase='sectors', done=0, total=0)
+
+    def progress(done, total, loaded):
+        _set_status(done=done, total=total, sectors=loaded)
+
+    load_sector_members(WARMUP_SECTORS, progress=progress, pause=WARMUP_PAUSE_SECONDS, chunk_size=WARMUP_CHUNK_SIZE)
+    # 之后每个交易日刷新一次
+    start_sector_refresh(WARMUP_SECTORS)
+
+
+def run_metadata_warmup():
+    """执行一次完整预热（阻塞，通常由 start_metadata_warmup 在后台线程中调用）"""
+    from xtquant import xtdata
+
+    _set_status(state='running', started_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                finished_at=None, error=None)
+    try:
+        _set_status(phase='download', done=0, total=0)
+        try:
+            xtdata.download_sector_data()
+        except Exception as e:
+            # 下载失败时使用本地已有的板块数据继续
+            logger.warning(f'下载板块数据失败: {str(e)}')
+
+        _set_status(phase='calendar', done=0, total=0)
+        try:
+            from apps.utils.trading_calendar import refresh_trading_calendar
+            refresh_trading_calendar()
+        except Exception as e:
+            # 刷新失败时使用本地缓存的交易日历
+            logger.warning(f'刷新交易日历失败: {str(e)}')
+
+        _warmup_instruments(xtdata)
+        _warmup_sectors()
+
+        _set_status(phase='classifier', done=0, total=0)
+        from apps.utils.stock_info import rebuild_stock_classifier
+        rebuild_stock_classifier()
+
+        _ready.set()
+        _set_status(state='ready', phase=None, finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        logger.info('元数据预热完成，合约信息和板块成分股已就绪')
+    except Exception as e:
+        _set_status(state='failed', error=str(e), finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        logger.error(f'元数据预热失败: {str(e)}', exc_info=True)
+
+
+def start_metadata_warmup():
+    """在后台线程中启动预热（只执行一次）"""
+    global _started
+
+    with _status_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=run_metadata_warmup, name='metadata-warmup', daemon=True).start()
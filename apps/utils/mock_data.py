@@ -0,0 +1,175 @@
+"""
+模拟数据生成模块
+为风险接口和时间序列接口提供可复现的模拟账户历史：
+- 使用局部随机数生成器（不修改全局随机状态，不影响同一进程中的其他请求）
+- 整段序列一次性向量化生成，不使用逐日循环
+- 按 (天数, 种子, 截止日期) 缓存生成结果
+- 支持一次生成多个账户、多年的序列，可作为基准测试的数据
+
+局部生成器使用 np.random.RandomState：与原来 np.random.seed(42) 加逐日 np.random.normal
+的抽样序列完全相同，种子不变时模拟数据与以前一致。
+多账户生成时按账户逐行抽样，第i个账户的序列与账户总数无关，第0个账户即单账户序列。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 模拟账户的初始资产
+MOCK_BASE_VALUE = 4100000.00
+
+# 日收益率分布（均值0.1%，标准差1.5%）
+MOCK_DAILY_MEAN = 0.001
+MOCK_DAILY_STD = 0.015
+
+# 资产下限（相对初始资产的比例）
+MOCK_FLOOR_RATIO = 0.7
+
+# 缓存的模拟序列数量上限（LRU淘汰）
+MOCK_CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(key, build):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    value = build()
+
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > MOCK_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def _compound_with_floor(base_value, growth, floor):
+    """
+    按增长因子逐日复利，资产跌破下限时从下限继续（沿最后一个轴向量化）
+
+    原逐日实现为 v[t] = max(v[t-1] × g[t], floor)，
+    在对数空间中等价于 x[t] = S[t] + max(0, max_{s≤t}(log(floor) - S[s]))，S为对数累计和
+    """
+    # 初始资产放在第一列参与连乘，乘法顺序与逐日计算相同
+    start = np.full(growth.shape[:-1] + (1,), base_value)
+    values = np.multiply.accumulate(np.concatenate([start, growth], axis=-1), axis=-1)[..., 1:]
+    if not (values < floor).any():
+        return values
+
+    log_path = np.log(base_value) + np.cumsum(np.log(growth), axis=-1)
+    lift = np.maximum(np.maximum.accumulate(np.log(floor) - log_path, axis=-1), 0.0)
+    return np.exp(log_path + lift)
+
+
+def mock_values(days, seed=42, accounts=1, base_value=MOCK_BASE_VALUE):
+    """
+    生成模拟账户的每日总资产
+
+    参数:
+        days: 天数
+        seed: 随机种子
+        accounts: 账户数
+        base_value: 初始资产
+
+    返回:
+        np.ndarray: 形状为 (accounts, days) 的总资产矩阵（只读，调用方不要修改）
+    """
+    def build():
+        rng = np.random.RandomState(seed)
+        growth = 1 + rng.normal(MOCK_DAILY_MEAN, MOCK_DAILY_STD, size=(accounts, days))
+        values = _compound_with_floor(base_value, growth, base_value * MOCK_FLOOR_RATIO)
+        values.flags.writeable = False
+        return values
+
+    return _cached(('values', days, seed, accounts, base_value), build)
+
+
+def mock_date_labels(days, end_date=None):
+    """
+    生成截止日期前days天的日期字符串（不含截止日期当天，与原模拟数据一致）
+
+    返回:
+        list: ['YYYY-MM-DD', ...]
+    """
+    end = np.datetime64(end_date or datetime.now().date(), 'D')
+    return np.datetime_as_string(end - np.arange(days, 0, -1)).tolist()
+
+
+def mock_account_history(days=30, seed=42, account_index=0):
+    """
+    生成模拟账户历史数据（get_mock_account_history 的实现）
+
+    参数:
+        days: 天数
+        seed: 随机种子
+        account_index: 多账户序列中的账户序号
+
+    返回:
+        list: 与 get_account_history 格式相同的历史数据（每次返回新列表，可自由修改）
+    """
+    today = datetime.now().date()
+
+    def build():
+        values = mock_values(days, seed, accounts=account_index + 1)[account_index]
+        labels = mock_date_labels(days, today)
+        total_assets = np.round(values, 2).tolist()
+        market_values = np.round(values * 0.7, 2).tolist()
+        cash = np.round(values * 0.3, 2).tolist()
+        return [
+            {'date': label, 'total_assets': value, 'market_value': mv, 'cash': c}
+            for label, value, mv, c in zip(labels, total_assets, market_values, cash)
+        ]
+
+    history = _cached(('history', days, seed, account_index, today), build)
+    return [dict(record) for record in history]
+
+
+def mock_accounts_history(accounts, days, seed=42, end_date=None):
+    """
+    生成多个模拟账户的历史（用于批量评估和基准测试）
+
+    返回:
+        dict: {account_id: (values, date_labels)}，账户ID为 MOCK000001 形式，
+              values为只读数组，可直接构造 HistoryArrays
+    """
+    values = mock_values(days, seed, accounts=accounts)
+    labels = mock_date_labels(days, end_date)
+    return {f'MOCK{i + 1:06d}': (values[i], labels) for i in range(accounts)}
+
+
+def mock_time_series(start_date, end_date, seed=7, base_value=3800000.00):
+    """
+    生成时间序列接口的模拟数据（日涨跌幅在-2%到+2%之间均匀分布）
+
+    参数:
+        start_date: 开始日期（YYYY-MM-DD，包含）
+        end_date: 结束日期（YYYY-MM-DD，包含）
+        seed: 随机种子
+        base_value: 初始资产（收益率的基准）
+
+    返回:
+        list: [{'date', 'totalAssets', 'returnRate'}, ...]
+    """
+    def build():
+        start = np.datetime64(start_date, 'D')
+        count = max(int((np.datetime64(end_date, 'D') - start).astype(int)) + 1, 0)
+        rng = np.random.default_rng(seed)
+        values = base_value * np.multiply.accumulate(1 + rng.uniform(-0.02, 0.02, size=count))
+        return_rates = np.round((values - base_value) / base_value * 100, 2).tolist()
+        labels = np.datetime_as_string(start + np.arange(count)).tolist()
+        return [
+            {'date': label, 'totalAssets': value, 'returnRate': rate}
+            for label, value, rate in zip(labels, np.round(values, 2).tolist(), return_rates)
+        ]
+
+    series = _cached(('time_series', start_date, end_date, seed, base_value), build)
+    return [dict(point) for point in series]
@@ -0,0 +1,157 @@
+"""
+已结束周期的统计结果存储
+过去的年份、ISO 周结束后不会再有新快照（快照日期总是保存当天），统计结果不再变化。
+每个已结束周期只从快照计算一次，保存到 period_summaries 集合（每个账户 × 粒度 × 周期一条）；
+请求时读取已保存的周期，只从最后一个已保存周期之后的快照重新计算（通常只剩当前未结束的周期），
+新结束的周期顺带保存。
+
+已有历史可以用 python manage.py backfill_period_summaries 一次性补齐。
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from apps.utils.db import get_mongodb_db
+from apps.utils.periods import bucket_history, period_bounds, period_ids
+
+logger = logging.getLogger(__name__)
+
+# 保存已结束周期的粒度（按日的周期当天就结束，不需要保存）
+STORED_GRANULARITIES = ('week', 'month', 'quarter', 'year')
+
+# 只在存储内部使用的字段，返回给接口前去掉
+_INTERNAL_FIELDS = ('account_id', 'granularity', 'periodStart', 'periodEnd', 'computed_at')
+
+_indexed = False
+
+
+def _collection():
+    global _indexed
+
+    collection = get_mongodb_db().period_summaries
+    if not _indexed:
+        collection.create_index([('account_id', 1), ('granularity', 1), ('periodEnd', 1)], unique=True)
+        _indexed = True
+    return collection
+
+
+def _with_bounds(periods, granularity):
+    """为周期统计补充日历上的第一天和最后一天（periodStart / periodEnd，YYYY-MM-DD）"""
+    if not periods:
+        return periods
+    ids = period_ids(np.array([period['startDate'] for period in periods], dtype='datetime64[D]'), granularity)
+    starts, ends = period_bounds(ids, granularity)
+    for period, start, end in zip(periods, np.datetime_as_string(starts).tolist(), np.datetime_as_string(ends).tolist()):
+        period['periodStart'] = start
+        period['periodEnd'] = end
+    return periods
+
+
+def _compute_after(account_id, granularity, after=None):
+    """从快照计算 after（不含）之后的周期统计"""
+    from apps.utils.data_storage import HISTORY_PROJECTION
+    from apps.utils.snapshot_dates import date_condition, date_sort, snapshot_days
+
+    query = {'account_id': str(account_id)}
+    if after:
+        query.update(date_condition(start=after, inclusive=False))
+    snapshots = list(get_mongodb_db().account_snapshots.find(query, projection=HISTORY_PROJECTION).sort(date_sort()))
+    if not snapshots:
+        return []
+    return _with_bounds(bucket_history(
+        snapshot_days(snapshots),
+        [float(snapshot.get('total_asset', 0)) for snapshot in snapshots],
+        [float(snapshot.get('market_value', 0)) for snapshot in snapshots],
+        granularity
+    ), granularity)
+
+
+def _save_closed(account_id, granularity, periods):
+    """保存已结束的周期（重复保存同一周期不会产生重复记录）"""
+    from pymongo import UpdateOne
+
+    if not periods:
+        return 0
+    computed_at = datetime.now()
+    operations = [
+        UpdateOne(
+            {'account_id': str(account_id), 'granularity': granularity, 'periodEnd': period['periodEnd']},
+            {'$setOnInsert': {**period, 'account_id': str(account_id), 'granularity': granularity, 'computed_at': computed_at}},
+            upsert=True
+        )
+        for period in periods
+    ]
+    _collection().bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def refresh_period_summaries(account_id, granularity, today=None):
+    """
+    补齐账户已结束周期的统计，并计算当前未结束的周期
+
+    参数:
+        account_id: 账户ID
+        granularity: STORED_GRANULARITIES 之一
+        today: 当天日期（YYYY-MM-DD），默认系统日期；periodEnd早于当天的周期视为已结束
+
+    返回:
+        tuple: (全部周期统计（含内部字段，按时间升序）, 本次新保存的周期数)
+    """
+    today = today or datetime.now().date().isoformat()
+    collection = _collection()
+
+    stored = list(collection.find(
+        {'account_id': str(account_id), 'granularity': granularity},
+        projection={'_id': 0}
+    ).sort('periodEnd', 1))
+    watermark = stored[-1]['periodEnd'] if stored else None
+
+    fresh = _compute_after(account_id, granularity, after=watermark)
+    closed = [period for period in fresh if period['periodEnd'] < today]
+    saved = _save_closed(account_id, granularity, closed)
+    if saved:
+        logger.info(f'账户 {account_id} 新保存 {saved} 个已结束的{granularity}周期')
+
+    return stored + fresh, saved
+
+
+def get_period_summaries(account_id, granularity, start_date=None, end_date=None, today=None):
+    """
+    读取按粒度分组的周期统计（已结束周期读存储，只重新计算未保存的周期）
+
+    参数:
+        account_id: 账户ID
+        granularity: STORED_GRANULARITIES 之一
+        start_date: 开始日期（YYYY-MM-DD），返回与[start_date, end_date]有交集的完整周期
+        end_date: 结束日期（YYYY-MM-DD）
+        today: 当天日期（YYYY-MM-DD），默认系统日期
+
+    返回:
+        list: 格式与 apps.utils.periods.bucket_history 相同
+    """
+    periods, _ = refresh_period_summaries(account_id, granularity, today=today)
+    start_date = str(start_date) if start_date else None
+    end_date = str(end_date) if end_date else None
+    return [
+        {key: value for key, value in period.items() if key not in _INTERNAL_FIELDS}
+        for period in periods
+        if (start_date is None or period['periodEnd'] >= start_date)
+        and (end_date is None or period['periodStart'] <= end_date)
+    ]
+
+
+def delete_period_summaries(account_id=None, granularity=None):
+    """
+    删除保存的周期统计（快照被修正后重新补齐前使用）
+
+    返回:
+        int: 删除的记录数
+    """
+    query = {}
+    if account_id is not None:
+        query['account_id'] = str(account_id)
+    if granularity is not None:
+        query['granularity'] = granularity
+    return _collection().delete_many(query).deleted_count
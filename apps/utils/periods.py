@@ -0,0 +1,193 @@
+"""
+按时间粒度分组账户历史
+年度对比、周度对比和通用时间段对比共用这一套分组：日期转换为 datetime64[D] 后，
+按粒度一次性算出每条记录所在周期的编号，历史按日期有序时同一周期的记录连续，
+用 np.flatnonzero 找到周期边界、np.add.reduceat 求和，不需要逐条构建字典。
+
+    日     YYYY-MM-DD
+    周     YYYY-Www（ISO 8601，周一为一周的第一天）
+    月     YYYY-MM
+    季度   YYYY-Qn
+    年     YYYY
+"""
+
+import numpy as np
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+# 1970-01-01 是星期四，datetime64[D] 的天数加3后对7取余即周一为0的星期序号
+_EPOCH_WEEKDAY_OFFSET = 3
+
+
+def period_ids(dates, granularity):
+    """
+    计算每个日期所在周期的编号（随日期单调不减）
+
+    参数:
+        dates: datetime64[D] 数组
+        granularity: GRANULARITIES 之一
+
+    返回:
+        np.ndarray: int64 周期编号（日、周为该周期第一天的天数，月、季度、年为月份/年份序号）
+    """
+    days = dates.astype(np.int64)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return days - (days + _EPOCH_WEEKDAY_OFFSET) % 7
+    if granularity == 'month':
+        return dates.astype('datetime64[M]').astype(np.int64)
+    if granularity == 'quarter':
+        return dates.astype('datetime64[M]').astype(np.int64) // 3
+    if granularity == 'year':
+        return dates.astype('datetime64[Y]').astype(np.int64)
+    raise ValueError(f'不支持的时间粒度: {granularity}')
+
+
+def period_bounds(ids, granularity):
+    """
+    周期编号对应的第一天和最后一天
+
+    返回:
+        tuple: (starts, ends)，均为datetime64[D]数组
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if granularity == 'day':
+        starts = ids.astype('datetime64[D]')
+        return starts, starts
+    if granularity == 'week':
+        starts = ids.astype('datetime64[D]')
+        return starts, starts + 6
+    if granularity == 'month':
+        months = ids
+    elif granularity == 'quarter':
+        months = ids * 3
+        ids = ids * 3 + 2
+    elif granularity == 'year':
+        months = ids * 12
+        ids = ids * 12 + 11
+    else:
+        raise ValueError(f'不支持的时间粒度: {granularity}')
+    starts = months.astype('datetime64[M]').astype('datetime64[D]')
+    ends = (ids + 1).astype('datetime64[M]').astype('datetime64[D]') - 1
+    return starts, ends
+
+
+def period_range(start, end, granularity):
+    """
+    把日期范围扩展到所在周期的第一天和最后一天（按日的粒度不变）
+
+    参数:
+        start: 开始日期（YYYY-MM-DD、date等，None表示不限）
+        end: 结束日期
+
+    返回:
+        tuple: (start, end)，YYYY-MM-DD字符串，不限的一端仍为None
+    """
+    bounds = []
+    for value, side in ((start, 0), (end, 1)):
+        if value is None:
+            bounds.append(None)
+            continue
+        ids = period_ids(np.array([value], dtype='datetime64[D]'), granularity)
+        bounds.append(str(period_bounds(ids, granularity)[side][0]))
+    return tuple(bounds)
+
+
+def period_labels(ids, granularity):
+    """
+    周期编号转换为显示名称
+
+    返回:
+        list: 与ids对齐的名称列表
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if granularity == 'day':
+        return np.datetime_as_string(ids.astype('datetime64[D]')).tolist()
+    if granularity == 'week':
+        # ISO 周所属的年份是该周星期四所在的年份
+        thursdays = (ids + 3).astype('datetime64[D]')
+        years = thursdays.astype('datetime64[Y]')
+        weeks = (thursdays - years.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+        return [f'{year}-W{week:02d}' for year, week in zip(years.astype(str).tolist(), weeks.tolist())]
+    if granularity == 'month':
+        return np.datetime_as_string(ids.astype('datetime64[M]')).tolist()
+    if granularity == 'quarter':
+        years = ids // 4 + 1970
+        return [f'{year}-Q{quarter + 1}' for year, quarter in zip(years.tolist(), (ids % 4).tolist())]
+    if granularity == 'year':
+        return np.datetime_as_string(ids.astype('datetime64[Y]')).tolist()
+    raise ValueError(f'不支持的时间粒度: {granularity}')
+
+
+def bucket_history(dates, total_assets, market_values, granularity):
+    """
+    按粒度分组统计账户历史
+
+    参数:
+        dates: 日期（YYYY-MM-DD字符串或datetime64），同一天可以有多条
+        total_assets: 与dates对齐的总资产
+        market_values: 与dates对齐的持仓市值
+        granularity: GRANULARITIES 之一
+
+    返回:
+        list: 按时间升序的周期统计
+        [
+            {
+                'timePeriod': '2025-03',
+                'startDate': '2025-03-03',
+                'endDate': '2025-03-31',
+                'firstAssets': 4000000.00,   # 周期内第一条记录的总资产
+                'totalAssets': 4100000.00,   # 周期内最后一条记录的总资产
+                'returnRate': 2.5,           # (最后 - 第一) / 第一，百分比
+                'investmentRate': 70.0,      # 平均持仓市值 / 平均总资产，百分比
+                'count': 21
+            },
+            ...
+        ]
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if dates.shape[0] == 0:
+        return []
+    total_assets = np.asarray(total_assets, dtype=np.float64)
+    market_values = np.asarray(market_values, dtype=np.float64)
+
+    # 历史通常已按日期排序，稳定排序保持同一天内的先后顺序
+    if (np.diff(dates.astype(np.int64)) < 0).any():
+        order = np.argsort(dates, kind='stable')
+        dates, total_assets, market_values = dates[order], total_assets[order], market_values[order]
+
+    ids = period_ids(dates, granularity)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(ids)) + 1])
+    ends = np.append(starts[1:], ids.shape[0]) - 1
+
+    first = total_assets[starts]
+    last = total_assets[ends]
+    asset_sums = np.add.reduceat(total_assets, starts)
+    market_sums = np.add.reduceat(market_values, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return_rates = np.where(first > 0, (last - first) / first * 100, 0.0)
+        investment_rates = np.where(asset_sums > 0, market_sums / asset_sums * 100, 0.0)
+
+    labels = period_labels(ids[starts], granularity)
+    start_labels = np.datetime_as_string(dates[starts]).tolist()
+    end_labels = np.datetime_as_string(dates[ends]).tolist()
+    counts = (ends - starts + 1).tolist()
+    first = np.round(first, 2).tolist()
+    last = np.round(last, 2).tolist()
+    return_rates = np.round(return_rates, 2).tolist()
+    investment_rates = np.round(investment_rates, 2).tolist()
+
+    return [
+        {
+            'timePeriod': labels[i],
+            'startDate': start_labels[i],
+            'endDate': end_labels[i],
+            'firstAssets': first[i],
+            'totalAssets': last[i],
+            'returnRate': return_rates[i],
+            'investmentRate': investment_rates[i],
+            'count': counts[i]
+        }
+        for i in range(len(labels))
+    ]
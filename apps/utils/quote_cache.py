@@ -0,0 +1,197 @@
+"""
+持仓股票实时行情缓存
+对全部持仓股票（各账户持仓代码的并集）通过 xtdata.subscribe_whole_quote 订阅全推行情，
+每只股票只保留最新一笔分笔数据，存放在按列组织的数组表中：
+
+    代码 → 行号（字典），各字段一列 numpy 数组（最新价、昨收、开高低、成交量额、时间）
+
+查询时一次取出多只股票的行情：已订阅的直接读表，未订阅（或尚未收到推送）的代码
+合并成一次 xtdata.get_full_tick 调用补齐，之后自动加入订阅。
+视图可以据此计算几百只持仓的当日涨幅，而不需要逐只调用行情接口。
+
+其他模块（如风险预警）可以通过 add_quote_listener 接收同一份推送，不必重复订阅。
+"""
+
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 表中保存的字段：列名 → 迅投分笔数据中的字段名
+QUOTE_FIELDS = {
+    'last_price': 'lastPrice',
+    'last_close': 'lastClose',
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'volume': 'volume',
+    'amount': 'amount',
+    'time': 'time'
+}
+
+_INITIAL_CAPACITY = 256
+
+
+class QuoteTable:
+    """按列存储的最新行情表（每只股票一行）"""
+
+    def __init__(self, capacity=_INITIAL_CAPACITY):
+        self.index = {}
+        self.codes = []
+        self.columns = {name: np.full(capacity, np.nan) for name in QUOTE_FIELDS}
+        self.lock = threading.Lock()
+
+    def _row(self, stock_code):
+        row = self.index.get(stock_code)
+        if row is None:
+            row = len(self.codes)
+            capacity = self.columns['last_price'].shape[0]
+            if row >= capacity:
+                for name, column in self.columns.items():
+                    grown = np.full(capacity * 2, np.nan)
+                    grown[:capacity] = column
+                    self.columns[name] = grown
+            self.index[stock_code] = row
+            self.codes.append(stock_code)
+        return row
+
+    def update(self, ticks):
+        """
+        写入分笔数据
+
+        参数:
+            ticks: {stock_code: 行情字典} 或 {stock_code: [行情字典, ...]}（取最后一笔）
+        """
+        with self.lock:
+            for stock_code, tick in ticks.items():
+                if isinstance(tick, list):
+                    tick = tick[-1] if tick else None
+                if not tick:
+                    continue
+                row = self._row(stock_code)
+                for name, field in QUOTE_FIELDS.items():
+                    value = tick.get(field)
+                    self.columns[name][row] = float(value) if value is not None else np.nan
+
+    def lookup(self, stock_codes):
+        """
+        批量读取
+
+        返回:
+            tuple: (found, columns)
+                - found: 布尔数组，表中是否有该代码
+                - columns: {列名: 与stock_codes对齐的数组}，缺失为NaN
+        """
+        with self.lock:
+            rows = np.array([self.index.get(code, -1) for code in stock_codes], dtype=np.int64)
+            found = rows >= 0
+            safe_rows = np.where(found, rows, 0)
+            columns = {}
+            for name, column in self.columns.items():
+                values = column[safe_rows]
+                values[~found] = np.nan
+                columns[name] = values
+        return found, columns
+
+    def __len__(self):
+        return len(self.codes)
+
+
+_table = QuoteTable()
+_subscribed_codes = set()
+_subscribe_lock = threading.Lock()
+_listeners = []
+
+
+def add_quote_listener(callback):
+    """注册行情推送监听（参数与 xtdata 订阅回调相同），同一回调只注册一次"""
+    with _subscribe_lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def _on_quote(datas):
+    """xtdata 全推行情回调"""
+    _table.update(datas)
+    for listener in list(_listeners):
+        try:
+            listener(datas)
+        except Exception as e:
+            logger.error(f'行情监听处理失败: {str(e)}', exc_info=True)
+
+
+def subscribe_codes(stock_codes):
+    """
+    将代码加入全推行情订阅（已订阅的代码忽略）
+
+    返回:
+        list: 本次新订阅成功的代码
+    """
+    with _subscribe_lock:
+        new_codes = [code for code in dict.fromkeys(stock_codes) if code not in _subscribed_codes]
+        _subscribed_codes.update(new_codes)
+    if not new_codes:
+        return []
+
+    try:
+        from xtquant import xtdata
+
+        xtdata.subscribe_whole_quote(new_codes, callback=_on_quote)
+        logger.info(f'已订阅 {len(new_codes)} 只股票的全推行情，共 {len(_subscribed_codes)} 只')
+        return new_codes
+    except Exception as e:
+        logger.error(f'订阅全推行情失败: {str(e)}')
+        with _subscribe_lock:
+            _subscribed_codes.difference_update(new_codes)
+        return []
+
+
+def is_subscribed(stock_code):
+    return stock_code in _subscribed_codes
+
+
+def get_quotes(stock_codes, subscribe=True):
+    """
+    批量获取最新行情
+
+    参数:
+        stock_codes: 股票代码列表
+        subscribe: 是否将未订阅的代码加入订阅
+
+    返回:
+        dict: {列名: 与stock_codes对齐的numpy数组}，取不到的为NaN
+    """
+    stock_codes = list(stock_codes)
+    found, columns = _table.lookup(stock_codes)
+
+    # 未订阅或尚未收到推送的代码，一次 get_full_tick 补齐
+    missing = [code for code, ok in zip(stock_codes, found) if not ok or not is_subscribed(code)]
+    if missing:
+        try:
+            from xtquant import xtdata
+
+            _table.update(xtdata.get_full_tick(missing) or {})
+            found, columns = _table.lookup(stock_codes)
+        except Exception as e:
+            logger.warning(f'获取 {len(missing)} 只股票的最新行情失败: {str(e)}')
+        if subscribe:
+            subscribe_codes(missing)
+
+    return columns
+
+
+def get_intraday_returns(stock_codes, subscribe=True):
+    """
+    批量计算当日涨幅（最新价相对昨收，百分比）
+
+    返回:
+        tuple: (last_prices, returns)，与stock_codes对齐的数组，取不到行情的为NaN
+    """
+    columns = get_quotes(stock_codes, subscribe=subscribe)
+    last_price = columns['last_price']
+    last_close = columns['last_close']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(last_close > 0, (last_price - last_close) / last_close * 100, np.nan)
+    return last_price, returns
@@ -0,0 +1,233 @@
+"""
+板块成分股缓存 / 股票 → 板块反向索引
+保存迅投板块 → 成分股的对应关系，以及按股票查所属板块的反向索引：
+
+    股票代码 → 行号（字典，O(1)）
+    行号 → 所属板块编号：CSR 形式（offsets + 板块编号数组，int32）
+    行业分类（如申万一级 SW1）：每只股票一个行业编号的 int16 数组，按前缀分别缓存
+
+启动预热任务（metadata_warmup）整体写入，之后每个交易日重新读取一次（start_sector_refresh）。
+请求中查询板块成分股、按行业汇总持仓时直接读内存，不再调用 xtdata.get_stock_list_in_sector。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 行业分类板块的名称前缀（迅投申万一级行业板块名为 SW1银行、SW1医药生物 等）
+INDUSTRY_SECTOR_PREFIX = getattr(settings, 'INDUSTRY_SECTOR_PREFIX', 'SW1')
+
+# 不属于任何行业板块时的名称
+UNCLASSIFIED_INDUSTRY = '其他'
+
+# 每个交易日在该时间（小时）之后刷新板块成分股
+SECTOR_REFRESH_HOUR = getattr(settings, 'SECTOR_REFRESH_HOUR', 9)
+
+_REFRESH_CHECK_SECONDS = 600
+
+
+class SectorIndex:
+    """板块成分股和股票 → 板块反向索引（构建后只读）"""
+
+    __slots__ = ('sectors', 'members', 'code_rows', 'offsets', 'stock_sector_ids', '_industries', '_lock')
+
+    def __init__(self, members):
+        self.sectors = list(members)
+        self.members = {sector: frozenset(codes) for sector, codes in members.items()}
+
+        # 反向索引：先展开 (股票, 板块) 对，再按股票排序得到 CSR
+        pairs_code, pairs_sector = [], []
+        for sector_id, sector in enumerate(self.sectors):
+            codes = self.members[sector]
+            pairs_code.extend(codes)
+            pairs_sector.extend([sector_id] * len(codes))
+        codes, code_idx = np.unique(np.array(pairs_code, dtype='U12'), return_inverse=True) if pairs_code else (np.empty(0, dtype='U12'), np.empty(0, dtype=np.int64))
+        order = np.argsort(code_idx, kind='stable')
+        self.stock_sector_ids = np.asarray(pairs_sector, dtype=np.int32)[order]
+        self.offsets = np.zeros(codes.shape[0] + 1, dtype=np.int32)
+        np.cumsum(np.bincount(code_idx, minlength=codes.shape[0]), out=self.offsets[1:])
+        self.code_rows = {code: row for row, code in enumerate(codes.tolist())}
+
+        self._industries = {}
+        self._lock = threading.Lock()
+
+    def sectors_of(self, stock_code):
+        row = self.code_rows.get(stock_code)
+        if row is None:
+            return []
+        return [self.sectors[i] for i in self.stock_sector_ids[self.offsets[row]:self.offsets[row + 1]]]
+
+    def industry_column(self, prefix):
+        """
+        每只股票的行业编号（-1表示不属于任何以prefix开头的板块），按前缀缓存
+
+        返回:
+            tuple: (labels, column)，labels为去掉前缀的行业名称列表
+        """
+        cached = self._industries.get(prefix)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._industries.get(prefix)
+            if cached is None:
+                industry_ids = [i for i, sector in enumerate(self.sectors) if sector.startswith(prefix)]
+                labels = [self.sectors[i][len(prefix):] for i in industry_ids]
+                sector_to_industry = np.full(len(self.sectors), -1, dtype=np.int16)
+                sector_to_industry[industry_ids] = np.arange(len(industry_ids), dtype=np.int16)
+
+                # 每只股票取第一个所属的行业板块
+                column = np.full(len(self.code_rows), -1, dtype=np.int16)
+                mapped = sector_to_industry[self.stock_sector_ids] if self.stock_sector_ids.shape[0] else np.empty(0, dtype=np.int16)
+                has = mapped >= 0
+                rows = np.repeat(np.arange(len(self.code_rows)), np.diff(self.offsets))
+                # 每只股票保留第一个行业
+                industry_rows, first = np.unique(rows[has], return_index=True)
+                column[industry_rows] = mapped[has][first]
+
+                cached = self._industries[prefix] = (labels, column)
+        return cached
+
+
+_index = SectorIndex({})
+_refreshed_date = None
+_started = False
+_start_lock = threading.Lock()
+
+
+def update_sector_members(members):
+    """
+    整体替换板块成分股（重建反向索引）
+
+    参数:
+        members: {板块名称: [股票代码, ...]}
+    """
+    global _index
+
+    _index = SectorIndex(members)
+
+
+def get_sector_members(sector):
+    """
+    查询板块成分股
+
+    返回:
+        frozenset: 成分股代码集合，板块未缓存时返回None
+    """
+    return _index.members.get(sector)
+
+
+def get_stock_sectors(stock_code):
+    """查询股票所属的全部板块（未缓存时为空列表）"""
+    return _index.sectors_of(stock_code)
+
+
+def get_stock_industries(stock_codes, prefix=None):
+    """
+    批量查询股票所属行业（每只股票O(1)）
+
+    参数:
+        stock_codes: 股票代码列表
+        prefix: 行业板块名称前缀，默认 INDUSTRY_SECTOR_PREFIX
+
+    返回:
+        list: 与stock_codes对齐的行业名称，未分类为 UNCLASSIFIED_INDUSTRY
+    """
+    index = _index
+    labels, column = index.industry_column(prefix or INDUSTRY_SECTOR_PREFIX)
+    code_rows = index.code_rows
+    result = []
+    for code in stock_codes:
+        row = code_rows.get(code)
+        industry = column[row] if row is not None else -1
+        result.append(labels[industry] if industry >= 0 else UNCLASSIFIED_INDUSTRY)
+    return result
+
+
+def sector_count():
+    """已缓存的板块数"""
+    return len(_index.sectors)
+
+
+def load_sector_members(sectors=None, progress=None, pause=0.0, chunk_size=200):
+    """
+    从迅投读取板块成分股并重建索引
+
+    参数:
+        sectors: 板块列表，None表示 get_sector_list() 返回的全部板块
+        progress: 进度回调 progress(已处理数, 板块总数, 已读取数)
+        pause: 每批之间让出的时间（秒）
+        chunk_size: 每批处理的板块数
+
+    返回:
+        int: 读取成功的板块数
+    """
+    global _refreshed_date
+
+    from xtquant import xtdata
+
+    sectors = list(sectors) if sectors is not None else (xtdata.get_sector_list() or [])
+    members = {}
+    for start in range(0, len(sectors), chunk_size):
+        for sector in sectors[start:start + chunk_size]:
+            try:
+                members[sector] = xtdata.get_stock_list_in_sector(sector) or []
+            except Exception as e:
+                logger.warning(f'读取板块 {sector} 成分股失败: {str(e)}')
+        if progress:
+            progress(min(start + chunk_size, len(sectors)), len(sectors), len(members))
+        if pause:
+            time.sleep(pause)
+
+    if sectors and not members:
+        logger.warning('板块成分股全部读取失败，保留原索引')
+        return 0
+
+    update_sector_members(members)
+    _refreshed_date = datetime.now().date().isoformat()
+    logger.info(f'板块成分股已加载: {len(members)}/{len(sectors)}')
+    return len(members)
+
+
+def _needs_refresh(now):
+    """交易日（按交易日历）开盘前后，且当天还没有刷新过"""
+    from apps.utils.trading_calendar import is_trading_day
+
+    return (
+        now.hour >= SECTOR_REFRESH_HOUR
+        and is_trading_day(now.date())
+        and _refreshed_date != now.date().isoformat()
+    )
+
+
+def _refresh_loop(sectors):
+    from xtquant import xtdata
+
+    while True:
+        try:
+            if _needs_refresh(datetime.now()):
+                try:
+                    xtdata.download_sector_data()
+                except Exception as e:
+                    logger.warning(f'下载板块数据失败: {str(e)}')
+                load_sector_members(sectors)
+        except Exception as e:
+            logger.error(f'刷新板块成分股失败: {str(e)}', exc_info=True)
+        time.sleep(_REFRESH_CHECK_SECONDS)
+
+
+def start_sector_refresh(sectors=None):
+    """启动每个交易日一次的后台刷新线程（只执行一次）"""
+    global _started
+
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=_refresh_loop, args=(sectors,), name='sector-cache-refresh', daemon=True).start()
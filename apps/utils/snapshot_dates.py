@@ -0,0 +1,260 @@
+"""
+账户快照的日期键
+快照原来只保存 ISO 字符串日期（date: 'YYYY-MM-DD'），按字符串比较范围、按 date[:4] 截取年份。
+现在每条快照另外保存整数日期键 date_key（yyyymmdd，如 20250115）：
+索引键更小，范围查询是整数比较。
+
+按周期分组不使用聚合管道：周期收益率需要每个周期首尾两条快照，
+一次按 (account_id, date_key) 索引范围读取后由 apps.utils.periods 向量化分组，
+已结束的周期再保存到 period_summaries（见 period_store），比 $sort + $group 管道简单。
+以后需要在管道中按年分组时，date_key 是整数，可以直接用 $floor(date_key / 10000)。
+
+迁移过程（dual-read）：
+- 新快照同时写入 date_key 和 date
+- 后台线程分批为旧快照补写 date_key（start_date_key_migration，也可以运行
+  python manage.py migrate_snapshot_dates），全部完成后在 schema_migrations 集合中记录完成
+- 迁移完成前查询条件为"有 date_key 的按 date_key，没有的按 date"，
+  即使本进程的迁移状态已经过时（其他进程完成了迁移甚至删除了 date 字段）也能查到全部快照；
+  完成后只按 date_key 和 (account_id, date_key) 索引查询
+- 读取日期时优先使用 date_key，没有时使用 date；迁移完成后可以用
+  migrate_snapshot_dates --drop-legacy 删除旧的 date 字段（需要所有服务进程都已更新到按上述条件查询的版本）
+"""
+
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# schema_migrations 集合中本次迁移的记录ID
+DATE_KEY_MIGRATION_ID = 'snapshot_date_key'
+
+# 每批迁移的快照数，以及每批之间让出的时间（秒）
+DATE_KEY_MIGRATION_BATCH_SIZE = getattr(settings, 'DATE_KEY_MIGRATION_BATCH_SIZE', 1000)
+DATE_KEY_MIGRATION_PAUSE = getattr(settings, 'DATE_KEY_MIGRATION_PAUSE', 0.05)
+
+# 迁移未完成时，重新检查迁移状态的间隔（秒）
+_STATUS_CHECK_SECONDS = 60
+
+# 读取快照日期需要的字段
+DATE_PROJECTION = {'date': 1, 'date_key': 1}
+
+_migrated = False
+_checked_at = 0.0
+_started = False
+_start_lock = threading.Lock()
+
+
+def to_date_key(value):
+    """
+    日期转换为整数键
+
+    参数:
+        value: 'YYYY-MM-DD' 字符串、date/datetime 或 datetime64
+
+    返回:
+        int: yyyymmdd
+    """
+    if isinstance(value, str):
+        return int(value[:10].replace('-', ''))
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    return int(str(np.datetime64(value, 'D')).replace('-', ''))
+
+
+def date_key_to_iso(key):
+    """整数键转换为 'YYYY-MM-DD'"""
+    key = int(key)
+    return f'{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}'
+
+
+def date_keys_to_datetime64(keys):
+    """整数键数组转换为 datetime64[D] 数组（向量化，不经过字符串）"""
+    keys = np.asarray(keys, dtype=np.int64)
+    months = (keys // 10000 - 1970) * 12 + (keys // 100 % 100 - 1)
+    return months.astype('datetime64[M]').astype('datetime64[D]') + (keys % 100 - 1)
+
+
+def snapshot_date(snapshot):
+    """快照的日期字符串（优先使用 date_key，两个字段都没有时返回None）"""
+    key = snapshot.get('date_key')
+    return date_key_to_iso(key) if key is not None else snapshot.get('date')
+
+
+def snapshot_days(snapshots):
+    """
+    快照列表的日期（datetime64[D]数组，与snapshots对齐）
+
+    有 date_key 的快照直接由整数换算，只有旧的 date 字段时解析字符串
+    """
+    keys = np.array([snapshot.get('date_key') or 0 for snapshot in snapshots], dtype=np.int64)
+    days = date_keys_to_datetime64(np.where(keys > 0, keys, 19700101))
+    for i in np.flatnonzero(keys == 0):
+        days[i] = np.datetime64(snapshots[i].get('date'), 'D')
+    return days
+
+
+def is_date_key_migrated(refresh=False):
+    """
+    旧快照是否已全部补写 date_key（完成后缓存，未完成时每分钟重新检查一次）
+
+    参数:
+        refresh: 未完成时不使用缓存的检查结果，立即重新读取
+    """
+    global _migrated, _checked_at
+
+    if _migrated:
+        return True
+    now = time.monotonic()
+    if not refresh and now - _checked_at < _STATUS_CHECK_SECONDS and _checked_at:
+        return False
+    _checked_at = now
+    try:
+        from apps.utils.db import get_mongodb_db
+
+        record = get_mongodb_db().schema_migrations.find_one({'_id': DATE_KEY_MIGRATION_ID})
+        _migrated = bool(record and record.get('completed_at'))
+    except Exception as e:
+        logger.warning(f'读取快照日期迁移状态失败: {str(e)}')
+    return _migrated
+
+
+def date_condition(start=None, end=None, inclusive=True):
+    """
+    快照日期范围的查询条件（迁移完成前没有 date_key 的快照按 date 字符串，完成后只按 date_key）
+
+    参数:
+        start: 开始日期（'YYYY-MM-DD'、date 等，None表示不限）
+        end: 结束日期
+        inclusive: start是否包含在内（False时为严格大于）
+
+    返回:
+        dict: 可以直接合并到查询中的条件，如 {'date_key': {'$gte': 20250101, '$lte': 20251231}}
+    """
+    if start is None and end is None:
+        return {}
+    lower = '$gte' if inclusive else '$gt'
+    key_condition = {}
+    if start is not None:
+        key_condition[lower] = to_date_key(start)
+    if end is not None:
+        key_condition['$lte'] = to_date_key(end)
+    if is_date_key_migrated():
+        return {'date_key': key_condition}
+
+    # 迁移未完成（或本进程的状态还没有更新）：补写过的快照按 date_key，其余按 date 字符串
+    legacy_condition = {operator: date_key_to_iso(key) for operator, key in key_condition.items()}
+    return {'$or': [
+        {'date_key': key_condition},
+        {'date_key': {'$exists': False}, 'date': legacy_condition}
+    ]}
+
+
+def date_sort(*extra):
+    """
+    按快照日期升序的排序条件，extra为之后的排序字段（如 ('timestamp', 1)）
+
+    迁移未完成时没有 date_key 的旧快照排在前面并按 date 排序：
+    没有 date_key 的快照都写于开始写入 date_key 之前，日期也更早
+    """
+    if is_date_key_migrated():
+        return [('date_key', 1), *extra]
+    return [('date_key', 1), ('date', 1), *extra]
+
+
+def migrate_date_keys(batch_size=None, pause=None, progress=None):
+    """
+    分批为没有 date_key 的快照补写 date_key，全部完成后记录迁移完成
+
+    参数:
+        batch_size: 每批快照数
+        pause: 每批之间让出的时间（秒）
+        progress: 进度回调 progress(已迁移数, 剩余数)
+
+    返回:
+        int: 本次迁移的快照数
+    """
+    global _migrated
+
+    from pymongo import UpdateOne
+    from apps.utils.db import get_mongodb_db
+    from apps.utils.data_storage import ensure_snapshot_indexes
+
+    batch_size = batch_size or DATE_KEY_MIGRATION_BATCH_SIZE
+    pause = DATE_KEY_MIGRATION_PAUSE if pause is None else pause
+
+    db = get_mongodb_db()
+    collection = db.account_snapshots
+    ensure_snapshot_indexes(db)
+
+    pending = {'date_key': {'$exists': False}, 'date': {'$exists': True}}
+    migrated = 0
+    while True:
+        batch = list(collection.find(pending, projection={'_id': 1, 'date': 1}).limit(batch_size))
+        if not batch:
+            break
+        collection.bulk_write([
+            UpdateOne({'_id': snapshot['_id']}, {'$set': {'date_key': to_date_key(snapshot['date'])}})
+            for snapshot in batch
+        ], ordered=False)
+        migrated += len(batch)
+        if progress:
+            progress(migrated, collection.count_documents(pending))
+        if pause:
+            time.sleep(pause)
+
+    db.schema_migrations.update_one(
+        {'_id': DATE_KEY_MIGRATION_ID},
+        {'$set': {'completed_at': datetime.now(), 'migrated': migrated}},
+        upsert=True
+    )
+    _migrated = True
+    logger.info(f'快照日期迁移完成，本次补写 {migrated} 条 date_key')
+    return migrated
+
+
+def drop_legacy_dates():
+    """
+    迁移完成后删除快照中旧的 date 字符串字段，返回修改的快照数
+
+    迁移记录未完成，或仍有快照没有 date_key 时拒绝执行（抛出RuntimeError）
+    """
+    from apps.utils.db import get_mongodb_db
+
+    if not is_date_key_migrated(refresh=True):
+        raise RuntimeError('快照日期迁移尚未完成，不能删除 date 字段')
+    collection = get_mongodb_db().account_snapshots
+    pending = collection.count_documents({'date_key': {'$exists': False}})
+    if pending:
+        raise RuntimeError(f'还有 {pending} 条快照没有 date_key，请先重新运行迁移')
+    result = collection.update_many(
+        {'date': {'$exists': True}, 'date_key': {'$exists': True}},
+        {'$unset': {'date': ''}}
+    )
+    return result.modified_count
+
+
+def _migration_worker():
+    try:
+        if not is_date_key_migrated():
+            migrate_date_keys()
+    except Exception as e:
+        logger.error(f'快照日期迁移失败: {str(e)}', exc_info=True)
+
+
+def start_date_key_migration():
+    """在后台线程中执行一次迁移（已完成时不做任何事，只执行一次）"""
+    global _started
+
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=_migration_worker, name='snapshot-date-migration', daemon=True).start()
@@ -1,39 +1,261 @@
 """
 Stock metadata helpers.
 
-Currently provides a minimal `get_stock_region` implementation used by
-`apps.account.views.get_region_data`.
-You can later replace this with a real data source (DB, API, etc.).
+Region / exchange / board classification is table-driven: a precomputed
+code -> (exchange, region, board) table is built from the instrument cache
+and the xtquant regional sector lists, and stored compactly as sorted arrays
+(``data/cache/stock_classifier.npz``). Lookups are a binary search
+(``np.searchsorted``), so ``classify_stocks`` classifies thousands of codes
+in one vectorized call.
+
+Codes missing from the table fall back to the listing exchange
+(``.SH`` -> 上海, ``.SZ`` -> 深圳, ``.BJ`` -> 北京).
+
+Rebuild the table with ``python manage.py rebuild_stock_classifier``; the
+startup metadata warmup also rebuilds it once instrument and sector data
+are loaded.
 """
 
-from typing import Literal
+import logging
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 上海 / 深圳 / 北京 (listing exchange), a region from the xtquant regional
+# sectors (e.g. 广东, 浙江), or 其他
+Region = str
+
+# Where the classifier table is stored
+STOCK_CLASSIFIER_PATH = getattr(
+    settings, 'STOCK_CLASSIFIER_PATH',
+    os.path.join(settings.BASE_DIR, 'data', 'cache', 'stock_classifier.npz')
+)
+
+# xtquant regional sectors are named <prefix><region>, e.g. "DY上海"
+STOCK_REGION_SECTOR_PREFIX = getattr(settings, 'STOCK_REGION_SECTOR_PREFIX', 'DY')
+
+EXCHANGE_REGIONS = {'SH': '上海', 'SZ': '深圳', 'BJ': '北京'}
+
+_CODE_DTYPE = 'U12'
+
+_table = None
+_table_lock = threading.Lock()
+
+
+class ClassifierTable:
+    """
+    Sorted code array plus one small-integer column per attribute.
+
+    Attribute values are stored as indexes into label lists, so a table for
+    the whole A-share universe is a few hundred KB.
+    """
+
+    __slots__ = ('codes', 'columns', 'labels')
+
+    def __init__(self, codes, columns, labels):
+        self.codes = codes
+        self.columns = columns
+        self.labels = labels
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Build a table from ``{code: {'exchange': ..., 'region': ..., 'board': ...}}``.
+        """
+        codes = np.array(sorted(rows), dtype=_CODE_DTYPE)
+        columns, labels = {}, {}
+        for field in ('exchange', 'region', 'board'):
+            values = [rows[code][field] or '' for code in codes.tolist()]
+            labels[field], columns[field] = np.unique(np.array(values, dtype=object).astype(str), return_inverse=True)
+            labels[field] = labels[field].tolist()
+            columns[field] = columns[field].astype(np.uint16)
+        return cls(codes, columns, labels)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp.npz'
+        np.savez_compressed(
+            temp_path,
+            codes=self.codes,
+            **{f'col_{field}': column for field, column in self.columns.items()},
+            **{f'labels_{field}': np.array(labels, dtype='U32') for field, labels in self.labels.items()}
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            fields = [key[4:] for key in data.files if key.startswith('col_')]
+            return cls(
+                data['codes'],
+                {field: data[f'col_{field}'] for field in fields},
+                {field: data[f'labels_{field}'].tolist() for field in fields}
+            )
+
+    def lookup(self, codes):
+        """
+        Returns ``(found, rows)`` aligned with ``codes``.
+        """
+        codes = np.asarray(codes, dtype=_CODE_DTYPE)
+        if self.codes.shape[0] == 0:
+            return np.zeros(codes.shape[0], dtype=bool), np.zeros(codes.shape[0], dtype=np.int64)
+        rows = np.searchsorted(self.codes, codes)
+        rows = np.minimum(rows, self.codes.shape[0] - 1)
+        return self.codes[rows] == codes, rows
+
+    def __len__(self):
+        return int(self.codes.shape[0])
+
+
+def _exchange_of(stock_code):
+    code = stock_code.upper()
+    _, _, suffix = code.rpartition('.')
+    if suffix in EXCHANGE_REGIONS:
+        return suffix
+    # Example prefixes – tweak/remove if not needed
+    if code.startswith("BJ"):
+        return 'BJ'
+    return ''
+
+
+def _fallback(stock_code):
+    """Rule-based classification for codes missing from the table."""
+    from apps.utils.instrument_cache import classify_board
+
+    exchange = _exchange_of(stock_code) if stock_code else ''
+    if exchange == 'BJ':
+        board = '北交所'
+    else:
+        board = classify_board(stock_code) if exchange else ''
+    return {
+        'exchange': exchange,
+        'region': EXCHANGE_REGIONS.get(exchange, "其他"),
+        'board': board,
+    }
+
+
+def get_classifier_table():
+    """Load the classifier table on first use (empty table when no file exists)."""
+    global _table
+
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                table = ClassifierTable.build({})
+                if os.path.exists(STOCK_CLASSIFIER_PATH):
+                    try:
+                        table = ClassifierTable.load(STOCK_CLASSIFIER_PATH)
+                        logger.info(f'Loaded stock classifier table: {len(table)} codes')
+                    except Exception as e:
+                        logger.error(f'Failed to load stock classifier table: {str(e)}')
+                _table = table
+    return _table
+
+
+def set_classifier_table(table):
+    global _table
+
+    with _table_lock:
+        _table = table
+
+
+def classify_stocks(stock_codes):
+    """
+    Classify many codes in one call.
+
+    Returns a dict of lists aligned with ``stock_codes``:
+    ``{'exchange': [...], 'region': [...], 'board': [...]}``.
+    """
+    stock_codes = [code or '' for code in stock_codes]
+    table = get_classifier_table()
+    found, rows = table.lookup(stock_codes)
+
+    result = {}
+    for field in ('exchange', 'region', 'board'):
+        if field in table.columns:
+            labels = np.array(table.labels[field], dtype=object)
+            result[field] = labels[table.columns[field][rows]] if len(table) else np.empty(len(stock_codes), dtype=object)
+        else:
+            result[field] = np.empty(len(stock_codes), dtype=object)
+
+    for i in np.flatnonzero(~found):
+        fallback = _fallback(stock_codes[i])
+        for field in result:
+            result[field][i] = fallback[field]
 
+    return {field: values.tolist() for field, values in result.items()}
 
-Region = Literal["上海", "深圳", "北京", "广州", "杭州", "其他"]
+
+def get_stock_regions(stock_codes):
+    """Batch version of ``get_stock_region``."""
+    return classify_stocks(stock_codes)['region']
 
 
 def get_stock_region(stock_code: str) -> Region:
     """
-    Return the listing region for a given stock code.
+    Return the region for a given stock code.
 
-    This is a placeholder implementation that infers region from the code
-    suffix / prefix. Adjust the rules to match your real business logic.
+    Uses the classifier table (company region from the xtquant regional
+    sectors) and falls back to the listing exchange's city.
     """
     if not stock_code:
         return "其他"
+    return get_stock_regions([stock_code])[0]
 
-    code = stock_code.upper()
 
-    # Very rough mapping rules – customize as needed
-    if code.endswith(".SH"):
-        return "上海"
-    if code.endswith(".SZ"):
-        return "深圳"
+def build_classifier_rows(stock_codes, instruments, stock_sectors):
+    """
+    Build classifier rows from instrument metadata and sector membership.
 
-    # Example prefixes – tweak/remove if not needed
-    if code.startswith("BJ"):
-        return "北京"
+    Args:
+        stock_codes: codes to include
+        instruments: ``{code: instrument_cache record or None}``
+        stock_sectors: function ``code -> [sector names]``
 
-    return "其他"
+    Returns:
+        dict: ``{code: {'exchange', 'region', 'board'}}``
+    """
+    prefix = STOCK_REGION_SECTOR_PREFIX
+    rows = {}
+    for code in stock_codes:
+        row = _fallback(code)
+        record = instruments.get(code)
+        if record:
+            row['exchange'] = record.get('exchange') or row['exchange']
+            row['board'] = record.get('board') or row['board']
+        regions = [sector[len(prefix):] for sector in stock_sectors(code) if sector.startswith(prefix)]
+        if regions:
+            row['region'] = regions[0]
+        rows[code] = row
+    return rows
+
+
+def rebuild_stock_classifier(stock_codes=None, save=True):
+    """
+    Rebuild the classifier table from the instrument cache and sector cache.
+
+    Args:
+        stock_codes: codes to include, default every cached instrument
+        save: write the table to ``STOCK_CLASSIFIER_PATH``
+
+    Returns:
+        ClassifierTable: the new table (also installed for lookups)
+    """
+    from apps.utils import instrument_cache
+    from apps.utils.sector_cache import get_stock_sectors
 
+    if stock_codes is None:
+        stock_codes = sorted(instrument_cache.cached_codes())
+    instruments = instrument_cache.get_instruments(stock_codes)
 
+    table = ClassifierTable.build(build_classifier_rows(stock_codes, instruments, get_stock_sectors))
+    set_classifier_table(table)
+    if save:
+        table.save(STOCK_CLASSIFIER_PATH)
+    logger.info(f'Rebuilt stock classifier table: {len(table)} codes')
+    return table
@@ -0,0 +1,266 @@
+"""
+交易日历
+把交易所节假日（xtdata.get_holidays）加载为有序的 datetime64[D] 数组，
+再展开为覆盖 TRADING_CALENDAR_START 到节假日数据最后一年年底的有序交易日数组：
+
+- 判断交易日、下一个/上一个交易日、最近N个交易日：np.searchsorted，O(log n)
+- 区间内的交易日：两次 searchsorted 取切片
+- 年化使用的交易日数：最近一年内的实际交易日数
+
+节假日优先读取 settings.TRADING_HOLIDAYS，其次是本地缓存文件，都没有时从迅投读取并写入缓存；
+启动预热任务（metadata_warmup）会从迅投刷新一次。没有任何节假日数据时按周一至周五计算。
+
+缓存文件格式:
+    {"refreshed_date": "2025-01-15", "holidays": ["2025-01-01", "2025-01-28", ...]}
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 节假日缓存文件路径
+TRADING_CALENDAR_PATH = getattr(
+    settings, 'TRADING_CALENDAR_PATH',
+    os.path.join(settings.BASE_DIR, 'data', 'cache', 'trading_holidays.json')
+)
+
+# 交易日数组的起始日期
+TRADING_CALENDAR_START = getattr(settings, 'TRADING_CALENDAR_START', '2000-01-01')
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def _to_day(date):
+    """日期（YYYY-MM-DD / YYYYMMDD字符串、date、datetime64）转换为datetime64[D]"""
+    if isinstance(date, str) and len(date) == 8 and date.isdigit():
+        date = f'{date[:4]}-{date[4:6]}-{date[6:]}'
+    if isinstance(date, datetime):
+        date = date.date()
+    return np.datetime64(date, 'D')
+
+
+class TradingCalendar:
+    """有序的节假日和交易日数组（构建后只读）"""
+
+    __slots__ = ('holidays', 'busdaycal', 'days', 'start', 'end')
+
+    def __init__(self, holidays, start=None, end=None):
+        self.holidays = np.unique(np.asarray(holidays, dtype='datetime64[D]'))
+        self.busdaycal = np.busdaycalendar(holidays=self.holidays)
+        self.start = _to_day(start or TRADING_CALENDAR_START)
+        # 覆盖到节假日数据的最后一年和明年年底，之后的日期只排除周末
+        last_year = max(
+            int(str(self.holidays[-1])[:4]) if self.holidays.shape[0] else 0,
+            datetime.now().year + 1
+        )
+        self.end = _to_day(end or f'{last_year}-12-31')
+
+        all_days = np.arange(self.start, self.end + 1, dtype='datetime64[D]')
+        self.days = all_days[np.is_busday(all_days, busdaycal=self.busdaycal)]
+
+    def __len__(self):
+        return int(self.days.shape[0])
+
+    def _covers(self, day):
+        return self.start <= day <= self.end
+
+    def is_trading_day(self, date):
+        day = _to_day(date)
+        if not self._covers(day):
+            return bool(np.is_busday(day, busdaycal=self.busdaycal))
+        i = int(np.searchsorted(self.days, day))
+        return i < self.days.shape[0] and self.days[i] == day
+
+    def mask(self, dates):
+        """批量判断交易日，返回与dates对齐的布尔数组"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        return np.is_busday(dates, busdaycal=self.busdaycal)
+
+    def next_trading_day(self, date):
+        """date之后（不含）的第一个交易日"""
+        day = _to_day(date)
+        i = int(np.searchsorted(self.days, day, side='right'))
+        if self._covers(day) and i < self.days.shape[0]:
+            return self.days[i]
+        return np.busday_offset(day, 1, roll='backward', busdaycal=self.busdaycal)
+
+    def prev_trading_day(self, date):
+        """date之前（不含）的最后一个交易日"""
+        day = _to_day(date)
+        i = int(np.searchsorted(self.days, day, side='left'))
+        if self._covers(day) and i > 0:
+            return self.days[i - 1]
+        return np.busday_offset(day, -1, roll='forward', busdaycal=self.busdaycal)
+
+    def trading_days(self, start, end):
+        """[start, end] 内的交易日数组"""
+        start, end = _to_day(start), _to_day(end)
+        if self._covers(start) and self._covers(end):
+            lo = int(np.searchsorted(self.days, start, side='left'))
+            hi = int(np.searchsorted(self.days, end, side='right'))
+            return self.days[lo:hi]
+        all_days = np.arange(start, end + 1, dtype='datetime64[D]')
+        return all_days[self.mask(all_days)]
+
+    def last_trading_days(self, n, end=None):
+        """截止end（含，默认今天）的最近n个交易日"""
+        end = _to_day(end or datetime.now().date())
+        if self._covers(end):
+            hi = int(np.searchsorted(self.days, end, side='right'))
+            if hi >= n:
+                return self.days[hi - n:hi]
+        last = end if self.is_trading_day(end) else self.prev_trading_day(end)
+        first = np.busday_offset(last, -(n - 1), busdaycal=self.busdaycal)
+        return self.trading_days(first, last)
+
+    def shift(self, date, n):
+        """从date（非交易日时先移到之后的交易日）移动n个交易日，n为负表示向前"""
+        return np.busday_offset(_to_day(date), n, roll='forward', busdaycal=self.busdaycal)
+
+    def trading_days_in_year(self, end=None):
+        """截止end（含，默认今天）前一年内的交易日数"""
+        end = _to_day(end or datetime.now().date())
+        return int(self.trading_days(end - 364, end).shape[0])
+
+
+def _load_holidays():
+    """读取节假日：settings → 缓存文件 → 迅投"""
+    configured = getattr(settings, 'TRADING_HOLIDAYS', None)
+    if configured:
+        return [_to_day(day) for day in configured]
+
+    if os.path.exists(TRADING_CALENDAR_PATH):
+        try:
+            with open(TRADING_CALENDAR_PATH, 'r', encoding='utf-8') as f:
+                return [_to_day(day) for day in json.load(f).get('holidays', [])]
+        except Exception as e:
+            logger.error(f'读取交易日历缓存文件失败: {str(e)}')
+
+    try:
+        return fetch_holidays()
+    except Exception as e:
+        logger.warning(f'从迅投读取节假日失败，交易日按周一至周五计算: {str(e)}')
+        return []
+
+
+def fetch_holidays(save=True):
+    """
+    从迅投读取节假日并写入缓存文件
+
+    返回:
+        list: 节假日（datetime64[D]）
+    """
+    from xtquant import xtdata
+
+    holidays = sorted({_to_day(str(day)) for day in (xtdata.get_holidays() or [])})
+    if save and holidays:
+        os.makedirs(os.path.dirname(TRADING_CALENDAR_PATH), exist_ok=True)
+        temp_path = f'{TRADING_CALENDAR_PATH}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'refreshed_date': datetime.now().date().isoformat(),
+                'holidays': [str(day) for day in holidays]
+            }, f)
+        os.replace(temp_path, TRADING_CALENDAR_PATH)
+    return holidays
+
+
+def get_trading_calendar():
+    """首次使用时加载交易日历"""
+    global _calendar
+
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = TradingCalendar(_load_holidays())
+                logger.info(f'交易日历已加载: {_calendar.holidays.shape[0]} 个节假日，{len(_calendar)} 个交易日')
+    return _calendar
+
+
+def refresh_trading_calendar():
+    """从迅投刷新节假日并替换当前日历，返回节假日数（迅投没有返回数据时保留原日历）"""
+    global _calendar
+
+    holidays = fetch_holidays()
+    if holidays:
+        calendar = TradingCalendar(holidays)
+        with _calendar_lock:
+            _calendar = calendar
+    return len(holidays)
+
+
+def is_trading_day(date):
+    return get_trading_calendar().is_trading_day(date)
+
+
+def next_trading_day(date):
+    return get_trading_calendar().next_trading_day(date)
+
+
+def prev_trading_day(date):
+    return get_trading_calendar().prev_trading_day(date)
+
+
+def trading_days(start, end):
+    return get_trading_calendar().trading_days(start, end)
+
+
+def last_trading_days(n, end=None):
+    return get_trading_calendar().last_trading_days(n, end)
+
+
+def shift_trading_days(date, n):
+    return get_trading_calendar().shift(date, n)
+
+
+def trading_day_mask(dates):
+    return get_trading_calendar().mask(dates)
+
+
+def trading_days_within(days, end=None):
+    """
+    最近days个日历日（[end - days, end]，与按日历日的日期条件一致）内的交易日数，至少为1
+
+    接口的days参数是日历日，按交易日读取历史时先换算为交易日数
+    """
+    end = _to_day(end or datetime.now().date())
+    return max(int(trading_days(end - days, end).shape[0]), 1)
+
+
+def trading_week_start(weeks, end=None):
+    """
+    最近weeks个有交易日的ISO周中，最早一周的周一（YYYY-MM-DD）
+
+    整周休市的周（如国庆）不计入
+    """
+    from apps.utils.periods import period_ids
+
+    end = _to_day(end or datetime.now().date())
+    # 每周至少有一个交易日时需要weeks周，多留出长假的余量
+    days = trading_days(end - 7 * weeks - 21, end)
+    weeks_with_trading = np.unique(period_ids(days, 'week'))
+    if weeks_with_trading.shape[0] == 0:
+        return str(end - 7 * weeks)
+    return str(weeks_with_trading[-weeks:][0].astype('datetime64[D]'))
+
+
+def annual_trading_days(end=None):
+    """
+    年化使用的交易日数：最近一年内的实际交易日数
+
+    没有节假日数据时（只能按周一至周五计算）返回 TRADING_DAYS_PER_YEAR
+    """
+    from apps.risk_threshold.risk_kernel import TRADING_DAYS_PER_YEAR
+
+    calendar = get_trading_calendar()
+    if calendar.holidays.shape[0] == 0:
+        return TRADING_DAYS_PER_YEAR
+    return calendar.trading_days_in_year(end)
@@ -84,6 +84,10 @@ def init_xtdatacenter_once():
             
             logger.info('迅投数据中心初始化成功')
             
+            # 数据中心就绪后，在后台低优先级预热全A股合约信息和板块成分股
+            from apps.utils.metadata_warmup import start_metadata_warmup
+            start_metadata_warmup()
+            
         except Exception as e:
             # 初始化失败时，只记录一次错误，不抛出异常
             # 这样不会影响Django启动，系统可以继续使用模拟数据
@@ -14,6 +14,15 @@ from xtquant.xttype import StockAccount
 logger = logging.getLogger(__name__)
 
 
+def _forward_to_alert_engine(handler_name, data):
+    """将交易回调转发给风险告警引擎（异常不影响回调线程）"""
+    try:
+        from apps.risk_threshold import alerts
+        getattr(alerts, handler_name)(data)
+    except Exception as e:
+        logger.error(f'风险告警引擎处理回调失败: {str(e)}', exc_info=True)
+
+
 class XtQuantTraderCallbackImpl(XtQuantTraderCallback):
     """
     迅投交易回调类实现
@@ -32,6 +41,15 @@ class XtQuantTraderCallbackImpl(XtQuantTraderCallback):
         """成交回调"""
         logger.info(f'{datetime.datetime.now()} 成交回调 {trade.order_remark} '
                    f'委托方向(48买 49卖) {trade.offset_flag} 成交价格 {trade.traded_price} 成交数量 {trade.traded_volume}')
+        _forward_to_alert_engine('handle_trade_callback', trade)
+
+    def on_stock_position(self, position):
+        """持仓变动回调"""
+        _forward_to_alert_engine('handle_position_callback', position)
+
+    def on_stock_asset(self, asset):
+        """资产变动回调"""
+        _forward_to_alert_engine('handle_asset_callback', asset)
 
     def on_order_error(self, order_error):
         """委托报错回调"""